@@ -0,0 +1,109 @@
+"""
+Measure activity events uploaded per second on one node: one POST per event
+(the previous per-agent watcher behaviour) versus the batched ActivityUploader.
+The fake Roster API adds a fixed latency to each request.
+
+Usage: python -m benchmarks.activity_upload [--agents N] [--events N] [--latency S]
+"""
+import argparse
+import asyncio
+import time
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from roster_agent_runtime.activity.uploader import ActivityUploader
+from roster_agent_runtime.http_client import HttpClient
+
+ACTIVITY_EVENT = {
+    "type": "thought",
+    "execution_id": "123e4567-e89b-12d3-a456-426614174000",
+    "execution_type": "TASK",
+    "agent_context": {"name": "Alice", "role": "Engineer", "team": "Platform"},
+    "content": "I should read the failing test before changing the code. " * 5,
+}
+
+
+class FakeActivityAPI:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.received = 0
+
+    async def activity(self, request: web.Request) -> web.Response:
+        await request.read()
+        await asyncio.sleep(self.latency)
+        self.received += 1
+        return web.json_response({})
+
+    async def batch(self, request: web.Request) -> web.Response:
+        events = await request.json()
+        await asyncio.sleep(self.latency)
+        self.received += len(events)
+        return web.json_response({})
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/activities", self.activity)
+        app.router.add_post("/activities/batch", self.batch)
+        return app
+
+
+async def per_event(server: TestServer, agents: int, events: int) -> None:
+    client = HttpClient(name="bench-per-event")
+    url = str(server.make_url("/activities"))
+
+    async def watcher(agent: int):
+        for i in range(events):
+            async with client.post(url, json={**ACTIVITY_EVENT, "index": i}):
+                pass
+
+    await asyncio.gather(*(watcher(agent) for agent in range(agents)))
+    await client.teardown()
+
+
+async def batched(server: TestServer, agents: int, events: int) -> None:
+    client = HttpClient(name="bench-batched")
+    uploader = ActivityUploader(
+        url=str(server.make_url("/activities")),
+        batch_url=str(server.make_url("/activities/batch")),
+        http_client=client,
+    )
+    uploader.setup()
+
+    async def watcher(agent: int):
+        for i in range(events):
+            await uploader.push(f"agent-{agent}", {**ACTIVITY_EVENT, "index": i})
+
+    await asyncio.gather(*(watcher(agent) for agent in range(agents)))
+    while uploader.events_uploaded.value < agents * events:
+        await asyncio.sleep(0.005)
+    uploader.teardown()
+    await client.teardown()
+
+
+async def run(args) -> None:
+    total = args.agents * args.events
+    print(
+        f"{args.agents} agents x {args.events} events, {args.latency * 1e3:.0f}ms RTT"
+    )
+    for name, mode in [("per-event POST", per_event), ("batched uploader", batched)]:
+        api = FakeActivityAPI(args.latency)
+        server = TestServer(api.app())
+        await server.start_server()
+        start = time.perf_counter()
+        await mode(server, args.agents, args.events)
+        elapsed = time.perf_counter() - start
+        await server.close()
+        assert api.received == total
+        print(f"{name:<20}{total / elapsed:>12.0f} events/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--agents", type=int, default=20)
+    parser.add_argument("--events", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.01)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
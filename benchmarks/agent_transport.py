@@ -0,0 +1,173 @@
+"""
+Measure connections held and chat latency for many HTTP Agents, over plain
+HTTP (a POST per request plus two long-lived streams per Agent) versus one
+multiplexed WebSocket per Agent. Every fake Agent is served by one local
+server, under its own path prefix, and replies after a fixed latency.
+
+Usage: python -m benchmarks.agent_transport [--agents N] [--rounds N] [--latency S]
+"""
+import argparse
+import asyncio
+import resource
+import statistics
+import time
+
+from aiohttp import WSMsgType, web
+from aiohttp.test_utils import TestServer
+from roster_agent_runtime import codec
+from roster_agent_runtime.agents.http import HttpAgentHandle, create_agent_http_client
+from roster_agent_runtime.agents.ws import AgentConnectionPool
+
+
+class FakeAgents:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.open_streams = 0
+        self.subscriptions = 0
+        self.peers: set = set()
+
+    def _track(self, request: web.Request):
+        self.peers.add(request.transport.get_extra_info("peername"))
+
+    async def chat(self, request: web.Request) -> web.Response:
+        self._track(request)
+        payload = await request.json()
+        await asyncio.sleep(self.latency)
+        return web.json_response({"message": f"Hi {payload['identity']}"})
+
+    async def stream(self, request: web.Request) -> web.StreamResponse:
+        self._track(request)
+        resp = web.StreamResponse()
+        await resp.prepare(request)
+        self.open_streams += 1
+        try:
+            await asyncio.Event().wait()
+        finally:
+            self.open_streams -= 1
+        return resp
+
+    async def ws(self, request: web.Request) -> web.WebSocketResponse:
+        self._track(request)
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+
+        async def respond(frame: dict):
+            await asyncio.sleep(self.latency)
+            message = {"message": f"Hi {frame['data']['identity']}"}
+            await ws.send_bytes(
+                codec.dumps(
+                    {
+                        "type": "response",
+                        "id": frame["id"],
+                        "status": 200,
+                        "data": message,
+                    }
+                )
+            )
+
+        async for message in ws:
+            if message.type != WSMsgType.BINARY:
+                break
+            frame = codec.loads(message.data)
+            if frame["type"] == "request":
+                asyncio.create_task(respond(frame))
+            elif frame["type"] == "subscribe":
+                self.subscriptions += 1
+        return ws
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/agents/{name}/chat", self.chat)
+        app.router.add_get("/agents/{name}/message-stream", self.stream)
+        app.router.add_get("/agents/{name}/activity-stream", self.stream)
+        app.router.add_get("/agents/{name}/ws", self.ws)
+        return app
+
+
+async def consume(stream):
+    async for _ in stream:
+        pass
+
+
+async def run_transport(
+    transport: str, agents: int, rounds: int, latency: float
+) -> None:
+    fake = FakeAgents(latency)
+    server = TestServer(fake.app())
+    await server.start_server()
+    client = create_agent_http_client(f"bench-{transport}")
+    # Every fake Agent shares one host, lift the per-Agent limit
+    client.limit_per_host = 0
+    connections = AgentConnectionPool(client) if transport == "websocket" else None
+    handles = [
+        HttpAgentHandle.build(
+            f"agent-{i}",
+            str(server.make_url(f"/agents/agent-{i}")),
+            http_client=client,
+            connections=connections,
+        )
+        for i in range(agents)
+    ]
+    readers = [
+        asyncio.create_task(consume(stream))
+        for handle in handles
+        for stream in (handle.outgoing_message_stream(), handle.activity_stream())
+    ]
+    while fake.open_streams + fake.subscriptions < 2 * agents:
+        await asyncio.sleep(0.01)
+
+    latencies = []
+
+    async def chat(handle: HttpAgentHandle):
+        start = time.perf_counter()
+        await handle.chat(identity="Bob", team="Team", role="Role", chat_history=[])
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        await asyncio.gather(*(chat(handle) for handle in handles))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(
+        f"{transport:<11}{len(fake.peers):>13}{client.connections_created.value:>10}"
+        f"{statistics.median(latencies) * 1e3:>10.1f}{p99 * 1e3:>10.1f}"
+        f"{len(latencies) / elapsed:>12.0f}"
+    )
+
+    for reader in readers:
+        reader.cancel()
+    await asyncio.gather(*readers, return_exceptions=True)
+    if connections is not None:
+        await connections.teardown()
+    await client.teardown()
+    await server.close()
+
+
+async def run(args) -> None:
+    print(
+        f"{args.agents} agents x {args.rounds} rounds of chat, "
+        f"{args.latency * 1e3:.0f}ms agent latency"
+    )
+    print(
+        f"{'transport':<11}{'connections':>13}{'opened':>10}"
+        f"{'p50 ms':>10}{'p99 ms':>10}{'chats/s':>12}"
+    )
+    for transport in ("http", "websocket"):
+        await run_transport(transport, args.agents, args.rounds, args.latency)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--agents", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.01)
+    # Both ends of every connection are in this process
+    _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Compare the stdlib JSON paths previously used across the runtime with the
+codec module, for each place where events and messages are (de)serialized.
+
+Usage: python -m benchmarks.codec [--iterations N]
+"""
+import argparse
+import json
+import time
+from typing import Callable
+
+from roster_agent_runtime import codec
+
+RESOURCE_EVENT = {
+    "event_type": "PUT",
+    "resource_type": "AGENT",
+    "namespace": "default",
+    "name": "Alice",
+    "resource": {
+        "spec": {
+            "name": "Alice",
+            "executor": "docker",
+            "image": "roster-agent:latest",
+            "tag": "latest",
+            "actions": [
+                {"name": f"Action{i}", "description": "An action.", "inputs": []}
+                for i in range(5)
+            ],
+        }
+    },
+}
+
+OUTGOING_MESSAGE = {
+    "recipient": {"kind": "roster-admin", "name": "workflow-router"},
+    "payload": {
+        "id": "123e4567-e89b-12d3-a456-426614174000",
+        "workflow": "WorkflowName",
+        "kind": "report_action",
+        "data": {
+            "step": "StepName",
+            "action": "ActionName",
+            "outputs": {"code": {"type": "code", "value": "x = 1\n" * 500}},
+            "error": "",
+        },
+    },
+}
+
+TOOL_RESPONSE = {
+    "id": "123e4567-e89b-12d3-a456-426614174000",
+    "kind": "tool_response",
+    "tool": "workspace-file-reader",
+    "data": {
+        "files": [
+            {"filename": f"module_{i}.py", "text": "print('hello')\n" * 400}
+            for i in range(10)
+        ]
+    },
+}
+
+
+def double_encoded_line(obj: dict) -> bytes:
+    return (json.dumps(json.dumps(obj)) + "\n").encode()
+
+
+def bench(fn: Callable[[], object], iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=5_000)
+    args = parser.parse_args()
+
+    event_line = double_encoded_line(RESOURCE_EVENT)
+    event_line_single = codec.dumps(RESOURCE_EVENT) + b"\n"
+    message_line = double_encoded_line(OUTGOING_MESSAGE)
+    message_line_single = codec.dumps(OUTGOING_MESSAGE) + b"\n"
+    tool_body = json.dumps(TOOL_RESPONSE).encode()
+
+    cases = [
+        (
+            "resource event (informer)",
+            lambda: json.loads(json.loads(event_line.decode("utf-8").strip())),
+            lambda: codec.loads_nested(event_line.strip()),
+            lambda: codec.loads_nested(event_line_single.strip()),
+        ),
+        (
+            "agent message stream line",
+            lambda: json.loads(json.loads(message_line.decode("utf-8").strip())),
+            lambda: codec.loads_nested(message_line.strip()),
+            lambda: codec.loads_nested(message_line_single.strip()),
+        ),
+        (
+            "rabbitmq consume",
+            lambda: json.loads(tool_body.decode()),
+            lambda: codec.loads(tool_body),
+            None,
+        ),
+        (
+            "rabbitmq publish",
+            lambda: json.dumps(OUTGOING_MESSAGE["payload"]).encode(),
+            lambda: codec.dumps(OUTGOING_MESSAGE["payload"]),
+            None,
+        ),
+    ]
+
+    print(f"codec backend: {codec.BACKEND}")
+    print(f"{'path':<28}{'before us':>12}{'after us':>12}{'single-enc us':>15}")
+    for name, before, after, single in cases:
+        before_us = bench(before, args.iterations)
+        after_us = bench(after, args.iterations)
+        single_us = f"{bench(single, args.iterations):.2f}" if single else "-"
+        print(f"{name:<28}{before_us:>12.2f}{after_us:>12.2f}{single_us:>15}")
+
+
+if __name__ == "__main__":
+    main()
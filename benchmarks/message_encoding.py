@@ -0,0 +1,69 @@
+"""
+Measure the size and encode/decode time of a large tool response (whole files
+as JSON strings) for each message encoding a peer can negotiate.
+
+Usage: python -m benchmarks.message_encoding [--files N] [--file-bytes N] [--rounds N]
+"""
+import argparse
+import random
+import string
+import time
+
+from roster_agent_runtime.messaging import encoding
+
+
+def source_file(size: int) -> str:
+    # Repetitive like real source code, but not trivially compressible
+    words = ["def", "return", "self", "import", "class", "if", "for", "in", "None"]
+    lines = []
+    while sum(len(line) for line in lines) < size:
+        name = "".join(random.choices(string.ascii_lowercase, k=8))
+        lines.append(f"    {random.choice(words)} {name} = {random.randint(0, 999)}\n")
+    return "".join(lines)
+
+
+def run(args):
+    random.seed(0)
+    message = {
+        "id": "123e4567-e89b-12d3-a456-426614174000",
+        "kind": "tool_response",
+        "tool": "workspace-file-reader",
+        "data": {
+            "files": [
+                {"filename": f"src/module_{i}.py", "text": source_file(args.file_bytes)}
+                for i in range(args.files)
+            ]
+        },
+    }
+    accepts = {"json": frozenset()}
+    for token in encoding.supported():
+        accepts[token] = frozenset({token})
+    accepts["negotiated"] = frozenset(encoding.supported())
+
+    for name, accept in accepts.items():
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            body, content_type, content_encoding = encoding.encode(
+                message, accept, compression_min_bytes=16384
+            )
+        encode_ms = (time.perf_counter() - start) / args.rounds * 1e3
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            encoding.decode(body, content_type, content_encoding)
+        decode_ms = (time.perf_counter() - start) / args.rounds * 1e3
+        print(
+            f"{name:<12} {len(body) / 1024:>9.1f} KiB"
+            f"  encode {encode_ms:>7.2f}ms  decode {decode_ms:>7.2f}ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--file-bytes", type=int, default=40000)
+    parser.add_argument("--rounds", type=int, default=10)
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
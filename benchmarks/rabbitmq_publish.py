@@ -0,0 +1,64 @@
+"""
+Measure messages published per second against a local broker stand-in that
+confirms each publish after a simulated round trip: one awaited publish at a
+time (the previous behaviour) versus the pipelined ConfirmedPublisher.
+
+Usage: python -m benchmarks.rabbitmq_publish [--messages N] [--rtt S] [--window N]
+"""
+import argparse
+import asyncio
+import time
+
+from aio_pika import Message
+from roster_agent_runtime import codec
+from roster_agent_runtime.messaging.rabbitmq import ConfirmedPublisher
+from tests.mock.rabbitmq import MockBroker
+
+TOOL_INVOCATION = {
+    "id": "123e4567-e89b-12d3-a456-426614174000",
+    "kind": "tool_invocation",
+    "tool": "workspace-file-reader",
+    "data": {"filepaths": [f"src/module_{i}.py" for i in range(10)]},
+}
+
+
+async def sequential(broker: MockBroker, messages: int, window: int):
+    channel = await (await broker.connect()).channel()
+    for i in range(messages):
+        await channel.default_exchange.publish(
+            Message(body=codec.dumps({**TOOL_INVOCATION, "index": i})),
+            routing_key=f"queue-{i % 10}",
+        )
+
+
+async def pipelined(broker: MockBroker, messages: int, window: int):
+    publisher = ConfirmedPublisher(channel_count=4, window=window)
+    await publisher.open(await broker.connect())
+    await publisher.publish_batch(
+        (f"queue-{i % 10}", codec.dumps({**TOOL_INVOCATION, "index": i}), None)
+        for i in range(messages)
+    )
+    await publisher.close()
+
+
+async def run(args):
+    print(f"{args.messages} messages, {args.rtt * 1e3:.1f}ms RTT, window {args.window}")
+    for name, mode in [("sequential", sequential), ("pipelined", pipelined)]:
+        broker = MockBroker(publish_latency=args.rtt)
+        start = time.perf_counter()
+        await mode(broker, args.messages, args.window)
+        elapsed = time.perf_counter() - start
+        assert len(broker.published) == args.messages
+        print(f"{name:<14}{args.messages / elapsed:>12.0f} msgs/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=2_000)
+    parser.add_argument("--rtt", type=float, default=0.001)
+    parser.add_argument("--window", type=int, default=256)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Compare the per-event cost of the status store path using pydantic models
+against the slotted records now used for hot-path state.
+
+Usage: python -m benchmarks.status_records [--events N]
+"""
+import argparse
+import time
+import tracemalloc
+from enum import Enum
+from typing import Callable, Optional
+
+from pydantic import BaseModel
+from roster_agent_runtime.controllers.events.status import (
+    ControllerStatusEvent,
+    EventType,
+    Resource,
+)
+from roster_agent_runtime.models.agent import AgentContainer, AgentStatus
+from roster_agent_runtime.models.records import AgentContainerRecord, AgentStatusRecord
+
+LABELS = {"roster-agent": "Alice"}
+
+
+class _LegacyResource(Enum):
+    AGENT = "AGENT"
+
+
+class _LegacyEventType(Enum):
+    PUT = "PUT"
+
+
+# Mirrors the pydantic ControllerStatusEvent used before records were introduced
+class _LegacyControllerStatusEvent(BaseModel):
+    resource_type: _LegacyResource
+    event_type: _LegacyEventType
+    name: str
+    status: Optional[dict] = None
+
+    class Config:
+        use_enum_values = True
+
+
+def legacy_event(i: int) -> dict:
+    status = AgentStatus(
+        name=f"agent-{i}",
+        executor="docker",
+        status="running",
+        container=AgentContainer(
+            id=f"container-id-{i}",
+            name=f"container-{i}",
+            image="roster-agent:latest",
+            status="running",
+            labels=LABELS,
+        ),
+    )
+    event = _LegacyControllerStatusEvent(
+        resource_type=_LegacyResource.AGENT,
+        event_type=_LegacyEventType.PUT,
+        name=status.name,
+        status=status.dict(),
+    )
+    return event.dict()
+
+
+def record_event(i: int) -> ControllerStatusEvent:
+    status = AgentStatusRecord(
+        name=f"agent-{i}",
+        executor="docker",
+        status="running",
+        container=AgentContainerRecord(
+            id=f"container-id-{i}",
+            name=f"container-{i}",
+            image="roster-agent:latest",
+            status="running",
+            labels=LABELS,
+        ),
+    )
+    return ControllerStatusEvent(
+        resource_type=Resource.AGENT,
+        event_type=EventType.PUT,
+        name=status.name,
+        status=status,
+    )
+
+
+def record_event_serialized(i: int) -> dict:
+    return record_event(i).dict()
+
+
+def measure(fn: Callable[[int], object], events: int) -> tuple[float, float]:
+    start = time.perf_counter()
+    for i in range(events):
+        fn(i)
+    elapsed = time.perf_counter() - start
+
+    # Keep results alive so the allocation count reflects retained state
+    tracemalloc.start()
+    snapshot_start = tracemalloc.take_snapshot()
+    retained = [fn(i) for i in range(events)]
+    snapshot_end = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(
+        stat.size_diff for stat in snapshot_end.compare_to(snapshot_start, "filename")
+    )
+    del retained
+    return elapsed / events * 1e6, allocated / events
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=20_000)
+    args = parser.parse_args()
+
+    cases = [
+        ("pydantic models (before)", legacy_event),
+        ("records, store only", record_event),
+        ("records + serialization", record_event_serialized),
+    ]
+    print(f"{'case':<28}{'us/event':>12}{'bytes/event':>14}")
+    for name, fn in cases:
+        micros, allocated = measure(fn, args.events)
+        print(f"{name:<28}{micros:>12.2f}{allocated:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+import asyncio
+import heapq
+import itertools
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+from roster_agent_runtime import metrics, settings
+from roster_agent_runtime.agents import AgentHandle
+from roster_agent_runtime.logs import app_logger
+from roster_agent_runtime.models.records import record
+from roster_agent_runtime.util.backoff import Backoff
+
+logger = app_logger()
+
+ActivityConsumer = Callable[[str, dict], Awaitable[None]]
+
+
+@record
+class ActivityEvent:
+    # Sequence numbers increase across all agents on this node,
+    # and start over when the process restarts
+    seq: int
+    agent: str
+    data: dict
+
+
+class ActivitySubscription:
+    """
+    Bounded, lossy view of activity events. A slow subscriber loses its oldest
+    events rather than slowing down the agents it is watching.
+    """
+
+    def __init__(
+        self, hub: "ActivityHub", agent_name: Optional[str], max_queue_size: int
+    ):
+        self.hub = hub
+        self.agent_name = agent_name
+        self.queue: asyncio.Queue[ActivityEvent] = asyncio.Queue(maxsize=max_queue_size)
+        self.dropped = 0
+
+    def matches(self, event: ActivityEvent) -> bool:
+        return self.agent_name is None or self.agent_name == event.agent
+
+    def offer(self, event: ActivityEvent):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+            self.hub.events_dropped.inc()
+        self.queue.put_nowait(event)
+
+    async def get(self) -> ActivityEvent:
+        return await self.queue.get()
+
+    async def __aiter__(self) -> AsyncIterator[ActivityEvent]:
+        while True:
+            yield await self.queue.get()
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class ActivityHub:
+    """
+    Reads each agent's activity stream exactly once and fans it out.
+
+    Consumers (e.g. the uploader) are awaited inline by the agent's reader, so
+    they apply backpressure to that agent only. Subscribers (e.g. SSE clients)
+    get bounded queues, and can replay recent events from a per-agent ring buffer.
+    """
+
+    def __init__(
+        self,
+        replay_buffer_size: int = settings.ACTIVITY_REPLAY_BUFFER_SIZE,
+        subscriber_queue_size: int = settings.ACTIVITY_SUBSCRIBER_QUEUE_SIZE,
+        reader_backoff_max: float = settings.ACTIVITY_READER_BACKOFF_MAX,
+    ):
+        self.replay_buffer_size = replay_buffer_size
+        self.subscriber_queue_size = subscriber_queue_size
+        self.reader_backoff_max = reader_backoff_max
+        self.reader_tasks: dict[str, asyncio.Task] = {}
+        self.buffers: dict[str, deque[ActivityEvent]] = {}
+        self.consumers: list[ActivityConsumer] = []
+        self.subscriptions: set[ActivitySubscription] = set()
+        self._seq = itertools.count(1)
+
+        self.events_received = metrics.counter("activity_hub_events_total")
+        self.events_dropped = metrics.counter("activity_hub_events_dropped_total")
+        self.reader_restarts = metrics.counter("activity_hub_reader_restarts_total")
+        metrics.callback_gauge(
+            "activity_hub_subscribers", lambda: len(self.subscriptions)
+        )
+        metrics.callback_gauge("activity_hub_agents", lambda: len(self.reader_tasks))
+
+    def add_consumer(self, consumer: ActivityConsumer):
+        self.consumers.append(consumer)
+
+    def remove_consumer(self, consumer: ActivityConsumer):
+        if consumer in self.consumers:
+            self.consumers.remove(consumer)
+
+    def register(self, agent_name: str, handle: AgentHandle):
+        # Re-registering (e.g. a rebuilt handle) replaces the previous reader
+        self._cancel_reader(agent_name)
+        logger.debug("(activity-hub) Reading activity stream for agent %s", agent_name)
+        self.buffers.setdefault(agent_name, deque(maxlen=self.replay_buffer_size))
+        self.reader_tasks[agent_name] = asyncio.create_task(
+            self._read_activity_stream(agent_name, handle)
+        )
+
+    def unregister(self, agent_name: str):
+        logger.debug("(activity-hub) Unregistering agent %s", agent_name)
+        self._cancel_reader(agent_name)
+        self.buffers.pop(agent_name, None)
+
+    def _cancel_reader(self, agent_name: str):
+        task = self.reader_tasks.pop(agent_name, None)
+        if task is not None and not task.done():
+            task.cancel()
+
+    async def _read_activity_stream(self, agent_name: str, handle: AgentHandle):
+        # Read again with backoff whenever the stream ends or fails, so the
+        # reader lives exactly as long as the agent is registered
+        backoff = Backoff(maximum=self.reader_backoff_max)
+        while True:
+            try:
+                async for data in handle.activity_stream():
+                    backoff.reset()
+                    await self._publish(agent_name, data)
+                logger.warn(
+                    "(activity-hub) Activity stream for agent %s ended, restarting",
+                    agent_name,
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warn(
+                    "(activity-hub) Activity stream for agent %s failed, restarting: %s",
+                    agent_name,
+                    e,
+                )
+            self.reader_restarts.inc()
+            await backoff.sleep()
+
+    async def _publish(self, agent_name: str, data: dict):
+        self.events_received.inc()
+        event = ActivityEvent(seq=next(self._seq), agent=agent_name, data=data)
+        buffer = self.buffers.get(agent_name)
+        if buffer is not None:
+            buffer.append(event)
+        for subscription in self.subscriptions:
+            if subscription.matches(event):
+                subscription.offer(event)
+        for consumer in self.consumers:
+            try:
+                await consumer(agent_name, data)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(
+                    "(activity-hub) Consumer failed on activity event for agent %s: %s",
+                    agent_name,
+                    e,
+                )
+
+    def _replay_events(
+        self, agent_name: Optional[str], after_seq: int
+    ) -> list[ActivityEvent]:
+        if agent_name is not None:
+            buffers = [self.buffers.get(agent_name, ())]
+        else:
+            buffers = list(self.buffers.values())
+        # Each buffer is ordered by sequence number already
+        return [
+            event
+            for event in heapq.merge(*buffers, key=lambda event: event.seq)
+            if event.seq > after_seq
+        ]
+
+    def subscribe(
+        self,
+        agent_name: Optional[str] = None,
+        replay: bool = False,
+        last_event_id: Optional[int] = None,
+    ) -> ActivitySubscription:
+        """
+        Subscribe to one agent (or all agents when agent_name is None).
+        Buffered events are replayed when replay is set, or when resuming
+        after last_event_id.
+        """
+        subscription = ActivitySubscription(
+            self, agent_name=agent_name, max_queue_size=self.subscriber_queue_size
+        )
+        if replay or last_event_id is not None:
+            for event in self._replay_events(agent_name, last_event_id or 0):
+                subscription.offer(event)
+        self.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: ActivitySubscription):
+        self.subscriptions.discard(subscription)
+
+    def teardown(self):
+        for agent_name in list(self.reader_tasks.keys()):
+            self._cancel_reader(agent_name)
+        self.buffers = {}
+        self.subscriptions = set()
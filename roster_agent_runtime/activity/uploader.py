@@ -0,0 +1,270 @@
+import asyncio
+import gzip
+import os
+import time
+from collections import deque
+from typing import Optional
+
+from roster_agent_runtime import codec, metrics, settings
+from roster_agent_runtime.activity.hub import ActivityHub
+from roster_agent_runtime.http_client import HttpClient
+from roster_agent_runtime.logs import app_logger
+from roster_agent_runtime.outbox import Outbox, OutboxRelay, PartialDeliveryError
+from roster_agent_runtime.singletons import get_activity_hub, get_http_client
+from roster_agent_runtime.util.backoff import Backoff
+
+logger = app_logger()
+
+
+class Compression:
+    GZIP = "gzip"
+    NONE = "none"
+
+
+class ActivityUploader:
+    """
+    Node-wide pipeline for agent activity events.
+
+    Consumes activity from the ActivityHub into a bounded buffer per agent, so
+    a chatty agent only ever blocks itself. A single task drains all buffers
+    fairly and uploads compressed batches when either the batch size or the
+    flush interval is reached.
+    """
+
+    # Responses from a Roster API without the batch endpoint,
+    # in which case events are sent one at a time instead.
+    BATCH_UNSUPPORTED_STATUSES = (404, 405)
+    GZIP_LEVEL = 5
+    # Window over which the upload rate (events/sec) is reported
+    RATE_WINDOW_SECONDS = 10.0
+
+    def __init__(
+        self,
+        url: str = settings.ROSTER_API_ACTIVITY_URL,
+        batch_url: Optional[str] = settings.ROSTER_API_ACTIVITY_BATCH_URL,
+        http_client: Optional[HttpClient] = None,
+        batch_size: int = settings.ACTIVITY_BATCH_SIZE,
+        flush_interval: float = settings.ACTIVITY_FLUSH_INTERVAL,
+        max_pending_per_agent: int = settings.ACTIVITY_MAX_PENDING_PER_AGENT,
+        compression: str = settings.ACTIVITY_COMPRESSION,
+        compression_min_bytes: int = settings.ACTIVITY_COMPRESSION_MIN_BYTES,
+        outbox: Optional[Outbox] = None,
+        activity_hub: Optional[ActivityHub] = None,
+    ):
+        if compression not in (Compression.GZIP, Compression.NONE):
+            raise ValueError(f"Unknown compression: {compression}")
+        self.url = url
+        self.batch_url = batch_url
+        self.http_client = http_client or get_http_client()
+        self.activity_hub = activity_hub or get_activity_hub()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending_per_agent = max_pending_per_agent
+        self.compression = compression
+        self.compression_min_bytes = compression_min_bytes
+        self.backoff = Backoff(maximum=settings.ACTIVITY_BACKOFF_MAX)
+        self.task: Optional[asyncio.Task] = None
+
+        # With an outbox, batches are persisted to disk and delivered
+        # (with retries) by the relay, so an outage does not lose events.
+        if outbox is None and settings.OUTBOX_ENABLED:
+            outbox = Outbox(
+                os.path.join(settings.OUTBOX_DIR, "activity"), name="activity"
+            )
+        self.outbox_relay: Optional[OutboxRelay] = (
+            OutboxRelay(
+                outbox,
+                deliver=self._send_batch,
+                batch_size=batch_size,
+                backoff=Backoff(maximum=settings.ACTIVITY_BACKOFF_MAX),
+            )
+            if outbox is not None
+            else None
+        )
+
+        self._queues: dict[str, asyncio.Queue] = {}
+        # Pushes waiting on a full buffer, which must outlive its agent
+        self._waiting_pushes: dict[str, int] = {}
+        self._pending = 0
+        self._flush_requested: Optional[asyncio.Event] = None
+        self._uploaded_window: deque[tuple[float, int]] = deque()
+
+        self.events_received = metrics.counter("activity_events_total")
+        self.events_uploaded = metrics.counter("activity_events_uploaded_total")
+        self.uploads = metrics.counter("activity_uploads_total")
+        self.upload_failures = metrics.counter("activity_upload_failures_total")
+        self.bytes_sent = metrics.counter("activity_bytes_sent_total")
+        metrics.callback_gauge("activity_pending_events", lambda: self._pending)
+        metrics.callback_gauge("activity_events_per_second", self.events_per_second)
+
+    def _queue_for(self, agent_name: str) -> asyncio.Queue:
+        queue = self._queues.get(agent_name)
+        if queue is None:
+            queue = asyncio.Queue(maxsize=self.max_pending_per_agent)
+            self._queues[agent_name] = queue
+        return queue
+
+    async def push(self, agent_name: str, event: dict):
+        """Buffer an activity event, waiting while this agent's buffer is full."""
+        if self.task is None:
+            raise RuntimeError("ActivityUploader not started")
+        queue = self._queue_for(agent_name)
+        self._waiting_pushes[agent_name] = self._waiting_pushes.get(agent_name, 0) + 1
+        try:
+            await queue.put(event)
+        finally:
+            self._waiting_pushes[agent_name] -= 1
+            if not self._waiting_pushes[agent_name]:
+                del self._waiting_pushes[agent_name]
+        self.events_received.inc()
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self._flush_requested.set()
+
+    def _take_batch(self) -> list[dict]:
+        # Round-robin across agents, so one busy agent cannot starve the rest
+        batch = []
+        while len(batch) < self.batch_size and self._pending:
+            for queue in self._queues.values():
+                if queue.empty():
+                    continue
+                batch.append(queue.get_nowait())
+                self._pending -= 1
+                if len(batch) >= self.batch_size:
+                    break
+        self._remove_drained_queues()
+        return batch
+
+    def _remove_drained_queues(self):
+        # Buffers of agents which are gone (unregistered from the hub) are
+        # dropped once empty, so agent churn does not accumulate them
+        for agent_name, queue in list(self._queues.items()):
+            if (
+                queue.empty()
+                and agent_name not in self.activity_hub.reader_tasks
+                and agent_name not in self._waiting_pushes
+            ):
+                del self._queues[agent_name]
+
+    def _encode_body(self, records: list[bytes]) -> tuple[bytes, dict]:
+        # Records are already JSON, so the batch is assembled without re-encoding
+        body = b"[" + b",".join(records) + b"]"
+        headers = {"Content-Type": "application/json"}
+        if (
+            self.compression == Compression.GZIP
+            and len(body) >= self.compression_min_bytes
+        ):
+            body = gzip.compress(body, compresslevel=self.GZIP_LEVEL)
+            headers["Content-Encoding"] = "gzip"
+        return body, headers
+
+    async def _post(self, url: str, body: bytes, headers: dict):
+        async with self.http_client.post(
+            url, data=body, headers=headers, raise_for_status=True
+        ):
+            pass
+        self.uploads.inc()
+        self.bytes_sent.inc(len(body))
+
+    async def _send_batch(self, records: list[bytes]):
+        if self.batch_url is not None:
+            body, headers = self._encode_body(records)
+            async with self.http_client.post(
+                self.batch_url, data=body, headers=headers
+            ) as resp:
+                if resp.status not in self.BATCH_UNSUPPORTED_STATUSES:
+                    resp.raise_for_status()
+                    self.uploads.inc()
+                    self.bytes_sent.inc(len(body))
+                    self._record_uploaded(len(records))
+                    return
+            logger.warn(
+                "(activity) Batch endpoint %s unavailable, sending events individually",
+                self.batch_url,
+            )
+            self.batch_url = None
+        for i, record in enumerate(records):
+            try:
+                await self._post(self.url, record, {"Content-Type": "application/json"})
+            except Exception as e:
+                if i:
+                    # Only the rest are sent again
+                    raise PartialDeliveryError(i) from e
+                raise
+            self._record_uploaded(1)
+
+    def _record_uploaded(self, count: int):
+        self.events_uploaded.inc(count)
+        now = time.monotonic()
+        self._uploaded_window.append((now, count))
+        while self._uploaded_window[0][0] < now - self.RATE_WINDOW_SECONDS:
+            self._uploaded_window.popleft()
+
+    def events_per_second(self) -> float:
+        cutoff = time.monotonic() - self.RATE_WINDOW_SECONDS
+        uploaded = sum(count for ts, count in self._uploaded_window if ts >= cutoff)
+        return uploaded / self.RATE_WINDOW_SECONDS
+
+    async def _wait_for_flush(self):
+        if self._pending >= self.batch_size:
+            return
+        try:
+            await asyncio.wait_for(
+                self._flush_requested.wait(), timeout=self.flush_interval
+            )
+        except asyncio.TimeoutError:
+            pass
+
+    async def _upload(self, records: list[bytes]):
+        # Retries until delivered; meanwhile agent buffers fill up and apply
+        # backpressure to their activity streams.
+        while True:
+            try:
+                await self._send_batch(records)
+                self.backoff.reset()
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if isinstance(e, PartialDeliveryError):
+                    records = records[e.delivered :]
+                self.upload_failures.inc()
+                delay = self.backoff.next_delay()
+                logger.warn(
+                    "(activity) Failed to upload %d activity events, retrying in %.2fs\n%s",
+                    len(records),
+                    delay,
+                    e,
+                )
+                await asyncio.sleep(delay)
+
+    async def start(self):
+        while True:
+            await self._wait_for_flush()
+            self._flush_requested.clear()
+            batch = self._take_batch()
+            if not batch:
+                continue
+            records = [codec.dumps(event) for event in batch]
+            if self.outbox_relay is not None:
+                await self.outbox_relay.persist(records)
+                continue
+            logger.debug("(activity) Uploading %d activity events", len(records))
+            await self._upload(records)
+
+    def setup(self):
+        if self.task is not None:
+            raise RuntimeError("ActivityUploader already started")
+        self._flush_requested = asyncio.Event()
+        if self.outbox_relay is not None:
+            self.outbox_relay.start()
+        self.task = asyncio.create_task(self.start())
+        self.activity_hub.add_consumer(self.push)
+
+    def teardown(self):
+        self.activity_hub.remove_consumer(self.push)
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        if self.outbox_relay is not None:
+            self.outbox_relay.stop()
@@ -1,47 +1,183 @@
-import json
-from typing import AsyncIterator
+import asyncio
+import time
+from typing import Any, AsyncIterator, Optional
 
 import aiohttp
-from roster_agent_runtime import errors
+from roster_agent_runtime import codec, errors, metrics, settings
 from roster_agent_runtime.constants import EXECUTION_ID_HEADER, EXECUTION_TYPE_HEADER
+from roster_agent_runtime.http_client import (
+    STREAM_TIMEOUT,
+    HttpClient,
+    UnixSocketHttpClient,
+)
 from roster_agent_runtime.logs import app_logger
 from roster_agent_runtime.models.conversation import ConversationMessage
 from roster_agent_runtime.models.messaging import OutgoingMessage
 
 from .base import AgentHandle
+from .ws import AgentConnection, AgentConnectionPool
 
 logger = app_logger()
 
 
+class Transport:
+    HTTP = "http"
+    WEBSOCKET = "websocket"
+
+
+# No total timeout, a long chat is only cut off when the Agent stops sending
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(
+    total=None,
+    connect=settings.AGENT_HTTP_CONNECT_TIMEOUT,
+    sock_read=settings.AGENT_HTTP_READ_TIMEOUT,
+)
+
+
+def create_agent_http_client(
+    name: str, socket_path: Optional[str] = None
+) -> HttpClient:
+    """
+    Keep-alive pool for the handles of one executor's Agents, or for one
+    Agent listening on the Unix socket at socket_path.
+    """
+    kwargs = dict(
+        name=f"agents:{name}",
+        # Streams hold connections for as long as each Agent runs, so only the
+        # per-Agent limit applies, or a large node would starve its own requests
+        limit=0,
+        limit_per_host=settings.AGENT_HTTP_POOL_LIMIT_PER_HOST,
+        timeout=REQUEST_TIMEOUT,
+    )
+    if socket_path is not None:
+        return UnixSocketHttpClient(socket_path, **kwargs)
+    return HttpClient(**kwargs)
+
+
+async def iter_lines(content: aiohttp.StreamReader) -> AsyncIterator[bytes]:
+    """
+    Yield the non-empty lines of a newline-delimited stream, of any length.
+    Each chunk is scanned in place, only a line split across chunks is
+    accumulated, so a large line is not copied once per chunk.
+    """
+    partial = bytearray()
+    async for chunk in content.iter_any():
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            if end == -1:
+                break
+            if partial:
+                partial += chunk[start:end]
+                line = bytes(partial)
+                partial.clear()
+            else:
+                line = chunk[start:end]
+            start = end + 1
+            line = line.strip()
+            if line:
+                yield line
+        partial += chunk[start:]
+    line = bytes(partial).strip()
+    if line:
+        yield line
+
+
 class HttpAgentHandle(AgentHandle):
-    def __init__(self, name: str, url: str):
+    def __init__(
+        self,
+        name: str,
+        url: str,
+        http_client: HttpClient,
+        connections: Optional[AgentConnectionPool] = None,
+    ):
         self.name = name
         self.url = url
+        self.http_client = http_client
+        # With a connection pool, requests and streams share one WebSocket
+        self.connections = connections
 
     @classmethod
-    def build(cls, name: str, url: str) -> "HttpAgentHandle":
+    def build(
+        cls,
+        name: str,
+        url: str,
+        http_client: HttpClient,
+        connections: Optional[AgentConnectionPool] = None,
+    ) -> "HttpAgentHandle":
         # Any other logic here? validation?
-        return cls(name=name, url=url)
+        return cls(name=name, url=url, http_client=http_client, connections=connections)
 
-    async def _request(
-        self, method: str, url: str, *, raise_for_status: bool = True, **kwargs
-    ) -> dict:
+    async def _connection(self) -> Optional[AgentConnection]:
+        if self.connections is None:
+            return None
+        connection = self.connections.get(self.name, self.url, self.http_client)
+        if connection.unsupported:
+            return None
+        if await connection.wait_ready(timeout=settings.AGENT_HTTP_CONNECT_TIMEOUT):
+            return connection
+        return None
+
+    async def _post(self, path: str, payload: dict, headers: dict) -> dict:
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.request(method, url, **kwargs) as response:
-                    response_data = await response.json()
-                    if raise_for_status:
-                        assert response.status == 200, response_data
-                    return response_data
-        except AssertionError as e:
-            raise errors.AgentError(f"Agent returned an error: {e}.") from e
+            async with self.http_client.post(
+                f"{self.url}/{path}", json=payload, headers=headers
+            ) as response:
+                body = await response.read()
+                try:
+                    response_data = codec.loads(body)
+                except codec.DecodeError as e:
+                    raise errors.AgentResponseError(
+                        f"Failed to parse Agent's JSON response: {e}.",
+                        agent=self.name,
+                        status=response.status,
+                    ) from e
+                if response.status != 200:
+                    raise errors.AgentResponseError(
+                        f"Agent returned an error: {response_data}.",
+                        agent=self.name,
+                        status=response.status,
+                    )
+                return response_data
+        except asyncio.TimeoutError as e:
+            raise errors.AgentTimeoutError(
+                f"Agent {self.name} did not respond in time.", agent=self.name
+            ) from e
         except aiohttp.ClientError as e:
-            raise errors.AgentError(f"Could not connect to agent {self.name}.") from e
-        except Exception as e:
-            raise errors.AgentError(
-                f"Failed to parse Agent's JSON response: {e}."
+            raise errors.AgentConnectionError(
+                f"Could not connect to agent {self.name}.", agent=self.name
             ) from e
 
+    async def _request(
+        self, call: str, path: str, payload: dict, headers: Optional[dict] = None
+    ) -> dict:
+        started = time.monotonic()
+        transport = Transport.HTTP
+        try:
+            connection = await self._connection()
+            if connection is not None:
+                transport = Transport.WEBSOCKET
+                try:
+                    return await connection.request(path, payload, headers or {})
+                except errors.AgentRequestNotSentError:
+                    # Dropped between the readiness check and the send
+                    logger.debug(
+                        "(agent-handle) WebSocket closed (agent %s), retrying over HTTP",
+                        self.name,
+                    )
+                    transport = Transport.HTTP
+            return await self._post(path, payload, headers or {})
+        except errors.AgentError:
+            metrics.counter(
+                "agent_http_errors_total",
+                labels={"call": call, "transport": transport},
+            ).inc()
+            raise
+        finally:
+            metrics.histogram(
+                "agent_http_request_seconds",
+                labels={"call": call, "transport": transport},
+            ).observe(time.monotonic() - started)
+
     async def chat(
         self,
         identity: str,
@@ -63,12 +199,7 @@ class HttpAgentHandle(AgentHandle):
                 "role": role,
                 "messages": [message.dict() for message in chat_history],
             }
-            response_data = await self._request(
-                "POST",
-                f"{self.url}/chat",
-                json=payload,
-                headers=headers,
-            )
+            response_data = await self._request("chat", "chat", payload, headers)
             return response_data["message"]
         except KeyError as e:
             raise errors.AgentError(
@@ -86,9 +217,9 @@ class HttpAgentHandle(AgentHandle):
     ) -> None:
         try:
             await self._request(
-                "POST",
-                f"{self.url}/trigger-action",
-                json={
+                "trigger_action",
+                "trigger-action",
+                {
                     "step": step,
                     "action": action,
                     "inputs": inputs,
@@ -107,9 +238,9 @@ class HttpAgentHandle(AgentHandle):
     ) -> None:
         try:
             await self._request(
-                "POST",
-                f"{self.url}/tool-response",
-                json={"invocation_id": invocation_id, "tool": tool, "data": data},
+                "tool_response",
+                "tool-response",
+                {"invocation_id": invocation_id, "tool": tool, "data": data},
             )
         except KeyError as e:
             raise errors.AgentError(
@@ -117,46 +248,59 @@ class HttpAgentHandle(AgentHandle):
             ) from e
 
     async def _byte_stream(self, path: str) -> AsyncIterator[bytes]:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"{self.url}/{path}") as resp:
-                async for line in resp.content:
-                    if line == b"\n":
-                        continue
-                    yield line
+        async with self.http_client.get(
+            f"{self.url}/{path}", timeout=STREAM_TIMEOUT, raise_for_status=True
+        ) as resp:
+            async for line in iter_lines(resp.content):
+                yield line
+
+    async def _event_stream(self, path: str) -> AsyncIterator[Any]:
+        # Yields decoded events, or the raw line when it could not be decoded
+        connection = await self._connection()
+        if connection is not None:
+            async for data in connection.stream(path):
+                if isinstance(data, str):
+                    try:
+                        data = codec.loads(data)
+                    except codec.DecodeError:
+                        pass
+                yield data
+            return
+        async for line in self._byte_stream(path):
+            try:
+                yield codec.loads_nested(line)
+            except codec.DecodeError:
+                yield line
 
     async def outgoing_message_stream(self) -> AsyncIterator[OutgoingMessage]:
-        async for line in self._byte_stream("message-stream"):
+        async for data in self._event_stream("message-stream"):
             logger.debug(
                 "(agent-handle) Received outgoing message (agent %s) %s",
                 self.name,
-                line,
+                data,
             )
-            decoded = line.decode("utf-8").strip()
             try:
-                decoded_data = json.loads(json.loads(decoded))
-                yield OutgoingMessage(**decoded_data)
-            except (ValueError, TypeError, json.JSONDecodeError):
+                yield OutgoingMessage(**data)
+            except (ValueError, TypeError):
                 logger.debug(
-                    "(agent-handle) Skipping malformed activity event (agent %s) %s",
+                    "(agent-handle) Skipping malformed outgoing message (agent %s) %s",
                     self.name,
-                    decoded,
+                    data,
                 )
                 pass
 
     async def activity_stream(self) -> AsyncIterator[dict]:
-        async for line in self._byte_stream("activity-stream"):
+        async for data in self._event_stream("activity-stream"):
             logger.debug(
                 "(agent-handle) Received activity event (agent %s) %s",
                 self.name,
-                line,
+                data,
             )
-            decoded = line.decode("utf-8").strip()
-            try:
-                yield json.loads(json.loads(decoded))
-            except json.JSONDecodeError:
+            if isinstance(data, bytes):
                 logger.debug(
                     "(agent-handle) Skipping malformed activity event (agent %s) %s",
                     self.name,
-                    decoded,
+                    data,
                 )
-                pass
+                continue
+            yield data
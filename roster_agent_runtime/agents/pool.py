@@ -6,7 +6,8 @@ from roster_agent_runtime import errors
 from roster_agent_runtime.agents import AgentHandle
 from roster_agent_runtime.executors import AgentExecutor
 from roster_agent_runtime.executors.events import ResourceStatusEvent
-from roster_agent_runtime.models.agent import AgentSpec, AgentStatus
+from roster_agent_runtime.models.agent import AgentSpec
+from roster_agent_runtime.models.records import AgentStatusRecord
 
 
 class AgentPool:
@@ -25,12 +26,12 @@ class AgentPool:
             *(executor.teardown() for executor in self.executors.values())
         )
 
-    def list_agents(self) -> list[AgentStatus]:
+    def list_agents(self) -> list[AgentStatusRecord]:
         return list(
             chain(*(executor.list_agents() for executor in self.executors.values()))
         )
 
-    def get_agent(self, name: str) -> AgentStatus:
+    def get_agent(self, name: str) -> AgentStatusRecord:
         for executor in self.executors.values():
             try:
                 return executor.get_agent(name)
@@ -38,10 +39,10 @@ class AgentPool:
                 pass
         raise errors.AgentNotFoundError(agent=name)
 
-    async def create_agent(self, agent: AgentSpec) -> AgentStatus:
+    async def create_agent(self, agent: AgentSpec) -> AgentStatusRecord:
         return await self.executors[agent.executor].create_agent(agent)
 
-    async def update_agent(self, agent: AgentSpec) -> AgentStatus:
+    async def update_agent(self, agent: AgentSpec) -> AgentStatusRecord:
         return await self.executors[agent.executor].update_agent(agent)
 
     async def delete_agent(self, name: str) -> None:
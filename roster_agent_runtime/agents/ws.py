@@ -0,0 +1,388 @@
+import asyncio
+import itertools
+from typing import AsyncIterator, Optional
+
+import aiohttp
+from roster_agent_runtime import codec, errors, metrics, settings
+from roster_agent_runtime.http_client import HttpClient
+from roster_agent_runtime.logs import app_logger
+from roster_agent_runtime.util.backoff import Backoff
+
+logger = app_logger()
+
+# NOTE: One WebSocket per Agent (at /ws) carries the request channels
+#   (chat, trigger-action, tool-response) and the stream channels
+#   (message-stream, activity-stream) as JSON frames:
+#     runtime -> agent:
+#       {"type": "request", "id": 1, "channel": "chat", "headers": {...}, "data": {...}}
+#       {"type": "subscribe", "channel": "activity-stream", "credits": 64}
+#       {"type": "credit", "channel": "activity-stream", "credits": 32}
+#       {"type": "unsubscribe", "channel": "activity-stream"}
+#     agent -> runtime:
+#       {"type": "response", "id": 1, "status": 200, "data": {...}}
+#       {"type": "event", "channel": "activity-stream", "data": {...}}
+#   Each event spends one credit, so an Agent never sends more stream events
+#   than the runtime has room to buffer. Subscriptions and credits do not
+#   survive a reconnect; the runtime subscribes again with its free space.
+#   Agents without a /ws endpoint are served over plain HTTP instead.
+
+UNSUPPORTED_STATUSES = (404, 405)
+
+
+class FrameType:
+    REQUEST = "request"
+    RESPONSE = "response"
+    SUBSCRIBE = "subscribe"
+    UNSUBSCRIBE = "unsubscribe"
+    CREDIT = "credit"
+    EVENT = "event"
+
+
+class StreamChannel:
+    """Events buffered for the one reader of a stream channel."""
+
+    def __init__(self, name: str, window: int):
+        self.name = name
+        self.window = window
+        # Closed with a None sentinel
+        self.queue: asyncio.Queue[Optional[dict]] = asyncio.Queue()
+        # Credits the Agent has yet to spend on this connection
+        self.outstanding = 0
+
+    def grant(self, minimum: int = 1) -> int:
+        credits = self.window - self.queue.qsize() - self.outstanding
+        if credits < minimum:
+            return 0
+        self.outstanding += credits
+        return credits
+
+
+class AgentConnection:
+    """
+    Multiplexed WebSocket to one Agent, reconnected with backoff for as long
+    as the connection is open. Requests in flight when the socket drops fail
+    with AgentConnectionError; stream readers wait for the next connection.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        url: str,
+        http_client: HttpClient,
+        window: int = settings.AGENT_WS_STREAM_WINDOW,
+        max_in_flight: int = settings.AGENT_WS_MAX_IN_FLIGHT,
+        request_timeout: float = settings.AGENT_HTTP_READ_TIMEOUT,
+        heartbeat: float = settings.AGENT_WS_HEARTBEAT,
+    ):
+        self.name = name
+        self.url = url
+        self.http_client = http_client
+        self.window = window
+        self.request_timeout = request_timeout
+        self.heartbeat = heartbeat
+        self.backoff = Backoff(maximum=settings.AGENT_WS_BACKOFF_MAX)
+        self.task: Optional[asyncio.Task] = None
+        self.ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        # Set once connected, or once the Agent turns out not to support it
+        self.ready = asyncio.Event()
+        self.unsupported = False
+        self.closed = False
+        self.pending: dict[int, asyncio.Future] = {}
+        self.streams: dict[str, StreamChannel] = {}
+        self.in_flight = asyncio.Semaphore(max_in_flight)
+        self._ids = itertools.count(1)
+
+        self.connects = metrics.counter("agent_ws_connects_total")
+        self.disconnects = metrics.counter("agent_ws_disconnects_total")
+
+    @property
+    def ws_url(self) -> str:
+        if self.url.startswith("https://"):
+            return f"wss://{self.url[len('https://'):]}/ws"
+        return f"ws://{self.url[len('http://'):]}/ws"
+
+    def start(self):
+        if self.task is None and not self.closed:
+            self.task = asyncio.create_task(self.run())
+
+    async def wait_ready(self, timeout: float) -> bool:
+        """
+        Wait for the connection, returning False if the Agent lacks /ws or is
+        not connected in time (callers use HTTP meanwhile, it keeps trying).
+        """
+        self.start()
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.debug(
+                "(agent-ws) Not connected to agent %s yet, using HTTP", self.name
+            )
+            return False
+        return not self.unsupported
+
+    async def _send(self, frame: dict):
+        if self.ws is None or self.ws.closed:
+            raise errors.AgentConnectionError(
+                f"Lost connection to agent {self.name}.", agent=self.name
+            )
+        await self.ws.send_bytes(codec.dumps(frame))
+
+    async def _send_quietly(self, frame: dict):
+        # Lost frames are resent on reconnect (subscriptions and credits)
+        try:
+            await self._send(frame)
+        except (errors.AgentConnectionError, ConnectionError, RuntimeError):
+            pass
+
+    async def request(self, channel: str, data: dict, headers: dict) -> dict:
+        async with self.in_flight:
+            request_id = next(self._ids)
+            future = asyncio.get_running_loop().create_future()
+            self.pending[request_id] = future
+            try:
+                try:
+                    await self._send(
+                        {
+                            "type": FrameType.REQUEST,
+                            "id": request_id,
+                            "channel": channel,
+                            "headers": headers,
+                            "data": data,
+                        }
+                    )
+                except (
+                    errors.AgentConnectionError,
+                    ConnectionError,
+                    RuntimeError,
+                ) as e:
+                    # The Agent never saw this request, so it is safe to resend
+                    raise errors.AgentRequestNotSentError(
+                        f"Lost connection to agent {self.name}.", agent=self.name
+                    ) from e
+                # Covers the whole response, which is one frame; over HTTP the
+                # same setting only bounds the time between reads
+                frame = await asyncio.wait_for(future, timeout=self.request_timeout)
+            except asyncio.TimeoutError as e:
+                raise errors.AgentTimeoutError(
+                    f"Agent {self.name} did not respond in time.", agent=self.name
+                ) from e
+            except (ConnectionError, RuntimeError) as e:
+                raise errors.AgentConnectionError(
+                    f"Lost connection to agent {self.name}.", agent=self.name
+                ) from e
+            finally:
+                self.pending.pop(request_id, None)
+        status = frame.get("status", 200)
+        if status != 200:
+            raise errors.AgentResponseError(
+                f"Agent returned an error: {frame.get('data')}.",
+                agent=self.name,
+                status=status,
+            )
+        return frame.get("data")
+
+    async def stream(self, channel: str) -> AsyncIterator[dict]:
+        stream = StreamChannel(channel, self.window)
+        # A new reader (e.g. after the handle is rebuilt) replaces the last
+        previous = self.streams.get(channel)
+        if previous is not None:
+            previous.queue.put_nowait(None)
+        self.streams[channel] = stream
+        self.start()
+        if self.ws is not None:
+            await self._send_quietly(
+                {
+                    "type": FrameType.SUBSCRIBE,
+                    "channel": channel,
+                    "credits": stream.grant(),
+                }
+            )
+        try:
+            while True:
+                data = await stream.queue.get()
+                if data is None:
+                    return
+                yield data
+                if self.ws is None:
+                    continue
+                # Granted in batches, rather than a frame per event
+                credits = stream.grant(minimum=max(1, stream.window // 2))
+                if credits:
+                    await self._send_quietly(
+                        {
+                            "type": FrameType.CREDIT,
+                            "channel": channel,
+                            "credits": credits,
+                        }
+                    )
+        finally:
+            if self.streams.get(channel) is stream:
+                del self.streams[channel]
+                if self.ws is not None and not self.closed:
+                    await self._send_quietly(
+                        {"type": FrameType.UNSUBSCRIBE, "channel": channel}
+                    )
+
+    def _handle_frame(self, frame: dict):
+        frame_type = frame.get("type")
+        if frame_type == FrameType.RESPONSE:
+            future = self.pending.get(frame.get("id"))
+            if future is not None and not future.done():
+                future.set_result(frame)
+        elif frame_type == FrameType.EVENT:
+            stream = self.streams.get(frame.get("channel"))
+            if stream is None:
+                return
+            stream.outstanding = max(0, stream.outstanding - 1)
+            if frame.get("data") is not None:
+                stream.queue.put_nowait(frame["data"])
+        else:
+            logger.debug(
+                "(agent-ws) Unknown frame type from agent %s: %s", self.name, frame_type
+            )
+
+    async def _read(self, ws: aiohttp.ClientWebSocketResponse):
+        async for message in ws:
+            if message.type not in (aiohttp.WSMsgType.BINARY, aiohttp.WSMsgType.TEXT):
+                break
+            try:
+                frame = codec.loads(message.data)
+            except codec.DecodeError as e:
+                logger.debug(
+                    "(agent-ws) Skipping malformed frame from agent %s: %s",
+                    self.name,
+                    e,
+                )
+                continue
+            if isinstance(frame, dict):
+                self._handle_frame(frame)
+
+    async def _connect(self) -> Optional[aiohttp.ClientWebSocketResponse]:
+        try:
+            return await self.http_client.session.ws_connect(
+                self.ws_url, heartbeat=self.heartbeat, max_msg_size=0
+            )
+        except aiohttp.WSServerHandshakeError as e:
+            if e.status not in UNSUPPORTED_STATUSES:
+                raise
+            logger.info(
+                "(agent-ws) Agent %s does not support WebSockets, using HTTP",
+                self.name,
+            )
+            return None
+
+    async def _on_connect(self, ws: aiohttp.ClientWebSocketResponse):
+        self.ws = ws
+        self.connects.inc()
+        self.backoff.reset()
+        for stream in self.streams.values():
+            stream.outstanding = 0
+            await self._send_quietly(
+                {
+                    "type": FrameType.SUBSCRIBE,
+                    "channel": stream.name,
+                    "credits": stream.grant(),
+                }
+            )
+        self.ready.set()
+
+    def _on_disconnect(self):
+        self.ws = None
+        self.ready.clear()
+        self.disconnects.inc()
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("WebSocket closed"))
+
+    async def run(self):
+        while not self.closed:
+            try:
+                ws = await self._connect()
+                if ws is None:
+                    self.unsupported = True
+                    self.ready.set()
+                    return
+                try:
+                    await self._on_connect(ws)
+                    await self._read(ws)
+                finally:
+                    await ws.close()
+                    self._on_disconnect()
+                logger.debug("(agent-ws) Connection to agent %s closed", self.name)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.debug(
+                    "(agent-ws) Connection to agent %s failed: %s", self.name, e
+                )
+            await self.backoff.sleep()
+
+    async def close(self):
+        self.closed = True
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        for stream in self.streams.values():
+            stream.queue.put_nowait(None)
+        self.streams = {}
+
+
+class AgentConnectionPool:
+    """WebSocket connections to one executor's Agents, which outlive their handles."""
+
+    def __init__(
+        self,
+        http_client: HttpClient,
+        window: int = settings.AGENT_WS_STREAM_WINDOW,
+        max_in_flight: int = settings.AGENT_WS_MAX_IN_FLIGHT,
+    ):
+        self.http_client = http_client
+        self.window = window
+        self.max_in_flight = max_in_flight
+        self.connections: dict[str, AgentConnection] = {}
+        self._closing: set[asyncio.Task] = set()
+        metrics.callback_gauge(
+            "agent_ws_connections",
+            lambda: sum(1 for conn in self.connections.values() if conn.ws is not None),
+        )
+
+    def get(
+        self, name: str, url: str, http_client: Optional[HttpClient] = None
+    ) -> AgentConnection:
+        # Agents behind their own client (e.g. a Unix socket) pass it in
+        http_client = http_client or self.http_client
+        connection = self.connections.get(name)
+        if (
+            connection is None
+            or connection.url != url
+            or connection.http_client is not http_client
+        ):
+            if connection is not None:
+                # The Agent moved (e.g. it was recreated on another port)
+                task = asyncio.create_task(connection.close())
+                self._closing.add(task)
+                task.add_done_callback(self._closing.discard)
+            connection = AgentConnection(
+                name,
+                url,
+                http_client,
+                window=self.window,
+                max_in_flight=self.max_in_flight,
+            )
+            self.connections[name] = connection
+        return connection
+
+    async def close(self, name: str):
+        connection = self.connections.pop(name, None)
+        if connection is not None:
+            await connection.close()
+
+    async def teardown(self):
+        await asyncio.gather(
+            *(connection.close() for connection in self.connections.values())
+        )
+        self.connections = {}
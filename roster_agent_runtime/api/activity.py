@@ -0,0 +1,84 @@
+import asyncio
+from typing import AsyncIterator, Optional
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import StreamingResponse
+from roster_agent_runtime import codec, settings
+from roster_agent_runtime.activity.hub import ActivityEvent
+from roster_agent_runtime.singletons import get_activity_hub
+
+router = APIRouter()
+
+
+def format_sse(event: ActivityEvent) -> bytes:
+    return b"id: %d\nevent: activity\ndata: %s\n\n" % (
+        event.seq,
+        codec.dumps({"agent": event.agent, "data": event.data}),
+    )
+
+
+async def sse_stream(
+    agent_name: Optional[str], replay: bool, last_event_id: Optional[int]
+) -> AsyncIterator[bytes]:
+    # Subscribe once streaming starts, so the subscription is always closed
+    subscription = get_activity_hub().subscribe(
+        agent_name=agent_name, replay=replay, last_event_id=last_event_id
+    )
+    try:
+        while True:
+            try:
+                event = await asyncio.wait_for(
+                    subscription.get(),
+                    timeout=settings.ACTIVITY_SSE_HEARTBEAT_INTERVAL,
+                )
+            except asyncio.TimeoutError:
+                # Comment line, keeps idle connections (and proxies) open
+                yield b": keepalive\n\n"
+                continue
+            yield format_sse(event)
+    finally:
+        subscription.close()
+
+
+def _parse_last_event_id(last_event_id: Optional[str]) -> Optional[int]:
+    if last_event_id is None:
+        return None
+    try:
+        return int(last_event_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+
+
+def _stream_response(
+    agent_name: Optional[str], replay: bool, last_event_id: Optional[str]
+) -> StreamingResponse:
+    return StreamingResponse(
+        sse_stream(agent_name, replay, _parse_last_event_id(last_event_id)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+@router.get("/activity-stream", tags=["Activity"])
+async def stream_all_activity(
+    replay: bool = False, last_event_id: Optional[str] = Header(None)
+) -> StreamingResponse:
+    """
+    Server-Sent Events of every agent's activity. Event ids (and so
+    Last-Event-ID) are sequence numbers local to this process, which start
+    over when it restarts; resume with replay after a restart instead.
+    """
+    return _stream_response(None, replay, last_event_id)
+
+
+@router.get("/agent/{name}/activity-stream", tags=["AgentResource", "Activity"])
+async def stream_agent_activity(
+    name: str, replay: bool = False, last_event_id: Optional[str] = Header(None)
+) -> StreamingResponse:
+    """
+    Server-Sent Events of one agent's activity, see stream_all_activity
+    for how Last-Event-ID behaves across restarts.
+    """
+    if name not in get_activity_hub().reader_tasks:
+        raise HTTPException(status_code=404, detail=f"Agent {name} not found")
+    return _stream_response(name, replay, last_event_id)
@@ -2,8 +2,14 @@ from fastapi import APIRouter, HTTPException, Request
 from roster_agent_runtime import errors
 from roster_agent_runtime.constants import EXECUTION_ID_HEADER, EXECUTION_TYPE_HEADER
 from roster_agent_runtime.logs import app_logger
-from roster_agent_runtime.models.api.messaging import ChatPromptAgentArgs
-from roster_agent_runtime.singletons import get_agent_service
+from roster_agent_runtime.messaging.base import PublishError
+from roster_agent_runtime.messaging.rpc import RpcError, RpcTimeoutError
+from roster_agent_runtime.models.api.messaging import (
+    ChatPromptAgentArgs,
+    DeadLetter,
+    ReplayDeadLettersArgs,
+)
+from roster_agent_runtime.singletons import get_agent_service, get_message_broker
 
 router = APIRouter()
 
@@ -30,3 +36,28 @@ async def chat_prompt_agent(
         )
     except errors.AgentNotFoundError as e:
         raise HTTPException(status_code=404, detail=e.message)
+    except (errors.AgentTimeoutError, RpcTimeoutError) as e:
+        raise HTTPException(status_code=504, detail=e.message)
+    except (errors.AgentConnectionError, errors.AgentResponseError, RpcError) as e:
+        raise HTTPException(status_code=502, detail=e.message)
+    except PublishError as e:
+        raise HTTPException(status_code=503, detail=e.message)
+
+
+@router.get("/dead-letters", tags=["Messaging"])
+async def list_dead_letters(limit: int = 100, offset: int = 0) -> list[DeadLetter]:
+    try:
+        return await get_message_broker().list_dead_letters(limit=limit, offset=offset)
+    except PublishError as e:
+        raise HTTPException(status_code=503, detail=e.message)
+
+
+@router.post("/dead-letters/replay", tags=["Messaging"])
+async def replay_dead_letters(args: ReplayDeadLettersArgs) -> dict:
+    try:
+        replayed = await get_message_broker().replay_dead_letters(
+            ids=args.ids, limit=args.limit, offset=args.offset
+        )
+    except PublishError as e:
+        raise HTTPException(status_code=503, detail=e.message)
+    return {"replayed": replayed}
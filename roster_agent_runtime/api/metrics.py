@@ -0,0 +1,9 @@
+from fastapi import APIRouter
+from roster_agent_runtime import metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics", tags=["Runtime"])
+async def get_metrics() -> dict:
+    return metrics.REGISTRY.snapshot()
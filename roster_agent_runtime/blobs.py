@@ -0,0 +1,220 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from functools import partial
+from typing import Optional
+
+from roster_agent_runtime import errors, metrics, settings
+from roster_agent_runtime.logs import app_logger
+from roster_agent_runtime.models.messaging import BlobReference
+
+logger = app_logger()
+
+
+class BlobNotFoundError(errors.RosterError):
+    """Exception raised when a referenced blob does not exist (e.g. it expired)."""
+
+    def __init__(self, message="The referenced blob was not found.", details=None):
+        super().__init__(message, details)
+
+
+class BlobStore(ABC):
+    """
+    Content-addressed store for message data too large to send through the
+    broker. Blobs are keyed by their SHA-256, so identical data is stored once.
+    """
+
+    def __init__(self, store_id: str):
+        # Identifies the store to peers, which can only resolve its references
+        # if they share it
+        self.store_id = store_id
+
+    @staticmethod
+    def key_for(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    @abstractmethod
+    async def put(self, data: bytes) -> BlobReference:
+        """store data (or refresh the existing copy), returning its reference"""
+
+    @abstractmethod
+    async def get(self, reference: BlobReference) -> bytes:
+        """read data, raising BlobNotFoundError if it does not exist"""
+
+    @abstractmethod
+    async def pin(self, reference: BlobReference, holder: str):
+        """keep a blob from being swept until the holder unpins it"""
+
+    @abstractmethod
+    async def unpin(self, reference: BlobReference, holder: str):
+        """release the holder's pin, the blob is then kept for another TTL"""
+
+    @abstractmethod
+    async def sweep(self, max_age: float) -> int:
+        """remove unpinned blobs unused for longer than max_age, returning how many"""
+
+    def setup(self):
+        """start background tasks, if any"""
+
+    def teardown(self):
+        """stop background tasks, if any"""
+
+
+class LocalBlobStore(BlobStore):
+    """
+    Blobs as files under a directory, fanned out by key prefix. A blob's
+    modification time is refreshed whenever it is stored again or read, and
+    the sweeper removes blobs whose time is older than the TTL. Each pin is an
+    empty file beside the blob, and the sweeper skips blobs with any pins.
+    """
+
+    PIN_SUFFIX = ".pin"
+
+    def __init__(
+        self,
+        directory: str = settings.BLOB_STORE_DIR,
+        store_id: str = settings.BLOB_STORE_ID,
+        ttl: float = settings.BLOB_TTL,
+        sweep_interval: float = settings.BLOB_SWEEP_INTERVAL,
+    ):
+        super().__init__(store_id)
+        self.directory = directory
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self.task: Optional[asyncio.Task] = None
+        os.makedirs(directory, exist_ok=True)
+
+        self.stored = metrics.counter("blob_store_blobs_stored_total")
+        self.deduplicated = metrics.counter("blob_store_blobs_deduplicated_total")
+        self.bytes_stored = metrics.counter("blob_store_bytes_stored_total")
+        self.swept = metrics.counter("blob_store_blobs_swept_total")
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    async def _run(self, func, *args):
+        # Blobs are large, keep disk I/O off the event loop
+        return await asyncio.get_running_loop().run_in_executor(
+            None, partial(func, *args)
+        )
+
+    def _write(self, key: str, data: bytes) -> bool:
+        path = self._path(key)
+        if os.path.exists(path):
+            os.utime(path)
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written aside and renamed, so readers never see a partial blob
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return True
+
+    async def put(self, data: bytes) -> BlobReference:
+        key = self.key_for(data)
+        if await self._run(self._write, key, data):
+            self.stored.inc()
+            self.bytes_stored.inc(len(data))
+        else:
+            self.deduplicated.inc()
+        return BlobReference(store=self.store_id, key=key, size=len(data))
+
+    def _read(self, key: str) -> bytes:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            raise BlobNotFoundError(details={"key": key})
+        os.utime(path)
+        return data
+
+    async def get(self, reference: BlobReference) -> bytes:
+        if reference.store != self.store_id:
+            raise BlobNotFoundError(
+                "The blob is in another store.", details={"store": reference.store}
+            )
+        data = await self._run(self._read, reference.key)
+        if self.key_for(data) != reference.key:
+            raise BlobNotFoundError("The blob is corrupt.", details=reference.key)
+        return data
+
+    def _pin_path(self, key: str, holder: str) -> str:
+        return f"{self._path(key)}.{holder}{self.PIN_SUFFIX}"
+
+    def _pin(self, key: str, holder: str):
+        path = self._pin_path(key, holder)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb"):
+            pass
+
+    def _unpin(self, key: str, holder: str):
+        try:
+            os.unlink(self._pin_path(key, holder))
+        except FileNotFoundError:
+            pass
+        try:
+            os.utime(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    async def pin(self, reference: BlobReference, holder: str):
+        await self._run(self._pin, reference.key, holder)
+
+    async def unpin(self, reference: BlobReference, holder: str):
+        await self._run(self._unpin, reference.key, holder)
+
+    def _sweep(self, max_age: float) -> int:
+        cutoff = time.time() - max_age
+        removed = 0
+        for dirpath, _, filenames in os.walk(self.directory):
+            pinned = {
+                filename.split(".", 1)[0]
+                for filename in filenames
+                if filename.endswith(self.PIN_SUFFIX)
+            }
+            for filename in filenames:
+                if filename.endswith(self.PIN_SUFFIX) or filename in pinned:
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.unlink(path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+    async def sweep(self, max_age: float) -> int:
+        removed = await self._run(self._sweep, max_age)
+        self.swept.inc(removed)
+        return removed
+
+    async def _sweep_periodically(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                removed = await self.sweep(self.ttl)
+            except OSError as e:
+                logger.warn("(blob-store) Failed to sweep expired blobs: %s", e)
+                continue
+            if removed:
+                logger.debug("(blob-store) Removed %d expired blobs", removed)
+
+    def setup(self):
+        if self.task is not None:
+            raise RuntimeError("LocalBlobStore already started")
+        self.task = asyncio.create_task(self._sweep_periodically())
+
+    def teardown(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
@@ -0,0 +1,85 @@
+import json
+from typing import Any, Callable, Union
+
+from roster_agent_runtime import settings
+
+# NOTE: JSON encoding/decoding is on the hot path for every message and event,
+#   so the fastest available backend is used. Everything works on bytes.
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # pragma: no cover
+    msgspec = None
+
+Buffer = Union[bytes, bytearray, memoryview, str]
+
+
+class DecodeError(ValueError):
+    """Raised when data cannot be decoded, regardless of backend."""
+
+
+def _select_backend(preferred: str) -> str:
+    available = {
+        "orjson": orjson is not None,
+        "msgspec": msgspec is not None,
+        "json": True,
+    }
+    if preferred != "auto":
+        if not available.get(preferred):
+            raise ImportError(f"JSON codec backend '{preferred}' is not available")
+        return preferred
+    return next(name for name, is_available in available.items() if is_available)
+
+
+def _make_codec(backend: str) -> tuple[Callable[[Any], bytes], Callable[[Buffer], Any]]:
+    if backend == "orjson":
+        encode, decode = orjson.dumps, orjson.loads
+        decode_errors = (orjson.JSONDecodeError,)
+    elif backend == "msgspec":
+        encode = msgspec.json.Encoder().encode
+        decode = msgspec.json.Decoder().decode
+        decode_errors = (msgspec.DecodeError,)
+    else:
+
+        def encode(obj: Any) -> bytes:
+            return json.dumps(obj, separators=(",", ":")).encode()
+
+        def decode(data: Buffer) -> Any:
+            # json only takes str, bytes and bytearray
+            if isinstance(data, memoryview):
+                data = data.tobytes()
+            return json.loads(data)
+
+        decode_errors = (json.JSONDecodeError, UnicodeDecodeError)
+
+    def loads(data: Buffer) -> Any:
+        try:
+            return decode(data)
+        except decode_errors as e:
+            raise DecodeError(str(e)) from e
+
+    return encode, loads
+
+
+BACKEND = _select_backend(settings.JSON_CODEC)
+dumps, loads = _make_codec(BACKEND)
+
+
+def loads_nested(data: Buffer) -> Any:
+    # Some peers JSON-encode an already encoded JSON document.
+    # Decode the inner document only when the outer one turns out to be a string,
+    # so peers sending plain JSON skip the second pass entirely.
+    decoded = loads(data)
+    if isinstance(decoded, str):
+        return loads(decoded)
+    return decoded
+
+
+def dumps_str(obj: Any) -> str:
+    # For APIs which insist on text (e.g. aiohttp's json_serialize)
+    return dumps(obj).decode()
@@ -3,3 +3,4 @@ LOGGER_NAME = "roster_agent_runtime"
 
 EXECUTION_ID_HEADER = "X-Roster-Execution-ID"
 EXECUTION_TYPE_HEADER = "X-Roster-Execution-Type"
+RESOURCE_VERSION_HEADER = "X-Roster-Resource-Version"
@@ -14,7 +14,8 @@ from roster_agent_runtime.executors.events import (
 from roster_agent_runtime.informers.events.spec import RosterResourceEvent
 from roster_agent_runtime.informers.roster import RosterInformer
 from roster_agent_runtime.logs import app_logger
-from roster_agent_runtime.models.agent import AgentSpec, AgentStatus
+from roster_agent_runtime.models.agent import AgentSpec
+from roster_agent_runtime.models.records import AgentStatusRecord
 from roster_agent_runtime.notifier import RosterNotifier
 from roster_agent_runtime.singletons import get_roster_informer, get_roster_notifier
 
@@ -135,7 +136,12 @@ class AgentController:
         else:
             logger.debug("(agent-control) Unknown event: %s", event)
 
-        self.reconciliation_queue.put_nowait(True)
+        self._request_reconcile()
+
+    def _request_reconcile(self):
+        # One pending request covers every change made before it is handled
+        if self.reconciliation_queue.empty():
+            self.reconciliation_queue.put_nowait(True)
 
     def setup_spec_listeners(self):
         self.roster_informer.add_event_listener(self._handle_spec_event)
@@ -147,15 +153,18 @@ class AgentController:
         if event.event_type == EventType.PUT:
             try:
                 agent = event.get_agent_status()
-                self.store.put_agent_status(agent)
             except ValueError:
                 return
+            if self.store.current.get(agent.name) == agent:
+                # Already known, e.g. the executor reporting the controller's own change
+                return
+            self.store.put_agent_status(agent)
         elif event.event_type == EventType.DELETE:
             try:
                 self.store.delete_agent_status(event.name)
             except errors.AgentNotFoundError:
                 return
-        self.reconciliation_queue.put_nowait(True)
+        self._request_reconcile()
 
     def _handle_status_event(self, event: ResourceStatusEvent):
         if event.resource_type == Resource.AGENT:
@@ -176,7 +185,7 @@ class AgentController:
             logger.info("Controller reconciled.")
 
     @staticmethod
-    def agent_matches_spec(agent: AgentStatus, spec: AgentSpec) -> bool:
+    def agent_matches_spec(agent: AgentStatusRecord, spec: AgentSpec) -> bool:
         name_matches = agent.name == spec.name
         if not name_matches:
             return False
@@ -206,7 +215,7 @@ class AgentController:
                 await self.delete_agent(agent.name)
         logger.debug("(rec-agents) Final agents: %s", self.store.current)
 
-    async def create_agent(self, agent: AgentSpec) -> AgentStatus:
+    async def create_agent(self, agent: AgentSpec) -> AgentStatusRecord:
         if agent.name in self.store.current:
             raise errors.AgentAlreadyExistsError(agent=agent.name)
         agent_status = await self.pool.create_agent(agent)
@@ -214,7 +223,7 @@ class AgentController:
         logger.info("Created agent %s", agent.name)
         return agent_status
 
-    async def update_agent(self, agent: AgentSpec) -> AgentStatus:
+    async def update_agent(self, agent: AgentSpec) -> AgentStatusRecord:
         if agent.name not in self.store.current:
             raise errors.AgentNotFoundError(agent=agent.name)
         agent_status = await self.pool.update_agent(agent)
@@ -222,7 +231,7 @@ class AgentController:
         logger.info("Updated agent %s", agent.name)
         return agent_status
 
-    def list_agents(self) -> list[AgentStatus]:
+    def list_agents(self) -> list[AgentStatusRecord]:
         return list(self.store.current.values())
 
     async def delete_agent(self, name: str) -> None:
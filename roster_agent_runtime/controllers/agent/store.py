@@ -1,4 +1,4 @@
-from typing import Callable, Optional
+from typing import Callable, Optional, Union
 
 from roster_agent_runtime import errors
 from roster_agent_runtime.controllers.events.status import (
@@ -8,6 +8,7 @@ from roster_agent_runtime.controllers.events.status import (
 )
 from roster_agent_runtime.logs import app_logger
 from roster_agent_runtime.models.agent import AgentSpec, AgentStatus
+from roster_agent_runtime.models.records import AgentStatusRecord
 
 logger = app_logger()
 
@@ -20,7 +21,7 @@ class AgentControllerStore:
         ] = None,
     ):
         self.desired: dict[str, AgentSpec] = {}
-        self.current: dict[str, AgentStatus] = {}
+        self.current: dict[str, AgentStatusRecord] = {}
         self.status_listeners = status_listeners or []
 
     def add_status_listener(self, listener: Callable[[ControllerStatusEvent], None]):
@@ -51,15 +52,17 @@ class AgentControllerStore:
         except KeyError:
             raise errors.AgentNotFoundError(agent_name)
 
-    def put_agent_status(self, agent_status: AgentStatus):
+    def put_agent_status(self, agent_status: Union[AgentStatus, AgentStatusRecord]):
+        agent_status = AgentStatusRecord.coerce(agent_status)
         logger.debug("(agent-ctrl-store) put agent status: %s", agent_status.name)
         self.current[agent_status.name] = agent_status
+        # Records are immutable, so the event can share the stored record
         self._notify_status_listeners(
             ControllerStatusEvent(
                 resource_type=Resource.AGENT,
                 event_type=EventType.PUT,
                 name=agent_status.name,
-                status=agent_status.dict(),
+                status=agent_status,
             )
         )
 
@@ -1,8 +1,8 @@
 from enum import Enum
 from typing import Optional
 
-from pydantic import BaseModel
 from roster_agent_runtime.models.agent import AgentStatus
+from roster_agent_runtime.models.records import AgentStatusRecord, record
 
 
 class Resource(Enum):
@@ -15,19 +15,23 @@ class EventType(Enum):
 
 
 # TODO: there is no need for a distinct type here, should reconcile w/ ResourceStatusEvent
-class ControllerStatusEvent(BaseModel):
+@record
+class ControllerStatusEvent:
     resource_type: Resource
     event_type: EventType
     name: str
-    status: Optional[dict] = None
+    status: Optional[AgentStatusRecord] = None
 
-    class Config:
-        use_enum_values = True
+    def dict(self) -> dict:
+        # Serialization boundary: matches the payload shape expected by the Roster API
+        return {
+            "resource_type": self.resource_type.value,
+            "event_type": self.event_type.value,
+            "name": self.name,
+            "status": self.status.to_dict() if self.status is not None else None,
+        }
 
     def get_agent_status(self) -> AgentStatus:
-        try:
-            if self.resource_type == Resource.AGENT and self.status is not None:
-                return AgentStatus(**self.status)
-        except TypeError:
-            raise ValueError("Invalid resource_type or data type for agent status")
+        if self.resource_type == Resource.AGENT and self.status is not None:
+            return self.status.to_model()
         raise ValueError("Invalid resource_type or data type for agent status")
@@ -82,6 +82,55 @@ class AgentNotFoundError(AgentError):
         self.agent = agent
 
 
+class AgentNotReadyError(AgentError):
+    """Exception raised when an Agent is not running, e.g. while it starts up."""
+
+    def __init__(
+        self, message="The specified Agent is not ready.", details=None, agent=None
+    ):
+        super().__init__(message, details)
+        self.agent = agent
+
+
+class AgentConnectionError(AgentError):
+    """Exception raised when an Agent cannot be reached."""
+
+    def __init__(
+        self, message="Could not connect to the Agent.", details=None, agent=None
+    ):
+        super().__init__(message, details)
+        self.agent = agent
+
+
+class AgentRequestNotSentError(AgentConnectionError):
+    """Exception raised when a connection is lost before a request is sent."""
+
+
+class AgentTimeoutError(AgentError):
+    """Exception raised when an Agent does not respond in time."""
+
+    def __init__(
+        self, message="The Agent did not respond in time.", details=None, agent=None
+    ):
+        super().__init__(message, details)
+        self.agent = agent
+
+
+class AgentResponseError(AgentError):
+    """Exception raised when an Agent responds with an error or an invalid body."""
+
+    def __init__(
+        self,
+        message="The Agent returned an invalid response.",
+        details=None,
+        agent=None,
+        status=None,
+    ):
+        super().__init__(message, details)
+        self.agent = agent
+        self.status = status
+
+
 class InvalidRequestError(RosterError):
     """Exception raised when an invalid request is made."""
 
@@ -3,7 +3,8 @@ from typing import Callable
 
 from roster_agent_runtime.agents.base import AgentHandle
 from roster_agent_runtime.executors.events import ResourceStatusEvent
-from roster_agent_runtime.models.agent import AgentSpec, AgentStatus
+from roster_agent_runtime.models.agent import AgentSpec
+from roster_agent_runtime.models.records import AgentStatusRecord
 
 
 class AgentExecutor(ABC):
@@ -18,19 +19,19 @@ class AgentExecutor(ABC):
         """teardown executor -- called once on shutdown to clean up resources"""
 
     @abstractmethod
-    def list_agents(self) -> list[AgentStatus]:
+    def list_agents(self) -> list[AgentStatusRecord]:
         """list agents"""
 
     @abstractmethod
-    def get_agent(self, name: str) -> AgentStatus:
+    def get_agent(self, name: str) -> AgentStatusRecord:
         """get agent"""
 
     @abstractmethod
-    async def create_agent(self, agent: AgentSpec) -> AgentStatus:
+    async def create_agent(self, agent: AgentSpec) -> AgentStatusRecord:
         """create agent"""
 
     @abstractmethod
-    async def update_agent(self, agent: AgentSpec) -> AgentStatus:
+    async def update_agent(self, agent: AgentSpec) -> AgentStatusRecord:
         """update agent"""
 
     @abstractmethod
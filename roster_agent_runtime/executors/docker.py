@@ -1,21 +1,33 @@
 import asyncio
+import hashlib
 import os
 import platform
+import shutil
 from typing import Callable, Optional
 
 import aiohttp
 from pydantic import BaseModel, Field
 from roster_agent_runtime import errors, settings
+from roster_agent_runtime.activity.hub import ActivityHub
 from roster_agent_runtime.agents import AgentHandle, HttpAgentHandle
+from roster_agent_runtime.agents.http import Transport, create_agent_http_client
+from roster_agent_runtime.agents.ws import AgentConnectionPool
 from roster_agent_runtime.executors.base import AgentExecutor
 from roster_agent_runtime.executors.events import ResourceStatusEvent
 from roster_agent_runtime.executors.store import AgentExecutorStore
+from roster_agent_runtime.http_client import HttpClient
 from roster_agent_runtime.listeners.docker import (
     DEFAULT_EVENT_FILTERS,
     DockerEventListener,
 )
 from roster_agent_runtime.logs import app_logger
-from roster_agent_runtime.models.agent import AgentContainer, AgentSpec, AgentStatus
+from roster_agent_runtime.models.agent import AgentSpec
+from roster_agent_runtime.models.records import (
+    AgentContainerRecord,
+    AgentStatusRecord,
+    freeze_labels,
+)
+from roster_agent_runtime.singletons import get_activity_hub, get_http_client
 
 import docker
 
@@ -45,13 +57,13 @@ def get_docker_host_ip(network_name="bridge", client=None):
 
 def serialize_agent_container(
     container: "docker.models.containers.Container",
-) -> AgentContainer:
-    return AgentContainer(
+) -> AgentContainerRecord:
+    return AgentContainerRecord(
         id=container.id,
         name=container.name,
         image=container.image.tags[0] if container.image.tags else "UNKNOWN",
         status=container.status,
-        labels=container.labels,
+        labels=freeze_labels(container.labels),
     )
 
 
@@ -85,10 +97,38 @@ class ExpectedStatusEvent(BaseModel):
 class DockerAgentExecutor(AgentExecutor):
     KEY = "docker"
     ROSTER_CONTAINER_LABEL = "roster-agent"
-
-    def __init__(self):
+    # Host path of the Agent's socket, for containers reached over a Unix socket
+    ROSTER_SOCKET_LABEL = "roster-agent-socket"
+    # Where each Agent's socket directory is mounted in its container
+    AGENT_SOCKET_MOUNT = "/var/run/roster"
+    AGENT_SOCKET_NAME = "agent.sock"
+    # Only sent as the Host header, the socket decides where requests go
+    AGENT_SOCKET_URL = "http://agent"
+
+    # Healthchecks should fail fast, they are retried on an interval
+    HEALTHCHECK_TIMEOUT = aiohttp.ClientTimeout(total=2)
+
+    def __init__(
+        self,
+        http_client: Optional[HttpClient] = None,
+        activity_hub: Optional[ActivityHub] = None,
+        agent_http_client: Optional[HttpClient] = None,
+    ):
         try:
             self.client = docker.from_env()
+            self.http_client = http_client or get_http_client()
+            # Shared by every Agent handle, so requests reuse connections
+            self.agent_http_client = agent_http_client or create_agent_http_client(
+                self.KEY
+            )
+            # Agents behind Unix sockets get a pool of their own, per socket
+            self.agent_socket_clients: dict[str, HttpClient] = {}
+            # WebSockets outlive handles too, one per Agent
+            self.agent_connections: Optional[AgentConnectionPool] = (
+                AgentConnectionPool(self.agent_http_client)
+                if settings.AGENT_TRANSPORT == Transport.WEBSOCKET
+                else None
+            )
 
             # Local state: a picture of the Docker environment
             self.store = AgentExecutorStore()
@@ -103,10 +143,9 @@ class DockerAgentExecutor(AgentExecutor):
                 handlers=[self._handle_docker_event],
             )
 
-            # These tasks handle the activity stream of each Agent
+            # The hub reads the activity stream of each Agent and fans it out
             # (pushing things like Thoughts, Actions to long-term storage)
-            self.activity_stream_tasks: dict[str, asyncio.Task] = {}
-            self.roster_activity_url = settings.ROSTER_API_ACTIVITY_URL
+            self.activity_hub = activity_hub or get_activity_hub()
 
             # Synchronization primitives for concurrency control
             self._resource_locks: dict[str, asyncio.Lock] = {}
@@ -154,10 +193,56 @@ class DockerAgentExecutor(AgentExecutor):
         for event in events:
             self._pop_expected_event(event.agent_name, event.action)
 
-    def _labels_for_agent(self, agent: AgentSpec) -> dict:
-        return {
+    def _labels_for_agent(
+        self, agent: AgentSpec, socket_path: Optional[str] = None
+    ) -> dict:
+        labels = {
             self.ROSTER_CONTAINER_LABEL: agent.name,
         }
+        if socket_path is not None:
+            labels[self.ROSTER_SOCKET_LABEL] = socket_path
+        return labels
+
+    def _socket_dir_for_agent(self, name: str) -> str:
+        # Hashed, since names are free-form and socket paths are limited to ~100 bytes
+        digest = hashlib.sha256(name.encode()).hexdigest()[:16]
+        return os.path.join(settings.DOCKER_AGENT_SOCKET_DIR, digest)
+
+    def _prepare_socket_dir(self, name: str) -> str:
+        socket_dir = self._socket_dir_for_agent(name)
+        os.makedirs(socket_dir, exist_ok=True)
+        socket_path = os.path.join(socket_dir, self.AGENT_SOCKET_NAME)
+        # Left behind by a previous container for this Agent
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        return socket_path
+
+    def _get_socket_path_for_agent(self, name: str) -> Optional[str]:
+        agent = self.store.agents.get(name)
+        if not agent or not agent.container:
+            raise errors.AgentNotFoundError(agent=name)
+        return agent.container.label(self.ROSTER_SOCKET_LABEL)
+
+    def _get_agent_endpoint(self, name: str) -> tuple[str, HttpClient]:
+        # Containers created before sockets were enabled keep their published port
+        socket_path = self._get_socket_path_for_agent(name)
+        if socket_path is None:
+            port = self._get_service_port_for_agent(name)
+            return f"http://localhost:{port}", self.agent_http_client
+        client = self.agent_socket_clients.get(name)
+        if client is None:
+            client = create_agent_http_client(
+                f"{self.KEY}:{name}", socket_path=socket_path
+            )
+            self.agent_socket_clients[name] = client
+        return self.AGENT_SOCKET_URL, client
+
+    async def _close_agent_socket(self, name: str):
+        client = self.agent_socket_clients.pop(name, None)
+        if client is not None:
+            await client.teardown()
+            client.unregister_metrics()
+        shutil.rmtree(self._socket_dir_for_agent(name), ignore_errors=True)
 
     def _get_service_port_for_agent(self, name: str) -> int:
         agent = self.store.agents.get(name)
@@ -178,7 +263,7 @@ class DockerAgentExecutor(AgentExecutor):
 
     def _add_agent_from_container(
         self, container: "docker.models.containers.Container"
-    ) -> AgentStatus:
+    ) -> AgentStatusRecord:
         agent_container = serialize_agent_container(container)
         try:
             agent_name = container.labels[self.ROSTER_CONTAINER_LABEL]
@@ -186,7 +271,7 @@ class DockerAgentExecutor(AgentExecutor):
             raise errors.RosterError(
                 f"Could not restore agent from container {container.name}."
             )
-        agent_status = AgentStatus(
+        agent_status = AgentStatusRecord(
             name=agent_name,
             executor=self.KEY,
             container=agent_container,
@@ -201,7 +286,7 @@ class DockerAgentExecutor(AgentExecutor):
         )
         for container in containers:
             agent_status = self._add_agent_from_container(container)
-            if agent_status.name not in self.activity_stream_tasks:
+            if agent_status.name not in self.activity_hub.reader_tasks:
                 await self._start_activity_stream_watcher(agent_status.name)
 
     async def setup(self):
@@ -222,17 +307,23 @@ class DockerAgentExecutor(AgentExecutor):
         logger.debug("(docker) Teardown started.")
         try:
             self.docker_events_listener.stop()
-            for task in self.activity_stream_tasks.values():
-                if not task.cancelled():
-                    task.cancel()
+            for agent_name in self.store.agents:
+                self.activity_hub.unregister(agent_name)
+            if self.agent_connections is not None:
+                await self.agent_connections.teardown()
+            await self.agent_http_client.teardown()
+            for client in self.agent_socket_clients.values():
+                await client.teardown()
+                client.unregister_metrics()
+            self.agent_socket_clients = {}
         except Exception as e:
             raise errors.RosterError("Could not teardown Docker executor.") from e
         logger.debug("(docker) Teardown complete.")
 
-    def list_agents(self) -> list[AgentStatus]:
+    def list_agents(self) -> list[AgentStatusRecord]:
         return list(self.store.agents.values())
 
-    def get_agent(self, name: str) -> AgentStatus:
+    def get_agent(self, name: str) -> AgentStatusRecord:
         try:
             return self.store.agents[name]
         except KeyError:
@@ -246,60 +337,34 @@ class DockerAgentExecutor(AgentExecutor):
                 "(agent-exec) %s - Checking agent %s is healthy...", i, agent_name
             )
             try:
-                port = self._get_service_port_for_agent(agent_name)
-                url = f"http://localhost:{port}/healthcheck"
-
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(url) as response:
-                        if response.status == 200:
-                            return
-            except (aiohttp.ClientError, errors.AgentNotFoundError):
+                url, client = self._get_agent_endpoint(agent_name)
+
+                async with client.get(
+                    f"{url}/healthcheck", timeout=self.HEALTHCHECK_TIMEOUT
+                ) as response:
+                    if response.status == 200:
+                        return
+            except (
+                aiohttp.ClientError,
+                asyncio.TimeoutError,
+                errors.AgentNotFoundError,
+            ):
                 pass
             await asyncio.sleep(interval)
         raise errors.AgentFailedToStartError(
             "Agent healthcheck did not succeed.", agent=agent_name
         )
 
-    async def _notify_roster_activity_event(self, event: dict):
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    self.roster_activity_url, json=event
-                ) as response:
-                    assert response.status == 200
-        except (AssertionError, aiohttp.ClientError) as e:
-            logger.warn("(agent-exec) Failed to notify Roster of activity event %s", e)
-
-    async def _watch_activity_stream(self, agent_name: str):
-        logger.debug(
-            "(agent-exec) Activity stream acquiring handle for agent %s", agent_name
-        )
-        handle = self.get_agent_handle(agent_name)
-        logger.debug(
-            "(agent-exec) Activity stream acquired handle for agent %s", agent_name
-        )
-        async for activity_event in handle.activity_stream():
-            logger.debug("(agent-exec) Sending activity event %s", activity_event)
-            await self._notify_roster_activity_event(activity_event)
-        logger.warn(
-            "(agent-exec) Activity stream exited iteration for agent %s", agent_name
-        )
-
     async def _start_activity_stream_watcher(self, agent_name: str):
         await self._wait_for_agent_healthy(agent_name)
         logger.debug(
             "(agent-exec) Starting activity stream watcher for agent %s", agent_name
         )
-        self.activity_stream_tasks[agent_name] = asyncio.create_task(
-            self._watch_activity_stream(agent_name)
-        )
-        logger.debug(
-            "(agent-exec) Activity stream watcher task created for agent %s", agent_name
-        )
+        self.activity_hub.register(agent_name, self.get_agent_handle(agent_name))
 
     async def _create_agent(
         self, agent: AgentSpec, wait_for_healthy: bool = True
-    ) -> AgentStatus:
+    ) -> AgentStatusRecord:
         if agent.name in self.store.agents:
             raise errors.AgentAlreadyExistsError(agent=agent.name)
 
@@ -311,6 +376,36 @@ class DockerAgentExecutor(AgentExecutor):
         except docker.errors.APIError as e:
             raise errors.RosterError("Could not pull image.") from e
 
+        environment = {
+            "ROSTER_RUNTIME_IP": self.docker_host_ip,
+            "ROSTER_AGENT_NAME": agent.name,
+            "ROSTER_AGENT_PORT": "8000",
+            "ROSTER_AGENT_LOG_FILE": "/var/log/roster-agent.log",
+            # TODO: figure out non-roster environment variables
+            "OPENAI_API_KEY": os.getenv("ROSTER_OPENAI_API_KEY"),
+        }
+        socket_path = None
+        if settings.DOCKER_AGENT_SOCKETS:
+            try:
+                socket_path = self._prepare_socket_dir(agent.name)
+            except OSError as e:
+                raise errors.RosterError(
+                    f"Could not create socket directory for agent {agent.name}."
+                ) from e
+            environment["ROSTER_AGENT_SOCKET"] = os.path.join(
+                self.AGENT_SOCKET_MOUNT, self.AGENT_SOCKET_NAME
+            )
+            network_kwargs = {
+                "volumes": {
+                    os.path.dirname(socket_path): {
+                        "bind": self.AGENT_SOCKET_MOUNT,
+                        "mode": "rw",
+                    }
+                }
+            }
+        else:
+            network_kwargs = {"ports": {"8000/tcp": None}}
+
         try:
             self._push_expected_events(
                 ExpectedStatusEvent.docker_start(
@@ -320,18 +415,11 @@ class DockerAgentExecutor(AgentExecutor):
             container = self.client.containers.run(
                 agent.image,
                 detach=True,
-                labels=self._labels_for_agent(agent),
+                labels=self._labels_for_agent(agent, socket_path=socket_path),
                 # TODO: figure out user-defined network to allow specific service access only
                 network_mode="default",
-                ports={"8000/tcp": None},
-                environment={
-                    "ROSTER_RUNTIME_IP": self.docker_host_ip,
-                    "ROSTER_AGENT_NAME": agent.name,
-                    "ROSTER_AGENT_PORT": "8000",
-                    "ROSTER_AGENT_LOG_FILE": "/var/log/roster-agent.log",
-                    # TODO: figure out non-roster environment variables
-                    "OPENAI_API_KEY": os.getenv("ROSTER_OPENAI_API_KEY"),
-                },
+                environment=environment,
+                **network_kwargs,
             )
             container.reload()
         except docker.errors.APIError as e:
@@ -344,16 +432,18 @@ class DockerAgentExecutor(AgentExecutor):
             await self._wait_for_agent_healthy(agent.name)
 
         await self._start_activity_stream_watcher(agent.name)
+        # Notified once healthy, so listeners can deliver to the agent straight away
+        self.store.put_agent(self.store.agents[agent.name], notify=True)
 
         return self.store.agents[agent.name]
 
     async def create_agent(
         self, agent: AgentSpec, wait_for_healthy: bool = True
-    ) -> AgentStatus:
+    ) -> AgentStatusRecord:
         async with self.get_agent_lock(agent.name):
             return await self._create_agent(agent, wait_for_healthy=wait_for_healthy)
 
-    async def _update_agent(self, agent: AgentSpec) -> AgentStatus:
+    async def _update_agent(self, agent: AgentSpec) -> AgentStatusRecord:
         # NOTE: delete then recreate strategy is used for simplicity
         #   but will kill all running tasks
         try:
@@ -363,25 +453,29 @@ class DockerAgentExecutor(AgentExecutor):
 
         return await self._create_agent(agent)
 
-    async def update_agent(self, agent: AgentSpec) -> AgentStatus:
+    async def update_agent(self, agent: AgentSpec) -> AgentStatusRecord:
         async with self.get_agent_lock(agent.name):
             return await self._update_agent(agent)
 
     async def _delete_agent(self, name: str) -> None:
         try:
             agent = self.store.agents[name]
-            self.store.delete_agent(name)
+            self.store.delete_agent(name, notify=True)
         except KeyError:
             raise errors.AgentNotFoundError(agent=name)
 
+        # The agent is gone from the store from here on, so its socket (if any)
+        # is cleaned up even when the container cannot be removed
+        try:
+            await self._remove_agent_container(name, agent)
+        finally:
+            await self._close_agent_socket(name)
+
+    async def _remove_agent_container(self, name: str, agent: AgentStatusRecord):
         if not agent.container:
             raise errors.AgentNotFoundError(agent=name)
 
-        if (
-            name in self.activity_stream_tasks
-            and not self.activity_stream_tasks[name].cancelled()
-        ):
-            self.activity_stream_tasks[name].cancel()
+        self.activity_hub.unregister(name)
 
         try:
             container = self.client.containers.get(agent.container.id)
@@ -401,16 +495,25 @@ class DockerAgentExecutor(AgentExecutor):
             raise errors.RosterError(f"Could not delete agent {name}.") from e
 
     async def delete_agent(self, name: str) -> None:
-        async with self.get_agent_lock(name):
-            await self._delete_agent(name)
+        try:
+            async with self.get_agent_lock(name):
+                await self._delete_agent(name)
+        finally:
+            if self.agent_connections is not None:
+                await self.agent_connections.close(name)
 
     def get_agent_handle(self, name: str) -> AgentHandle:
-        port = self._get_service_port_for_agent(name)
-        return HttpAgentHandle.build(name, f"http://localhost:{port}")
+        url, http_client = self._get_agent_endpoint(name)
+        return HttpAgentHandle.build(
+            name,
+            url,
+            http_client=http_client,
+            connections=self.agent_connections,
+        )
 
     def _find_agent_by_container_name(
         self, container_name: str
-    ) -> Optional[AgentStatus]:
+    ) -> Optional[AgentStatusRecord]:
         for agent in self.store.agents.values():
             if agent.container is not None and agent.container.name == container_name:
                 return agent
@@ -444,7 +547,7 @@ class DockerAgentExecutor(AgentExecutor):
                     pass
         else:
             # This is a new container, so we should update the agent status and notify listeners.
-            updated_agent = AgentStatus(
+            updated_agent = AgentStatusRecord(
                 name=agent_name,
                 executor=self.KEY,
                 status=container.status,
@@ -466,7 +569,7 @@ class DockerAgentExecutor(AgentExecutor):
             return None
 
         # Otherwise, we should update the agent status and notify listeners.
-        updated_agent = AgentStatus(
+        updated_agent = AgentStatusRecord(
             name=agent_name,
             executor=self.KEY,
             status=container.status,
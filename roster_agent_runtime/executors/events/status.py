@@ -1,8 +1,7 @@
 from enum import Enum
 from typing import Optional
 
-from pydantic import BaseModel
-from roster_agent_runtime.models.agent import AgentStatus
+from roster_agent_runtime.models.records import AgentStatusRecord, record
 
 
 class Resource(Enum):
@@ -14,13 +13,16 @@ class EventType(Enum):
     DELETE = "Delete"
 
 
-class ResourceStatusEvent(BaseModel):
+@record
+class ResourceStatusEvent:
     resource_type: Resource
     event_type: EventType
     name: str
-    data: Optional[BaseModel] = None
+    data: Optional[AgentStatusRecord] = None
 
-    def get_agent_status(self) -> AgentStatus:
-        if self.resource_type == Resource.AGENT and isinstance(self.data, AgentStatus):
+    def get_agent_status(self) -> AgentStatusRecord:
+        if self.resource_type == Resource.AGENT and isinstance(
+            self.data, AgentStatusRecord
+        ):
             return self.data
         raise ValueError("Invalid resource_type or data type for agent status")
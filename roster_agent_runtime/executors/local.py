@@ -1,9 +1,12 @@
-from typing import Callable
+from typing import Callable, Optional
 
 from roster_agent_runtime import errors
+from roster_agent_runtime.activity.hub import ActivityHub
 from roster_agent_runtime.agents import AgentHandle
 from roster_agent_runtime.agents.local.handle import LocalAgentHandle
-from roster_agent_runtime.models.agent import AgentSpec, AgentStatus
+from roster_agent_runtime.models.agent import AgentSpec
+from roster_agent_runtime.models.records import AgentStatusRecord
+from roster_agent_runtime.singletons import get_activity_hub
 
 from .base import AgentExecutor
 from .events import ResourceStatusEvent
@@ -13,9 +16,10 @@ from .store import AgentExecutorStore
 class LocalAgentExecutor(AgentExecutor):
     KEY = "local"
 
-    def __init__(self):
+    def __init__(self, activity_hub: Optional[ActivityHub] = None):
         self.store = AgentExecutorStore()
         self.agent_handles: dict[str, AgentHandle] = {}
+        self.activity_hub = activity_hub or get_activity_hub()
 
     async def setup(self):
         # Local agents don't need to be setup, and there is no volatile state to check.
@@ -24,33 +28,37 @@ class LocalAgentExecutor(AgentExecutor):
         pass
 
     async def teardown(self):
+        for name in self.agent_handles:
+            self.activity_hub.unregister(name)
         self.store.reset()
         self.agent_handles = {}
 
-    def list_agents(self) -> list[AgentStatus]:
+    def list_agents(self) -> list[AgentStatusRecord]:
         return list(self.store.agents.values())
 
-    def get_agent(self, name: str) -> AgentStatus:
+    def get_agent(self, name: str) -> AgentStatusRecord:
         try:
             return self.store.agents[name]
         except KeyError:
             raise errors.AgentNotFoundError(agent=name)
 
-    def _local_agent_status(self, agent: AgentSpec) -> AgentStatus:
-        return AgentStatus(name=agent.name, executor=self.KEY, status="running")
+    def _local_agent_status(self, agent: AgentSpec) -> AgentStatusRecord:
+        return AgentStatusRecord(name=agent.name, executor=self.KEY, status="running")
 
-    async def create_agent(self, agent: AgentSpec) -> AgentStatus:
+    async def create_agent(self, agent: AgentSpec) -> AgentStatusRecord:
         if agent.name in self.store.agents:
             raise errors.AgentAlreadyExistsError(agent=agent.name)
 
         # Agent 'image' attribute is used to identify the agent class to import
         agent_handle = LocalAgentHandle.build(name=agent.name, image=agent.image)
-        self.store.agents[agent.name] = self._local_agent_status(agent=agent)
         self.agent_handles[agent.name] = agent_handle
+        self.activity_hub.register(agent.name, agent_handle)
+        # Notified once the handle exists, so listeners can use it straight away
+        self.store.put_agent(self._local_agent_status(agent=agent), notify=True)
 
         return self.store.agents[agent.name]
 
-    async def update_agent(self, agent: AgentSpec) -> AgentStatus:
+    async def update_agent(self, agent: AgentSpec) -> AgentStatusRecord:
         if agent.name not in self.store.agents:
             raise errors.AgentNotFoundError(agent=agent.name)
 
@@ -58,14 +66,17 @@ class LocalAgentExecutor(AgentExecutor):
         self.agent_handles[agent.name] = LocalAgentHandle.build(
             name=agent.name, image=agent.image
         )
+        self.activity_hub.register(agent.name, self.agent_handles[agent.name])
+        self.store.put_agent(self.store.agents[agent.name], notify=True)
         return self.store.agents[agent.name]
 
     async def delete_agent(self, name: str) -> None:
         if name not in self.store.agents:
             raise errors.AgentNotFoundError(agent=name)
 
-        del self.store.agents[name]
         del self.agent_handles[name]
+        self.activity_hub.unregister(name)
+        self.store.delete_agent(name, notify=True)
 
     def get_agent_handle(self, name: str) -> AgentHandle:
         try:
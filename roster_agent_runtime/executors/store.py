@@ -7,7 +7,7 @@ from roster_agent_runtime.executors.events import (
     ResourceStatusEvent,
 )
 from roster_agent_runtime.logs import app_logger
-from roster_agent_runtime.models.agent import AgentStatus
+from roster_agent_runtime.models.records import AgentStatusRecord
 
 logger = app_logger()
 
@@ -17,7 +17,7 @@ class AgentExecutorStore:
         self,
         status_listeners: Optional[list[Callable[[ResourceStatusEvent], None]]] = None,
     ):
-        self.agents: dict[str, AgentStatus] = {}
+        self.agents: dict[str, AgentStatusRecord] = {}
         self.status_listeners = status_listeners or []
 
     def add_status_listener(self, listener: Callable[[ResourceStatusEvent], None]):
@@ -37,7 +37,7 @@ class AgentExecutorStore:
                     e,
                 )
 
-    def put_agent(self, agent: AgentStatus, notify: bool = False):
+    def put_agent(self, agent: AgentStatusRecord, notify: bool = False):
         agent_name = agent.name
         logger.debug("(exec-store) put agent: %s", agent_name)
         self.agents[agent_name] = agent
@@ -0,0 +1,169 @@
+from typing import Optional
+
+import aiohttp
+from roster_agent_runtime import codec, metrics, settings
+from roster_agent_runtime.logs import app_logger
+
+logger = app_logger()
+
+# Long-lived streams (event listeners) should not be cut off by read timeouts
+STREAM_TIMEOUT = aiohttp.ClientTimeout(
+    total=None, connect=settings.HTTP_CONNECT_TIMEOUT, sock_read=None
+)
+
+
+class HttpClient:
+    """Pooled keep-alive HTTP client shared by all outbound runtime traffic."""
+
+    # Names of the metrics each client registers under its own labels
+    METRIC_NAMES = (
+        "http_client_requests_total",
+        "http_client_connections_created_total",
+        "http_client_connections_reused_total",
+        "http_client_dns_cache_hits_total",
+        "http_client_dns_cache_misses_total",
+        "http_client_pool",
+    )
+
+    def __init__(
+        self,
+        name: str = "default",
+        limit: int = settings.HTTP_POOL_LIMIT,
+        limit_per_host: int = settings.HTTP_POOL_LIMIT_PER_HOST,
+        keepalive_timeout: float = settings.HTTP_KEEPALIVE_TIMEOUT,
+        dns_cache_ttl: int = settings.HTTP_DNS_CACHE_TTL,
+        timeout: Optional[aiohttp.ClientTimeout] = None,
+    ):
+        self.name = name
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.timeout = timeout or aiohttp.ClientTimeout(
+            total=settings.HTTP_TOTAL_TIMEOUT,
+            connect=settings.HTTP_CONNECT_TIMEOUT,
+            sock_read=settings.HTTP_READ_TIMEOUT,
+        )
+        self._session: Optional[aiohttp.ClientSession] = None
+
+        labels = {"client": name}
+        self.metric_labels = labels
+        self.requests = metrics.counter("http_client_requests_total", labels=labels)
+        self.connections_created = metrics.counter(
+            "http_client_connections_created_total", labels=labels
+        )
+        self.connections_reused = metrics.counter(
+            "http_client_connections_reused_total", labels=labels
+        )
+        self.dns_cache_hits = metrics.counter(
+            "http_client_dns_cache_hits_total", labels=labels
+        )
+        self.dns_cache_misses = metrics.counter(
+            "http_client_dns_cache_misses_total", labels=labels
+        )
+        metrics.callback_gauge("http_client_pool", self.stats, labels=labels)
+
+    def unregister_metrics(self):
+        # For short-lived clients, the pool gauge would otherwise keep this alive
+        for name in self.METRIC_NAMES:
+            metrics.remove(name, labels=self.metric_labels)
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        async def on_request_start(session, context, params):
+            self.requests.inc()
+
+        async def on_connection_create_end(session, context, params):
+            self.connections_created.inc()
+
+        async def on_connection_reuseconn(session, context, params):
+            self.connections_reused.inc()
+
+        async def on_dns_cache_hit(session, context, params):
+            self.dns_cache_hits.inc()
+
+        async def on_dns_cache_miss(session, context, params):
+            self.dns_cache_misses.inc()
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace_config.on_dns_cache_hit.append(on_dns_cache_hit)
+        trace_config.on_dns_cache_miss.append(on_dns_cache_miss)
+        return trace_config
+
+    def _create_connector(self) -> aiohttp.BaseConnector:
+        return aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            use_dns_cache=True,
+            ttl_dns_cache=self.dns_cache_ttl,
+        )
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        # Created lazily, since the session must be bound to the running loop
+        if self._session is None or self._session.closed:
+            logger.debug("(http-client) [%s] Creating session", self.name)
+            self._session = aiohttp.ClientSession(
+                connector=self._create_connector(),
+                timeout=self.timeout,
+                json_serialize=codec.dumps_str,
+                trace_configs=[self._trace_config()],
+            )
+        return self._session
+
+    async def setup(self):
+        _ = self.session
+
+    async def teardown(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def request(self, method: str, url: str, **kwargs):
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs):
+        return self.session.get(url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.session.post(url, **kwargs)
+
+    def stats(self) -> dict:
+        stats = {
+            "limit": self.limit,
+            "limit_per_host": self.limit_per_host,
+            "acquired": 0,
+            "idle": 0,
+        }
+        if self._session is None or self._session.closed:
+            return stats
+        # NOTE: aiohttp does not expose pool occupancy publicly
+        connector = self._session.connector
+        stats["acquired"] = len(getattr(connector, "_acquired", ()))
+        stats["idle"] = sum(
+            len(connections)
+            for connections in getattr(connector, "_conns", {}).values()
+        )
+        return stats
+
+
+class UnixSocketHttpClient(HttpClient):
+    """
+    Pooled keep-alive HTTP client for a server listening on a Unix socket.
+    The host in request URLs only names the server (in the Host header).
+    """
+
+    def __init__(self, path: str, name: str = "default", **kwargs):
+        self.path = path
+        super().__init__(name=name, **kwargs)
+
+    def _create_connector(self) -> aiohttp.BaseConnector:
+        return aiohttp.UnixConnector(
+            path=self.path,
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+        )
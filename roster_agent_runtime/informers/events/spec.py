@@ -1,8 +1,7 @@
-import json
-from typing import Literal, Union
+from typing import Literal, Optional, Union
 
 from pydantic import BaseModel, Field
-from roster_agent_runtime import errors
+from roster_agent_runtime import codec, errors
 from roster_agent_runtime.logs import app_logger
 from roster_agent_runtime.models.agent import AgentSpec
 
@@ -28,6 +27,9 @@ class PutResourceEvent(BaseModel):
     )
     name: str = Field(description="The name of the resource.")
     resource: Resource = Field(description="The resource itself.")
+    resource_version: Optional[str] = Field(
+        default=None, description="The version of the resource after this event."
+    )
 
     class Config:
         validate_assignment = True
@@ -45,6 +47,9 @@ class DeleteResourceEvent(BaseModel):
         default="default", description="The namespace of the resource."
     )
     name: str = Field(description="The name of the resource.")
+    resource_version: Optional[str] = Field(
+        default=None, description="The version of the resource after this event."
+    )
 
     class Config:
         validate_assignment = True
@@ -56,11 +61,11 @@ class DeleteResourceEvent(BaseModel):
 RosterResourceEvent = Union[PutResourceEvent, DeleteResourceEvent]
 
 
-def deserialize_resource_event(event: str) -> RosterResourceEvent:
+def deserialize_resource_event(event: bytes) -> RosterResourceEvent:
     try:
-        json_event = json.loads(json.loads(event))
+        json_event = codec.loads_nested(event)
         logger.debug("Deserialized Resource Event %s", json_event)
-    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+    except codec.DecodeError as e:
         raise errors.InvalidEventError(f"Invalid Resource Event {event}") from e
     try:
         if json_event["event_type"] == "PUT":
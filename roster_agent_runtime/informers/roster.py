@@ -1,11 +1,16 @@
+import asyncio
 from typing import Callable, Optional
 
 import aiohttp
 import pydantic
 from pydantic import BaseModel, Field
-from roster_agent_runtime import settings
+from roster_agent_runtime import codec, constants, metrics, settings
+from roster_agent_runtime.http_client import HttpClient
 from roster_agent_runtime.informers.base import Informer
 from roster_agent_runtime.informers.events.spec import (
+    DeleteResourceEvent,
+    PutResourceEvent,
+    Resource,
     RosterResourceEvent,
     RosterSpec,
     deserialize_resource_event,
@@ -13,6 +18,8 @@ from roster_agent_runtime.informers.events.spec import (
 from roster_agent_runtime.listeners.base import EventListener
 from roster_agent_runtime.logs import app_logger
 from roster_agent_runtime.models.agent import AgentResource, AgentSpec
+from roster_agent_runtime.singletons import get_http_client
+from roster_agent_runtime.util.backoff import Backoff
 
 logger = app_logger()
 
@@ -39,35 +46,128 @@ class RosterInformer(Informer[RosterSpec, RosterResourceEvent]):
         "resource_types": "AGENT",
     }
 
+    # Query parameter used to resume the event stream after a disconnect
+    RESOURCE_VERSION_PARAM = "resource_version"
+
     def __init__(
         self,
         url_config: Optional[RosterAPIURLConfig] = None,
         event_params: Optional[dict] = None,
+        http_client: Optional[HttpClient] = None,
     ):
         self.agents: dict[str, AgentSpec] = {}
         self.url_config: RosterAPIURLConfig = url_config or RosterAPIURLConfig()
+        self.http_client = http_client or get_http_client()
         self.roster_listener: EventListener = EventListener(
             self.url_config.events_url,
             params=event_params or self.DEFAULT_EVENT_PARAMS,
             middleware=[deserialize_resource_event],
             handlers=[self._handle_spec_event],
+            resume_params=self._resume_params,
+            on_connect=self._on_watch_connect,
+            on_resume_expired=self._on_resume_expired,
+            backoff=Backoff(
+                initial=settings.ROSTER_INFORMER_BACKOFF_INITIAL,
+                maximum=settings.ROSTER_INFORMER_BACKOFF_MAX,
+            ),
+            name="roster-informer",
+            http_client=self.http_client,
         )
         self.event_listeners: list[Callable[[RosterResourceEvent], None]] = []
 
-    async def _load_initial_specs(self):
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(self.url_config.agents_url) as resp:
-                    for agent in await resp.json():
-                        spec = AgentResource(**agent).spec
-                        self.agents[spec.name] = spec
-            except (aiohttp.ClientError, TypeError, pydantic.ValidationError) as e:
-                logger.error("(roster-spec) Failed to load initial agents: %s", e)
+        # Latest resource version observed from the Roster API (list or watch).
+        # When unknown, the watch cannot be resumed and a full relist is required.
+        self.resource_version: Optional[str] = None
+        self._resuming: bool = False
+        self._synced: Optional[asyncio.Event] = None
+        self.relists = metrics.counter("roster_informer_relists_total")
+        self.resumes = metrics.counter("roster_informer_resumes_total")
+
+    def _resume_params(self) -> dict:
+        self._resuming = self.resource_version is not None
+        if not self._resuming:
+            return {}
+        return {self.RESOURCE_VERSION_PARAM: self.resource_version}
+
+    def _on_resume_expired(self):
+        logger.info(
+            "(roster-spec) Cannot resume from version %s, relisting",
+            self.resource_version,
+        )
+        self.resource_version = None
+
+    async def _on_watch_connect(self):
+        # The watch is established before the list is requested, so any event
+        # emitted after the list snapshot is buffered by the stream and applied
+        # on top of it. Buffered events at or below the snapshot's version are
+        # already reflected in it, and are dropped (see _is_stale).
+        if self._resuming:
+            logger.debug(
+                "(roster-spec) Resumed watch from version %s", self.resource_version
+            )
+            self.resumes.inc()
+        else:
+            await self._relist()
+        if self._synced is not None:
+            self._synced.set()
+
+    async def _list_specs(self) -> tuple[dict[str, AgentSpec], Optional[str]]:
+        async with self.http_client.get(
+            self.url_config.agents_url, raise_for_status=True
+        ) as resp:
+            agents = {}
+            for agent in await resp.json(loads=codec.loads):
+                spec = AgentResource(**agent).spec
+                agents[spec.name] = spec
+            return agents, resp.headers.get(constants.RESOURCE_VERSION_HEADER)
+
+    async def _relist(self):
+        try:
+            agents, resource_version = await self._list_specs()
+        except (
+            aiohttp.ClientError,
+            codec.DecodeError,
+            TypeError,
+            pydantic.ValidationError,
+        ) as e:
+            logger.error("(roster-spec) Failed to list agents: %s", e)
+            # Raising here drops the watch, which is retried with backoff
+            raise
+        self.relists.inc()
+
+        # Listeners only observe events, so synthesize events for any changes
+        # which were missed while the watch was disconnected.
+        missed_events: list[RosterResourceEvent] = []
+        for name in self.agents.keys() - agents.keys():
+            missed_events.append(DeleteResourceEvent(resource_type="AGENT", name=name))
+        for name, spec in agents.items():
+            if self.agents.get(name) != spec:
+                missed_events.append(
+                    PutResourceEvent(
+                        resource_type="AGENT", name=name, resource=Resource(spec=spec)
+                    )
+                )
+
+        self.agents = agents
+        self.resource_version = resource_version
+        logger.debug(
+            "(roster-spec) Relisted %d agents (%d changed)",
+            len(agents),
+            len(missed_events),
+        )
+        for event in missed_events:
+            self._notify_event_listeners(event)
 
     async def setup(self):
         logger.debug("Setting up Roster Informer")
+        self._synced = asyncio.Event()
         self.roster_listener.run_as_task()
-        await self._load_initial_specs()
+        try:
+            await asyncio.wait_for(
+                self._synced.wait(), timeout=settings.ROSTER_INFORMER_SYNC_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            logger.error("(roster-spec) Timed out waiting for initial agent list")
 
     async def teardown(self):
         logger.debug("Tearing down Roster Informer")
@@ -85,14 +185,30 @@ class RosterInformer(Informer[RosterSpec, RosterResourceEvent]):
         else:
             logger.warn("(roster-spec) Unexpected resource type: %s", event)
 
+    def _is_stale(self, event: RosterResourceEvent) -> bool:
+        # Versions are compared as integers, opaque ones are never stale
+        try:
+            return int(event.resource_version) <= int(self.resource_version)
+        except (TypeError, ValueError):
+            return False
+
     def _handle_spec_event(self, event: RosterResourceEvent):
         logger.debug("(roster-spec) Received Spec event: %s", event)
+        if self._is_stale(event):
+            # Older than the relisted snapshot, resuming from it would go back
+            logger.debug("(roster-spec) Dropping stale Spec event: %s", event)
+            return
         if event.event_type == "PUT":
             self._handle_put_spec_event(event)
         elif event.event_type == "DELETE":
             self._handle_delete_spec_event(event)
         else:
             logger.warn("(roster-spec) Unknown event: %s", event)
+        if event.resource_version is not None:
+            self.resource_version = event.resource_version
+        self._notify_event_listeners(event)
+
+    def _notify_event_listeners(self, event: RosterResourceEvent):
         logger.debug("(roster-spec) Pushing Spec event to listeners: %s", event)
         for listener in self.event_listeners:
             try:
@@ -1,50 +1,117 @@
 import asyncio
 import urllib.parse
-from typing import Callable, Optional
+from typing import Awaitable, Callable, Optional
 
-import aiohttp
+from roster_agent_runtime import metrics
+from roster_agent_runtime.http_client import STREAM_TIMEOUT, HttpClient
 from roster_agent_runtime.logs import app_logger
+from roster_agent_runtime.singletons import get_http_client
+from roster_agent_runtime.util.backoff import Backoff
 
 logger = app_logger()
 
 
 class EventListener:
+    # Status returned by the event source when the requested resume point
+    # is no longer available, and a full resync is required.
+    RESUME_EXPIRED_STATUS = 410
+
     def __init__(
         self,
         url: str,
         params: Optional[dict] = None,
         middleware: Optional[list[Callable]] = None,
         handlers: Optional[list[Callable]] = None,
+        resume_params: Optional[Callable[[], dict]] = None,
+        on_connect: Optional[Callable[[], Awaitable[None]]] = None,
+        on_resume_expired: Optional[Callable[[], None]] = None,
+        backoff: Optional[Backoff] = None,
+        name: str = "default",
+        http_client: Optional[HttpClient] = None,
     ):
-        if params:
-            url = url + "?" + urllib.parse.urlencode(params, doseq=True)
         self.url = url
+        self.http_client = http_client or get_http_client()
+        self.params = params or {}
         self.middleware = middleware or []
         self.handlers = handlers or []
+        # Called before each connection attempt to compute the resume point
+        self.resume_params = resume_params
+        # Called once the stream is established, before any events are handled.
+        # Events arriving in the meantime are buffered by the response stream.
+        self.on_connect = on_connect
+        self.on_resume_expired = on_resume_expired
+        self.backoff = backoff or Backoff()
+        self.reconnects = metrics.counter(
+            "event_listener_reconnects_total", labels={"listener": name}
+        )
         # NOTE: This means an instance should only be used once
         self.task = None
 
+    def _connect_url(self) -> str:
+        params = dict(self.params)
+        if self.resume_params is not None:
+            params.update(self.resume_params())
+        if not params:
+            return self.url
+        return self.url + "?" + urllib.parse.urlencode(params, doseq=True)
+
+    def _handle_line(self, line: bytes):
+        try:
+            event = line
+            for middleware in self.middleware:
+                event = middleware(event)
+        except Exception as e:
+            logger.error(
+                "(evt-listen) [%s] Error handling event: %s; %s", self.url, line, e
+            )
+            return
+        for handler in self.handlers:
+            try:
+                handler(event)
+            except Exception as e:
+                logger.error(
+                    "(evt-listen) [%s] Error handling event: %s; %s", self.url, line, e
+                )
+
+    async def _listen_once(self) -> bool:
+        # Returns True if the listener should reconnect immediately
+        url = self._connect_url()
+        logger.debug("(evt-listen) Listening to events from %s", url)
+        async with self.http_client.get(url, timeout=STREAM_TIMEOUT) as resp:
+            if (
+                resp.status == self.RESUME_EXPIRED_STATUS
+                and self.on_resume_expired is not None
+            ):
+                logger.info("(evt-listen) [%s] Resume point expired", self.url)
+                self.on_resume_expired()
+                return True
+            resp.raise_for_status()
+            if self.on_connect is not None:
+                await self.on_connect()
+            self.backoff.reset()
+            async for line in resp.content:
+                line = line.strip()
+                if not line:
+                    continue
+                logger.debug("(evt-listen) [%s] Line: %s", self.url, line)
+                self._handle_line(line)
+        return False
+
     async def listen(self):
-        async with aiohttp.ClientSession() as session:
-            logger.debug("(evt-listen) Listening to events from %s", self.url)
-            async with session.get(self.url) as resp:
-                async for line in resp.content:
-                    if line == b"\n":
-                        continue
-                    line = line.decode("utf-8").strip()
-                    logger.debug("(evt-listen) [%s] Line: %s", self.url, line)
-                    for handler in self.handlers:
-                        try:
-                            for middleware in self.middleware:
-                                line = middleware(line)
-                            handler(line)
-                        except Exception as e:
-                            logger.error(
-                                "(evt-listen) [%s] Error handling event: %s; %s",
-                                self.url,
-                                line,
-                                e,
-                            )
+        while True:
+            try:
+                if await self._listen_once():
+                    self.reconnects.inc()
+                    continue
+                logger.warn("(evt-listen) [%s] Event stream closed", self.url)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warn("(evt-listen) [%s] Event stream failed: %s", self.url, e)
+            self.reconnects.inc()
+            delay = self.backoff.next_delay()
+            logger.debug("(evt-listen) [%s] Reconnecting in %.2fs", self.url, delay)
+            await asyncio.sleep(delay)
 
     def run_as_task(self) -> asyncio.Task:
         if self.task is not None:
@@ -1,6 +1,5 @@
-import json
-
 import aiohttp
+from roster_agent_runtime import codec
 
 
 class JSONStream:
@@ -14,4 +13,4 @@ class JSONStream:
         line = await self.response.content.readline()
         if not line:
             raise StopAsyncIteration
-        return json.loads(line.decode("utf-8"))
+        return codec.loads(line)
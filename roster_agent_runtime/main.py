@@ -5,15 +5,22 @@ from fastapi import FastAPI
 from uvicorn import Config, Server
 
 from roster_agent_runtime import constants, errors, settings
+from roster_agent_runtime.api.activity import router as activity_router
 from roster_agent_runtime.api.messaging import router as messaging_router
+from roster_agent_runtime.api.metrics import router as metrics_router
 from roster_agent_runtime.logs import app_logger
 from roster_agent_runtime.singletons import (
+    get_activity_hub,
+    get_activity_uploader,
     get_agent_controller,
     get_agent_pool,
+    get_blob_store,
+    get_http_client,
+    get_message_broker,
     get_message_router,
-    get_rabbitmq,
     get_roster_informer,
     get_roster_notifier,
+    get_rpc_client,
 )
 
 logger = app_logger()
@@ -22,9 +29,14 @@ app = FastAPI(title="Roster Runtime API", version="0.1.0")
 controller = get_agent_controller()
 informer = get_roster_informer()
 notifier = get_roster_notifier()
+activity_hub = get_activity_hub()
+activity_uploader = get_activity_uploader()
 agent_pool = get_agent_pool()
-rmq_client = get_rabbitmq()
+rmq_client = get_message_broker()
 message_router = get_message_router()
+http_client = get_http_client()
+blob_store = get_blob_store()
+rpc_client = get_rpc_client()
 
 CONTROLLER_TASK: Optional[asyncio.Task] = None
 
@@ -38,17 +50,18 @@ async def startup_event():
     # Notifier setup is synchronous, manages asyncio Task internally
     # TODO: unnecessary complexity for questionable performance reasons, probably no need
     notifier.setup()
+    activity_uploader.setup()
+    if blob_store is not None:
+        blob_store.setup()
     # Set up lower-level components
     await asyncio.gather(informer.setup(), agent_pool.setup(), rmq_client.setup())
     # Set up higher-level components
-    # NOTE: order matters here, and is a quick-fix for lack of Status awareness in message router
-    #   The message router views specs only, and tries to acquire handles to all specified Agents
-    #   immediately.
-    #   Controller reconciles during setup, so assuming reconciliation works, router will be
-    #   able to acquire handles.
-    #   TODO: make message router Status-aware
+    # NOTE: The message router holds messages for specified Agents until the pool reports
+    #   them running, so it does not depend on the controller having reconciled first.
     await controller.setup()
     await message_router.setup()
+    if rpc_client is not None:
+        await rpc_client.setup()
     # Start core Controller loop
     global CONTROLLER_TASK
     CONTROLLER_TASK = asyncio.create_task(controller.run())
@@ -61,17 +74,27 @@ async def shutdown_event():
         await CONTROLLER_TASK
     try:
         # teardown in reverse of setup
+        if rpc_client is not None:
+            await rpc_client.teardown()
         await asyncio.gather(controller.teardown(), message_router.teardown())
         await asyncio.gather(
             informer.teardown(), agent_pool.teardown(), rmq_client.teardown()
         )
         notifier.teardown()
+        activity_uploader.teardown()
+        activity_hub.teardown()
+        if blob_store is not None:
+            blob_store.teardown()
+        # Shared HTTP client is used by most components, close it last
+        await http_client.teardown()
     except errors.TeardownError as e:
         logger.error(f"(shutdown_event): {e}")
 
 
 async def serve_api():
     app.include_router(messaging_router, prefix=f"/{constants.API_VERSION}")
+    app.include_router(activity_router, prefix=f"/{constants.API_VERSION}")
+    app.include_router(metrics_router, prefix=f"/{constants.API_VERSION}")
     config = Config(app=app, host="0.0.0.0", port=settings.PORT)
     server = Server(config)
     await server.serve()
@@ -0,0 +1,104 @@
+from abc import ABC, abstractmethod
+from typing import Iterable, Optional
+
+from roster_agent_runtime import errors
+from roster_agent_runtime.models.api.messaging import DeadLetter
+
+
+class PublishError(errors.RosterError):
+    """Exception raised when the broker does not confirm published messages."""
+
+    def __init__(
+        self,
+        message="The broker did not confirm the published message(s).",
+        details=None,
+    ):
+        super().__init__(message, details)
+
+
+class MessageRejected(errors.RosterError):
+    """
+    Exception raised by callbacks for messages which can never be handled
+    (e.g. malformed ones). These are dead-lettered without being retried.
+    """
+
+    def __init__(self, message="The message was rejected.", details=None):
+        super().__init__(message, details)
+
+
+def failure_reason(error: BaseException) -> str:
+    return f"{type(error).__name__}: {error}"
+
+
+class MessageBroker(ABC):
+    @abstractmethod
+    async def setup(self):
+        """setup broker -- called once on startup"""
+
+    @abstractmethod
+    async def teardown(self):
+        """teardown broker -- called once on shutdown"""
+
+    @abstractmethod
+    async def publish(
+        self, queue_name: str, message: str, wait_for_confirm: bool = True
+    ):
+        """Publish a message to a queue"""
+
+    @abstractmethod
+    async def publish_json(
+        self,
+        queue_name: str,
+        message: dict,
+        wait_for_confirm: bool = True,
+        sender_queue: Optional[str] = None,
+    ):
+        """Publish a JSON message to a queue, from the consumer of sender_queue"""
+
+    @abstractmethod
+    async def publish_json_batch(
+        self, messages: Iterable[tuple[str, dict]], sender_queue: Optional[str] = None
+    ):
+        """
+        Publish a burst of JSON messages together, waiting for all of them.
+        Raises PublishError with the positions of the failed messages in its
+        details (as "failed_indexes").
+        """
+
+    @abstractmethod
+    async def register_callback(
+        self,
+        queue_name: str,
+        callback: callable,
+        prefetch_count: Optional[int] = None,
+        max_in_flight: Optional[int] = None,
+    ):
+        """
+        Consume a queue, calling back with each decoded JSON message. If any
+        callback on the queue fails, the message is retried for all of them,
+        so callbacks sharing a queue must be idempotent.
+        """
+
+    @abstractmethod
+    async def deregister_callback(self, queue_name: str, callback: callable):
+        """Stop calling back, the queue is no longer consumed after its last callback"""
+
+    @abstractmethod
+    async def reject(
+        self, queue_name: str, message: dict, error: BaseException, attempt: int = 0
+    ):
+        """Retry a message which failed, after a delay, or dead-letter it"""
+
+    @abstractmethod
+    async def list_dead_letters(
+        self, limit: int = 100, offset: int = 0
+    ) -> list[DeadLetter]:
+        """Inspect dead-lettered messages without removing them, oldest first"""
+
+    @abstractmethod
+    async def replay_dead_letters(
+        self, ids: Optional[list[str]] = None, limit: int = 100, offset: int = 0
+    ) -> int:
+        """Send dead-lettered messages back to their queues, returning how many
+        were replayed: those with the given ids, wherever they are in the
+        queue, or else a page of limit messages after the oldest offset"""
@@ -0,0 +1,141 @@
+import gzip
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from roster_agent_runtime import codec
+
+# NOTE: Peers which never advertise what they accept (e.g. older runtimes)
+#   are always sent plain JSON without a content encoding, which is also how
+#   messages without content properties are decoded.
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+# Advertises what the sender can decode, e.g. "msgpack,zstd,gzip"
+ACCEPT_HEADER = "x-roster-accept"
+# Queue the sender consumes from, so recipients learn what it accepts
+SENDER_QUEUE_HEADER = "x-roster-sender-queue"
+
+# Advertised by consumers which can resolve claim checks from a blob store,
+# e.g. "claim-check:<store id>"
+CLAIM_CHECK_PREFIX = "claim-check:"
+
+GZIP_LEVEL = 5
+ZSTD_LEVEL = 3
+
+
+class ContentType:
+    JSON = "application/json"
+    MSGPACK = "application/msgpack"
+
+
+class ContentEncoding:
+    GZIP = "gzip"
+    ZSTD = "zstd"
+
+
+def supported() -> list[str]:
+    """Formats and compressions this process can decode, most preferred first."""
+    tokens = []
+    if msgpack is not None:
+        tokens.append("msgpack")
+    if zstandard is not None:
+        tokens.append(ContentEncoding.ZSTD)
+    tokens.append(ContentEncoding.GZIP)
+    return tokens
+
+
+ACCEPT = ",".join(supported())
+
+
+def claim_check_token(store_id: str) -> str:
+    return f"{CLAIM_CHECK_PREFIX}{store_id}"
+
+
+def parse_accept(value: Any) -> frozenset[str]:
+    if isinstance(value, bytes):
+        value = value.decode()
+    if not isinstance(value, str):
+        return frozenset()
+    return frozenset(token.strip() for token in value.split(",") if token.strip())
+
+
+def encode(
+    message: Any, accept: frozenset[str], compression_min_bytes: int
+) -> tuple[bytes, str, Optional[str]]:
+    """Encode a message for a peer, returning (body, content type, content encoding)."""
+    if "msgpack" in accept and msgpack is not None:
+        body = msgpack.packb(message, use_bin_type=True)
+        content_type = ContentType.MSGPACK
+    else:
+        body = codec.dumps(message)
+        content_type = ContentType.JSON
+    if len(body) < compression_min_bytes:
+        return body, content_type, None
+    if ContentEncoding.ZSTD in accept and zstandard is not None:
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+        return compressor.compress(body), content_type, ContentEncoding.ZSTD
+    if ContentEncoding.GZIP in accept:
+        return (
+            gzip.compress(body, compresslevel=GZIP_LEVEL),
+            content_type,
+            ContentEncoding.GZIP,
+        )
+    return body, content_type, None
+
+
+def decode(
+    body: bytes, content_type: Optional[str], content_encoding: Optional[str]
+) -> Any:
+    try:
+        if content_encoding == ContentEncoding.GZIP:
+            body = gzip.decompress(body)
+        elif content_encoding == ContentEncoding.ZSTD and zstandard is not None:
+            body = zstandard.ZstdDecompressor().decompress(body)
+        elif content_encoding:
+            raise codec.DecodeError(f"Unsupported content encoding: {content_encoding}")
+        if content_type == ContentType.MSGPACK:
+            if msgpack is None:
+                raise codec.DecodeError("msgpack is not installed")
+            return msgpack.unpackb(body, raw=False)
+    except codec.DecodeError:
+        raise
+    except Exception as e:
+        raise codec.DecodeError(str(e)) from e
+    return codec.loads(body)
+
+
+class PeerCapabilities:
+    """
+    What each queue's consumer accepts, learned from the messages it sends.
+    Entries expire, since a queue may be taken over by an older consumer.
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._accepts: OrderedDict[str, tuple[frozenset[str], float]] = OrderedDict()
+
+    def learn(self, queue_name: str, accept: Any):
+        self._accepts[queue_name] = (parse_accept(accept), time.monotonic() + self.ttl)
+        self._accepts.move_to_end(queue_name)
+        while len(self._accepts) > self.max_size:
+            self._accepts.popitem(last=False)
+
+    def get(self, queue_name: str) -> frozenset[str]:
+        entry = self._accepts.get(queue_name)
+        if entry is None:
+            return frozenset()
+        accept, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._accepts[queue_name]
+            return frozenset()
+        return accept
@@ -0,0 +1,138 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+from roster_agent_runtime import codec, metrics, settings
+from roster_agent_runtime.logs import app_logger
+
+logger = app_logger()
+
+
+class IdempotencyCache:
+    """
+    Remembers which messages were handled, so redeliveries are suppressed.
+
+    Keys of handled messages are kept in a bounded LRU, each for at most ttl
+    seconds. A duplicate which arrives while the original is still being
+    handled (e.g. redelivered after a reconnect) waits for it, and is only
+    handled itself if the original fails. With a path, handled keys are
+    appended to a file and reloaded on open, so they survive a restart. The
+    file is compacted on open, and whenever it holds compact_ratio times as
+    many records as there are live keys.
+    """
+
+    def __init__(
+        self,
+        max_size: int = settings.ROUTER_IDEMPOTENCY_MAX_SIZE,
+        ttl: float = settings.ROUTER_IDEMPOTENCY_TTL,
+        path: Optional[str] = None,
+        compact_ratio: int = settings.ROUTER_IDEMPOTENCY_COMPACT_RATIO,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self.compact_ratio = compact_ratio
+        # Key -> expiry (wall clock, so it can be persisted)
+        self.handled: OrderedDict[str, float] = OrderedDict()
+        self.in_flight: dict[str, asyncio.Future] = {}
+        self._file = None
+        # Records in the file, live or not
+        self._records = 0
+
+        self.duplicates = metrics.counter("router_duplicate_messages_total")
+        metrics.callback_gauge("router_idempotency_keys", lambda: len(self.handled))
+
+    @staticmethod
+    def key(*parts: str) -> str:
+        return codec.dumps(parts).decode()
+
+    def open(self):
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if os.path.exists(self.path):
+            self._load()
+        self._compact()
+
+    def _compact(self):
+        # Rewritten with only live keys, so the file does not grow forever
+        if self._file is not None:
+            self._file.close()
+        now = time.time()
+        tmp_path = f"{self.path}.tmp"
+        self._records = 0
+        with open(tmp_path, "wb") as f:
+            for key, expires_at in self.handled.items():
+                if expires_at > now:
+                    f.write(codec.dumps([key, expires_at]) + b"\n")
+                    self._records += 1
+        os.replace(tmp_path, self.path)
+        self._file = open(self.path, "ab")
+
+    def _load(self):
+        now = time.time()
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    key, expires_at = codec.loads(line)
+                except (codec.DecodeError, TypeError, ValueError):
+                    # e.g. a partial line from a crash mid-write
+                    logger.warn("(idempotency) Skipping invalid record: %s", line)
+                    continue
+                if expires_at > now:
+                    self._remember(key, expires_at)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _remember(self, key: str, expires_at: float):
+        self.handled[key] = expires_at
+        self.handled.move_to_end(key)
+        while len(self.handled) > self.max_size:
+            self.handled.popitem(last=False)
+
+    def _was_handled(self, key: str) -> bool:
+        expires_at = self.handled.get(key)
+        if expires_at is None:
+            return False
+        if expires_at < time.time():
+            del self.handled[key]
+            return False
+        return True
+
+    def _mark_handled(self, key: str):
+        expires_at = time.time() + self.ttl
+        self._remember(key, expires_at)
+        if self._file is not None:
+            self._file.write(codec.dumps([key, expires_at]) + b"\n")
+            self._file.flush()
+            self._records += 1
+            if self._records > self.compact_ratio * len(self.handled):
+                self._compact()
+
+    async def run_once(self, key: str, handler: Callable[[], Awaitable[None]]) -> bool:
+        """Run handler unless key was already handled, returning whether it ran."""
+        while True:
+            if self._was_handled(key):
+                self.duplicates.inc()
+                return False
+            in_flight = self.in_flight.get(key)
+            if in_flight is None:
+                break
+            # Shielded, so a cancelled duplicate does not cancel the original
+            await asyncio.shield(in_flight)
+
+        done = asyncio.get_running_loop().create_future()
+        self.in_flight[key] = done
+        try:
+            await handler()
+            self._mark_handled(key)
+        finally:
+            del self.in_flight[key]
+            # Waiters only need to know it finished, and re-check handled
+            done.set_result(None)
+        return True
@@ -0,0 +1,139 @@
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Generic, Iterable, TypeVar
+
+T = TypeVar("T")
+
+
+class Lane:
+    # Tool responses, which unblock actions that are already in progress,
+    # and RPC cancellations
+    RESPONSE = "response"
+    # Everything else, e.g. action triggers which start new work
+    DEFAULT = "default"
+
+
+# Cancellations are included, so they are not queued behind the work they cancel
+RESPONSE_KINDS = frozenset({"tool_response", "rpc_cancel"})
+
+
+def lane_for(message: Any) -> str:
+    kind = message.get("kind") if isinstance(message, dict) else None
+    return Lane.RESPONSE if kind in RESPONSE_KINDS else Lane.DEFAULT
+
+
+class WeightedRoundRobin:
+    """
+    Smooth weighted round-robin over lanes (as in nginx). Lanes with work are
+    picked in proportion to their weights, interleaved rather than in runs, and
+    no lane with work is ever starved.
+    """
+
+    def __init__(self, weights: dict[str, int]):
+        if Lane.DEFAULT not in weights:
+            raise ValueError(f"Lane weights must include {Lane.DEFAULT}")
+        if any(weight < 1 for weight in weights.values()):
+            raise ValueError(f"Lane weights must be positive: {weights}")
+        self.weights = weights
+        self._current = {lane: 0 for lane in weights}
+
+    def lane(self, lane: str) -> str:
+        # Unknown lanes are scheduled as the default lane
+        return lane if lane in self.weights else Lane.DEFAULT
+
+    def pick(self, ready: Iterable[str]) -> str:
+        ready = list(ready)
+        total = 0
+        for lane in ready:
+            self._current[lane] += self.weights[lane]
+            total += self.weights[lane]
+        picked = max(ready, key=lambda lane: self._current[lane])
+        self._current[picked] -= total
+        return picked
+
+
+class LaneScheduler:
+    """
+    Bounds concurrent handlers, like a semaphore. When no slot is free,
+    waiters are admitted by weighted round-robin across lanes, and in
+    arrival order within a lane.
+    """
+
+    def __init__(self, max_in_flight: int, weights: dict[str, int]):
+        self.available = max_in_flight
+        self.round_robin = WeightedRoundRobin(weights)
+        self.waiters: dict[str, deque[asyncio.Future]] = {
+            lane: deque() for lane in weights
+        }
+
+    def waiting(self, lane: str) -> int:
+        return len(self.waiters[self.round_robin.lane(lane)])
+
+    async def acquire(self, lane: str = Lane.DEFAULT):
+        if self.available > 0 and not any(self.waiters.values()):
+            self.available -= 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        waiters = self.waiters[self.round_robin.lane(lane)]
+        waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just before cancellation, pass it on
+                self.release()
+            else:
+                waiters.remove(waiter)
+            raise
+
+    def release(self):
+        ready = [lane for lane, waiters in self.waiters.items() if waiters]
+        if not ready:
+            self.available += 1
+            return
+        # Handed straight to the next waiter, so no new arrival can take it
+        self.waiters[self.round_robin.pick(ready)].popleft().set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, lane: str = Lane.DEFAULT) -> AsyncIterator[None]:
+        await self.acquire(lane)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+class LaneQueue(Generic[T]):
+    """
+    A bounded queue per lane, read by weighted round-robin across lanes.
+    Supports a single reader.
+    """
+
+    def __init__(self, max_size: int, weights: dict[str, int]):
+        self.round_robin = WeightedRoundRobin(weights)
+        self.queues: dict[str, asyncio.Queue[T]] = {
+            lane: asyncio.Queue(maxsize=max_size) for lane in weights
+        }
+        self._put = asyncio.Event()
+
+    async def put(self, lane: str, item: T):
+        await self.queues[self.round_robin.lane(lane)].put(item)
+        self._put.set()
+
+    def get_nowait(self) -> T:
+        ready = [lane for lane, queue in self.queues.items() if not queue.empty()]
+        if not ready:
+            raise asyncio.QueueEmpty
+        return self.queues[self.round_robin.pick(ready)].get_nowait()
+
+    async def get(self) -> T:
+        while True:
+            try:
+                return self.get_nowait()
+            except asyncio.QueueEmpty:
+                self._put.clear()
+                await self._put.wait()
+
+    def empty(self) -> bool:
+        return all(queue.empty() for queue in self.queues.values())
@@ -0,0 +1,293 @@
+import asyncio
+import itertools
+import logging
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+from roster_agent_runtime import codec, constants, metrics, settings
+from roster_agent_runtime.messaging.base import (
+    MessageBroker,
+    MessageRejected,
+    PublishError,
+    failure_reason,
+)
+from roster_agent_runtime.models.api.messaging import DeadLetter
+from roster_agent_runtime.util.async_helpers import make_async
+
+logger = logging.getLogger(constants.LOGGER_NAME)
+
+
+class InMemoryQueue:
+    def __init__(self, name: str, max_size: int):
+        self.name = name
+        # Message bodies, with the delivery attempts made before
+        self.messages: asyncio.Queue[tuple[bytes, int]] = asyncio.Queue(
+            maxsize=max_size
+        )
+        self.consumer: Optional[asyncio.Task] = None
+        self.deliveries: set[asyncio.Task] = set()
+
+
+class InMemoryBroker(MessageBroker):
+    """
+    In-process stand-in for RabbitMQClient, for single-node deployments,
+    benchmarks and tests.
+
+    Queues are created on first use and outlive their consumers, as they do on
+    RabbitMQ. Messages are encoded on publish and decoded on delivery, so
+    callbacks never share a payload with the publisher. Each delivery runs as
+    its own task, bounded by max_in_flight per queue. Failed messages are
+    retried after the same delays as on RabbitMQ, then dead-lettered.
+    """
+
+    def __init__(
+        self,
+        max_queue_size: int = settings.MEMORY_BROKER_MAX_QUEUE_SIZE,
+        max_in_flight: int = settings.RABBITMQ_MAX_IN_FLIGHT,
+        retry_delays: Optional[list[float]] = None,
+        max_dead_letters: int = settings.MEMORY_BROKER_MAX_DEAD_LETTERS,
+    ):
+        self.max_queue_size = max_queue_size
+        self.max_in_flight = max_in_flight
+        self.retry_delays = (
+            retry_delays if retry_delays is not None else settings.MESSAGE_RETRY_DELAYS
+        )
+        self.queues: dict[str, InMemoryQueue] = {}
+        self.callbacks: dict[str, list] = {}
+        # Dead letters with their message bodies, for replay
+        self.dead_letters: deque[tuple[DeadLetter, bytes]] = deque(
+            maxlen=max_dead_letters
+        )
+        self._retries: set[asyncio.TimerHandle] = set()
+
+        self.published = metrics.counter("memory_broker_messages_published_total")
+        self.rejected = metrics.counter("memory_broker_publishes_rejected_total")
+        self.consumed = metrics.counter("memory_broker_messages_consumed_total")
+        self.retried = metrics.counter("memory_broker_messages_retried_total")
+        self.dead_lettered = metrics.counter(
+            "memory_broker_messages_dead_lettered_total"
+        )
+        metrics.callback_gauge(
+            "memory_broker_queued_messages",
+            lambda: sum(queue.messages.qsize() for queue in self.queues.values()),
+        )
+
+    async def setup(self):
+        logger.debug("(memory-broker) Using in-process message broker")
+
+    async def teardown(self):
+        for handle in self._retries:
+            handle.cancel()
+        self._retries = set()
+        for queue in self.queues.values():
+            self._stop_consumer(queue)
+            for delivery in queue.deliveries:
+                delivery.cancel()
+        self.queues = {}
+        self.callbacks = {}
+
+    def _queue(self, queue_name: str) -> InMemoryQueue:
+        queue = self.queues.get(queue_name)
+        if queue is None:
+            queue = InMemoryQueue(queue_name, max_size=self.max_queue_size)
+            self.queues[queue_name] = queue
+        return queue
+
+    def _put(self, queue_name: str, body: bytes, attempt: int = 0):
+        try:
+            self._queue(queue_name).messages.put_nowait((body, attempt))
+        except asyncio.QueueFull:
+            self.rejected.inc()
+            raise PublishError(
+                "In-memory queue is full.", details={"queue": queue_name}
+            )
+        self.published.inc()
+
+    async def publish(
+        self, queue_name: str, message: str, wait_for_confirm: bool = True
+    ):
+        self._put(queue_name, message.encode())
+
+    async def publish_json(
+        self,
+        queue_name: str,
+        message: dict,
+        wait_for_confirm: bool = True,
+        sender_queue: Optional[str] = None,
+    ):
+        self._put(queue_name, codec.dumps(message))
+
+    async def publish_json_batch(
+        self, messages: Iterable[tuple[str, dict]], sender_queue: Optional[str] = None
+    ):
+        failed_indexes = []
+        total = 0
+        for index, (queue_name, message) in enumerate(messages):
+            total += 1
+            try:
+                self._put(queue_name, codec.dumps(message))
+            except PublishError:
+                failed_indexes.append(index)
+        if failed_indexes:
+            raise PublishError(
+                details={
+                    "failed": len(failed_indexes),
+                    "total": total,
+                    "failed_indexes": failed_indexes,
+                }
+            )
+
+    async def register_callback(
+        self,
+        queue_name: str,
+        callback: callable,
+        prefetch_count: Optional[int] = None,
+        max_in_flight: Optional[int] = None,
+    ):
+        # If callback is sync, wrap it into an async function.
+        if not asyncio.iscoroutinefunction(callback):
+            callback = make_async(callback)
+        self.callbacks.setdefault(queue_name, []).append(callback)
+
+        # prefetch_count has no meaning in-process, deliveries are only
+        # bounded by max_in_flight.
+        queue = self._queue(queue_name)
+        if queue.consumer is None:
+            queue.consumer = asyncio.create_task(
+                self._consume(queue, max_in_flight or self.max_in_flight)
+            )
+
+    async def _consume(self, queue: InMemoryQueue, max_in_flight: int):
+        semaphore = asyncio.Semaphore(max_in_flight)
+        while True:
+            await semaphore.acquire()
+            try:
+                body, attempt = await queue.messages.get()
+            except asyncio.CancelledError:
+                semaphore.release()
+                raise
+            delivery = asyncio.create_task(self._deliver(queue.name, body, attempt))
+            queue.deliveries.add(delivery)
+            delivery.add_done_callback(queue.deliveries.discard)
+            delivery.add_done_callback(lambda _: semaphore.release())
+
+    async def _deliver(self, queue_name: str, body: bytes, attempt: int):
+        try:
+            payload = codec.loads(body)
+        except codec.DecodeError as e:
+            self._dead_letter(queue_name, body, failure_reason(e), 1)
+            return
+        callbacks = self.callbacks.get(queue_name, [])
+        results = await asyncio.gather(
+            *[callback(payload) for callback in callbacks],
+            return_exceptions=True,
+        )
+        self.consumed.inc()
+        failures = [result for result in results if isinstance(result, BaseException)]
+        if failures:
+            self._retry_or_dead_letter(queue_name, body, failures[0], attempt)
+
+    async def reject(
+        self, queue_name: str, message: dict, error: BaseException, attempt: int = 0
+    ):
+        self._retry_or_dead_letter(queue_name, codec.dumps(message), error, attempt)
+
+    def _retry_or_dead_letter(
+        self, queue_name: str, body: bytes, error: BaseException, attempt: int
+    ):
+        if isinstance(error, MessageRejected) or attempt >= len(self.retry_delays):
+            self._dead_letter(
+                queue_name, body, failure_reason(error), attempts=attempt + 1
+            )
+            return
+        logger.warning(
+            "(memory-broker) Delivery to %s failed (attempt %d), retrying in %ss: %s",
+            queue_name,
+            attempt + 1,
+            self.retry_delays[attempt],
+            failure_reason(error),
+        )
+        self.retried.inc()
+        handle = None
+
+        def redeliver():
+            self._retries.discard(handle)
+            try:
+                self._put(queue_name, body, attempt + 1)
+            except PublishError as e:
+                self._dead_letter(queue_name, body, failure_reason(e), attempt + 1)
+
+        handle = asyncio.get_running_loop().call_later(
+            self.retry_delays[attempt], redeliver
+        )
+        self._retries.add(handle)
+
+    def _dead_letter(self, queue_name: str, body: bytes, reason: str, attempts: int):
+        logger.warning(
+            "(memory-broker) Dead-lettering message to %s after %d attempt(s): %s",
+            queue_name,
+            attempts,
+            reason,
+        )
+        try:
+            payload = codec.loads(body)
+        except codec.DecodeError:
+            payload = None
+        dead_letter = DeadLetter(
+            id=uuid.uuid4().hex,
+            queue=queue_name,
+            reason=reason,
+            attempts=attempts,
+            failed_at=datetime.now(timezone.utc).isoformat(),
+            payload=payload if isinstance(payload, dict) else None,
+        )
+        self.dead_letters.append((dead_letter, body))
+        self.dead_lettered.inc()
+
+    async def list_dead_letters(
+        self, limit: int = 100, offset: int = 0
+    ) -> list[DeadLetter]:
+        return [
+            dead_letter
+            for dead_letter, _ in itertools.islice(
+                self.dead_letters, offset, offset + limit
+            )
+        ]
+
+    async def replay_dead_letters(
+        self, ids: Optional[list[str]] = None, limit: int = 100, offset: int = 0
+    ) -> int:
+        kept = []
+        replayed = 0
+        for index, (dead_letter, body) in enumerate(list(self.dead_letters)):
+            if ids is None:
+                selected = offset <= index < offset + limit
+            else:
+                selected = dead_letter.id in ids
+            if selected:
+                # Replayed messages start over, with all their retries
+                try:
+                    self._put(dead_letter.queue, body)
+                    replayed += 1
+                    continue
+                except PublishError:
+                    pass
+            kept.append((dead_letter, body))
+        self.dead_letters = deque(kept, maxlen=self.dead_letters.maxlen)
+        logger.info("(memory-broker) Replayed %d dead-lettered messages", replayed)
+        return replayed
+
+    def _stop_consumer(self, queue: InMemoryQueue):
+        if queue.consumer is not None:
+            queue.consumer.cancel()
+            queue.consumer = None
+
+    async def deregister_callback(self, queue_name: str, callback: callable):
+        if queue_name in self.callbacks and callback in self.callbacks[queue_name]:
+            self.callbacks[queue_name].remove(callback)
+
+        # Messages stay queued until a callback is registered again
+        if not self.callbacks.get(queue_name) and queue_name in self.queues:
+            self._stop_consumer(self.queues[queue_name])
@@ -1,16 +1,255 @@
 import asyncio
-import json
 import logging
+import uuid
+import zlib
+from datetime import datetime, timezone
+from typing import Iterable, Optional
 
-from aio_pika import IncomingMessage, Message, connect
-from aio_pika.abc import AbstractQueue
-from roster_agent_runtime import constants, errors, settings
+from aio_pika import ExchangeType, IncomingMessage, Message, connect
+from aio_pika.abc import (
+    AbstractChannel,
+    AbstractConnection,
+    AbstractExchange,
+    AbstractQueue,
+)
+from pydantic import ValidationError
+from roster_agent_runtime import codec, constants, errors, metrics, settings
+from roster_agent_runtime.blobs import BlobStore
+from roster_agent_runtime.messaging import encoding, lanes
+from roster_agent_runtime.messaging.base import (
+    MessageBroker,
+    MessageRejected,
+    PublishError,
+    failure_reason,
+)
+from roster_agent_runtime.models.api.messaging import DeadLetter
+from roster_agent_runtime.models.messaging import BlobReference
 from roster_agent_runtime.util.async_helpers import make_async
+from roster_agent_runtime.util.backoff import Backoff
 
 logger = logging.getLogger(constants.LOGGER_NAME)
 
+# Delivery attempts made before this one, set on retried messages
+ATTEMPT_HEADER = "x-roster-attempt"
+# Set on dead-lettered messages
+DEAD_LETTER_ID_HEADER = "x-roster-dead-letter-id"
+ORIGINAL_QUEUE_HEADER = "x-roster-original-queue"
+FAILURE_REASON_HEADER = "x-roster-failure-reason"
+ATTEMPTS_HEADER = "x-roster-attempts"
+FAILED_AT_HEADER = "x-roster-failed-at"
 
-class RabbitMQClient:
+
+class QueueConsumer:
+    # Each consumer has its own channel, so prefetch (QoS) applies per queue
+    # and a slow queue cannot hold up deliveries to the others.
+    def __init__(
+        self,
+        queue_name: str,
+        channel: AbstractChannel,
+        queue: AbstractQueue,
+        max_in_flight: int,
+        lane_weights: dict[str, int],
+    ):
+        self.queue_name = queue_name
+        self.channel = channel
+        self.queue = queue
+        self.consumer_tag: Optional[str] = None
+        # Bounds concurrent handlers, aio-pika runs each delivery as a task.
+        # Prefetched messages beyond max_in_flight wait here, by lane.
+        self.scheduler = lanes.LaneScheduler(max_in_flight, lane_weights)
+        labels = {"queue": queue_name}
+        self.in_flight = metrics.gauge("rabbitmq_in_flight_messages", labels=labels)
+        self.consumed = metrics.counter(
+            "rabbitmq_messages_consumed_total", labels=labels
+        )
+
+    async def cancel(self):
+        if self.channel.is_closed:
+            # Consumers die with their channel, nothing to cancel
+            self.consumer_tag = None
+            return
+        if self.consumer_tag is not None:
+            await self.queue.cancel(self.consumer_tag)
+            self.consumer_tag = None
+        await self.channel.close()
+
+
+class DisconnectedPolicy:
+    # Wait (bounded) for the connection to be restored
+    BUFFER = "buffer"
+    # Raise PublishError immediately
+    FAIL = "fail"
+
+
+class MessageEncoding:
+    # msgpack and compression for peers which advertise support
+    NEGOTIATE = "negotiate"
+    # Always plain JSON
+    JSON = "json"
+
+
+class RoutingMode:
+    # One queue (and consumer) per agent, published through the default exchange
+    QUEUE = "queue"
+    # Agents are bindings on a few shared queues, published through a topic exchange.
+    # A key must be bound by one runtime only (the one running the agent), since
+    # the exchange copies a message to every queue it is bound to. The message
+    # router only registers callbacks for local agents, so bindings follow them.
+    TOPIC = "topic"
+
+
+class ConfirmedPublisher:
+    """
+    Pipelines publishes over a few channels with publisher confirms enabled.
+
+    Confirms are awaited concurrently, so throughput is not capped by one round
+    trip per message. Outstanding (unconfirmed) publishes are bounded by the
+    window, which applies backpressure to publishers once it is full.
+    """
+
+    def __init__(self, channel_count: int, window: int):
+        self.channel_count = channel_count
+        self.window = window
+        self.channels: list[AbstractChannel] = []
+        self.exchanges: list[AbstractExchange] = []
+        # Other exchanges published to (e.g. for retries), one per channel
+        self.named_exchanges: dict[str, list[AbstractExchange]] = {}
+        self._window = asyncio.Semaphore(window)
+        self._outstanding: set[asyncio.Task] = set()
+
+        self.published = metrics.counter("rabbitmq_messages_published_total")
+        self.failures = metrics.counter("rabbitmq_publish_failures_total")
+        metrics.callback_gauge(
+            "rabbitmq_outstanding_confirms", lambda: len(self._outstanding)
+        )
+
+    async def open(
+        self, connection: AbstractConnection, exchange_name: Optional[str] = None
+    ):
+        """Open the publishing channels, using the default exchange unless named."""
+        self.channels = [
+            await connection.channel(publisher_confirms=True)
+            for _ in range(self.channel_count)
+        ]
+        # The default exchange is always available, by its empty name
+        self.named_exchanges = {
+            "": [channel.default_exchange for channel in self.channels]
+        }
+        if exchange_name is None:
+            self.exchanges = self.named_exchanges[""]
+        else:
+            self.exchanges = [
+                await channel.declare_exchange(
+                    exchange_name, ExchangeType.TOPIC, durable=True
+                )
+                for channel in self.channels
+            ]
+
+    async def declare_exchange(self, name: str, exchange_type: ExchangeType):
+        self.named_exchanges[name] = [
+            await channel.declare_exchange(name, exchange_type, durable=True)
+            for channel in self.channels
+        ]
+
+    async def close(self):
+        await self.wait_for_confirms()
+        for channel in self.channels:
+            if not channel.is_closed:
+                await channel.close()
+        self.channels = []
+        self.exchanges = []
+        self.named_exchanges = {}
+
+    def _exchange_for(
+        self, routing_key: str, exchange_name: Optional[str] = None
+    ) -> AbstractExchange:
+        exchanges = (
+            self.exchanges
+            if exchange_name is None
+            else self.named_exchanges[exchange_name]
+        )
+        # Messages to the same queue share a channel, which preserves their order
+        return exchanges[hash(routing_key) % len(exchanges)]
+
+    async def _publish_and_confirm(
+        self,
+        routing_key: str,
+        body: bytes,
+        properties: Optional[dict] = None,
+        exchange_name: Optional[str] = None,
+    ) -> Optional[Exception]:
+        try:
+            await self._exchange_for(routing_key, exchange_name).publish(
+                Message(body=body, **(properties or {})), routing_key=routing_key
+            )
+            self.published.inc()
+            return None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failures.inc()
+            logger.warning("(rmq) Publish to %s was not confirmed: %s", routing_key, e)
+            return e
+        finally:
+            self._window.release()
+
+    async def start_publish(
+        self,
+        routing_key: str,
+        body: bytes,
+        properties: Optional[dict] = None,
+        exchange_name: Optional[str] = None,
+    ) -> asyncio.Task:
+        """Send a message, waiting only for space in the window, not the confirm."""
+        if not self.channels:
+            raise PublishError("RabbitMQ publisher is not open.")
+        await self._window.acquire()
+        task = asyncio.create_task(
+            self._publish_and_confirm(routing_key, body, properties, exchange_name)
+        )
+        self._outstanding.add(task)
+        task.add_done_callback(self._outstanding.discard)
+        return task
+
+    async def publish(
+        self,
+        routing_key: str,
+        body: bytes,
+        properties: Optional[dict] = None,
+        exchange_name: Optional[str] = None,
+    ):
+        error = await (
+            await self.start_publish(routing_key, body, properties, exchange_name)
+        )
+        if error is not None:
+            raise PublishError(details={"queue": routing_key}) from error
+
+    async def publish_batch(
+        self, messages: Iterable[tuple[str, bytes, Optional[dict]]]
+    ):
+        tasks = [
+            await self.start_publish(routing_key, body, properties)
+            for routing_key, body, properties in messages
+        ]
+        results = await asyncio.gather(*tasks)
+        failed_indexes = [
+            index for index, error in enumerate(results) if error is not None
+        ]
+        if failed_indexes:
+            raise PublishError(
+                details={
+                    "failed": len(failed_indexes),
+                    "total": len(tasks),
+                    "failed_indexes": failed_indexes,
+                }
+            ) from results[failed_indexes[0]]
+
+    async def wait_for_confirms(self):
+        if self._outstanding:
+            await asyncio.gather(*self._outstanding)
+
+
+class RabbitMQClient(MessageBroker):
     def __init__(
         self,
         host: str = settings.RABBITMQ_HOST,
@@ -18,11 +257,103 @@ class RabbitMQClient:
         username: str = settings.RABBITMQ_USER,
         password: str = settings.RABBITMQ_PASSWORD,
         vhost: str = settings.RABBITMQ_VHOST,
+        channel_pool_size: int = settings.RABBITMQ_CHANNEL_POOL_SIZE,
+        prefetch_count: int = settings.RABBITMQ_PREFETCH_COUNT,
+        max_in_flight: int = settings.RABBITMQ_MAX_IN_FLIGHT,
+        publish_window: int = settings.RABBITMQ_PUBLISH_WINDOW,
+        disconnected_policy: str = settings.RABBITMQ_DISCONNECTED_POLICY,
+        disconnected_buffer_size: int = settings.RABBITMQ_DISCONNECTED_BUFFER_SIZE,
+        disconnected_timeout: float = settings.RABBITMQ_DISCONNECTED_TIMEOUT,
+        routing_mode: str = settings.RABBITMQ_ROUTING_MODE,
+        topic_exchange: str = settings.RABBITMQ_TOPIC_EXCHANGE,
+        runtime_id: str = settings.RABBITMQ_RUNTIME_ID,
+        shared_queues: int = settings.RABBITMQ_SHARED_QUEUES,
+        shared_prefetch_count: int = settings.RABBITMQ_SHARED_PREFETCH_COUNT,
+        shared_max_in_flight: int = settings.RABBITMQ_SHARED_MAX_IN_FLIGHT,
+        retry_delays: Optional[list[float]] = None,
+        dead_letter_queue: str = settings.DEAD_LETTER_QUEUE,
+        message_encoding: str = settings.MESSAGE_ENCODING,
+        compression_min_bytes: int = settings.MESSAGE_COMPRESSION_MIN_BYTES,
+        blob_store: Optional[BlobStore] = None,
+        claim_check_min_bytes: int = settings.CLAIM_CHECK_MIN_BYTES,
+        lane_weights: Optional[dict[str, int]] = None,
     ):
+        if disconnected_policy not in (
+            DisconnectedPolicy.BUFFER,
+            DisconnectedPolicy.FAIL,
+        ):
+            raise ValueError(f"Unknown disconnected policy: {disconnected_policy}")
+        if routing_mode not in (RoutingMode.QUEUE, RoutingMode.TOPIC):
+            raise ValueError(f"Unknown routing mode: {routing_mode}")
+        if message_encoding not in (MessageEncoding.NEGOTIATE, MessageEncoding.JSON):
+            raise ValueError(f"Unknown message encoding: {message_encoding}")
         self.connection = None
-        self.channel = None
+        self.publisher = ConfirmedPublisher(
+            channel_count=channel_pool_size, window=publish_window
+        )
         self.callbacks = {}
-        self.active_queues = {}
+        self.active_queues: dict[str, QueueConsumer] = {}
+        # Consumer settings by queue, so consumers can be restored on reconnect
+        self.consumer_options: dict[str, tuple[int, int]] = {}
+        self.prefetch_count = prefetch_count
+        self.max_in_flight = max_in_flight
+        self.disconnected_policy = disconnected_policy
+        self.disconnected_buffer_size = disconnected_buffer_size
+        self.disconnected_timeout = disconnected_timeout
+        self.routing_mode = routing_mode
+        self.topic_exchange = topic_exchange
+        self.shared_queue_names = [
+            f"roster-runtime:{runtime_id}:{i}" for i in range(shared_queues)
+        ]
+        self.shared_prefetch_count = shared_prefetch_count
+        self.shared_max_in_flight = shared_max_in_flight
+        # Failed messages wait in a queue per delay (with a TTL), after which
+        # the broker dead-letters them back to where they were sent
+        self.retry_delays = (
+            retry_delays if retry_delays is not None else settings.MESSAGE_RETRY_DELAYS
+        )
+        self.retry_exchanges = [
+            f"roster.retry.{int(delay * 1000)}ms" for delay in self.retry_delays
+        ]
+        self.dead_letter_queue = dead_letter_queue
+        self.message_encoding = message_encoding
+        self.compression_min_bytes = compression_min_bytes
+        self.peers = encoding.PeerCapabilities(
+            ttl=settings.MESSAGE_PEER_CAPABILITY_TTL,
+            max_size=settings.MESSAGE_PEER_CAPABILITY_MAX,
+        )
+        # Large message data is stored as a blob, and sent as a reference,
+        # to peers which advertise the same store
+        self.blob_store = blob_store
+        self.claim_check_min_bytes = claim_check_min_bytes
+        self.accept = encoding.ACCEPT
+        self.claim_check_token: Optional[str] = None
+        if blob_store is not None:
+            self.claim_check_token = encoding.claim_check_token(blob_store.store_id)
+            self.accept = f"{self.accept},{self.claim_check_token}"
+        self.lane_weights = lane_weights or settings.MESSAGE_LANE_WEIGHTS
+        self.backoff = Backoff(maximum=settings.RABBITMQ_RECONNECT_BACKOFF_MAX)
+
+        self._connected = asyncio.Event()
+        self._closing = False
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._waiting_publishes = 0
+
+        self.reconnects = metrics.counter("rabbitmq_reconnects_total")
+        self.reconnect_seconds = metrics.gauge("rabbitmq_last_reconnect_seconds")
+        self.interrupted_deliveries = metrics.counter(
+            "rabbitmq_deliveries_interrupted_total"
+        )
+        self.buffered_publishes = metrics.counter("rabbitmq_publishes_buffered_total")
+        self.rejected_publishes = metrics.counter(
+            "rabbitmq_publishes_rejected_disconnected_total"
+        )
+        self.retried = metrics.counter("rabbitmq_messages_retried_total")
+        self.dead_lettered = metrics.counter("rabbitmq_messages_dead_lettered_total")
+        self.claim_checks = metrics.counter("rabbitmq_claim_checks_total")
+        metrics.callback_gauge(
+            "rabbitmq_connected", lambda: int(self._connected.is_set())
+        )
         self.host = host
         self.port = port
         self.username = username
@@ -58,67 +389,377 @@ class RabbitMQClient:
             ) from e
 
     async def connect(self):
+        self._closing = False
         self.connection = await connect(
             f"amqp://{self.username}:{self.password}@{self.host}"
         )
-        self.channel = await self.connection.channel()
+        self.connection.close_callbacks.add(self._on_connection_closed)
+        if self.routing_mode == RoutingMode.TOPIC:
+            await self.publisher.open(self.connection, self.topic_exchange)
+            for queue_name in self.shared_queue_names:
+                self.active_queues[queue_name] = await self._setup_queue_consumer(
+                    queue_name,
+                    prefetch_count=self.shared_prefetch_count,
+                    max_in_flight=self.shared_max_in_flight,
+                )
+        else:
+            await self.publisher.open(self.connection)
+        await self._declare_retry_topology()
+        # Restore consumers (or bindings) for every queue with registered callbacks
+        for queue_name, callbacks in self.callbacks.items():
+            if callbacks:
+                await self._start_consumer(queue_name)
+        self._connected.set()
+
+    async def _declare_retry_topology(self):
+        channel = self.publisher.channels[0]
+        # Expired retries go back through the exchange messages are routed by
+        returns_to = (
+            self.topic_exchange if self.routing_mode == RoutingMode.TOPIC else ""
+        )
+        for exchange_name, delay in zip(self.retry_exchanges, self.retry_delays):
+            await self.publisher.declare_exchange(exchange_name, ExchangeType.FANOUT)
+            queue = await channel.declare_queue(
+                exchange_name,
+                durable=True,
+                arguments={
+                    "x-message-ttl": int(delay * 1000),
+                    "x-dead-letter-exchange": returns_to,
+                },
+            )
+            await queue.bind(exchange_name)
+        await channel.declare_queue(self.dead_letter_queue, durable=True)
+
+    def _on_connection_closed(self, sender, exc: Optional[BaseException] = None):
+        if self.connection is not sender:
+            return
+        self._connected.clear()
+        if self._closing:
+            return
+        interrupted = sum(
+            consumer.in_flight.value for consumer in self.active_queues.values()
+        )
+        self.interrupted_deliveries.inc(interrupted)
+        logger.warning(
+            "(rmq) Connection lost (%s), %d deliveries interrupted, reconnecting",
+            exc,
+            interrupted,
+        )
+        # Consumers died with the connection, they are restored on reconnect
+        self.active_queues = {}
+        if self._reconnect_task is None or self._reconnect_task.done():
+            self._reconnect_task = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self):
+        started_at = asyncio.get_running_loop().time()
+        while not self._closing:
+            delay = self.backoff.next_delay()
+            logger.debug("(rmq) Reconnecting in %.2fs", delay)
+            await asyncio.sleep(delay)
+            try:
+                await self.connect()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("(rmq) Reconnect failed: %s", e)
+                # Don't leak a connection that failed while restoring consumers
+                if self.connection is not None and not self.connection.is_closed:
+                    await self.connection.close()
+                continue
+            self.backoff.reset()
+            self.reconnects.inc()
+            self.reconnect_seconds.set(asyncio.get_running_loop().time() - started_at)
+            logger.info(
+                "(rmq) Reconnected, restored %d consumers", len(self.active_queues)
+            )
+            return
 
     async def disconnect(self):
-        if self.channel:
-            await self.channel.close()
-        else:
-            logger.warning("RabbitMQ channel is not open, cannot close")
+        self._closing = True
+        self._connected.clear()
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+        for consumer in list(self.active_queues.values()):
+            await consumer.cancel()
+        self.active_queues = {}
+        await self.publisher.close()
         if self.connection:
             await self.connection.close()
         else:
             logger.warning("RabbitMQ connection is not open, cannot close")
 
-    async def _publish(self, queue_name: str, message: bytes):
-        await self.channel.default_exchange.publish(
-            Message(body=message), routing_key=queue_name
+    async def _wait_for_connection(self):
+        if self._connected.is_set():
+            return
+        if (
+            self.disconnected_policy == DisconnectedPolicy.FAIL
+            or self._waiting_publishes >= self.disconnected_buffer_size
+        ):
+            self.rejected_publishes.inc()
+            raise PublishError("RabbitMQ is disconnected.")
+        self.buffered_publishes.inc()
+        self._waiting_publishes += 1
+        try:
+            await asyncio.wait_for(
+                self._connected.wait(), timeout=self.disconnected_timeout
+            )
+        except asyncio.TimeoutError:
+            self.rejected_publishes.inc()
+            raise PublishError("RabbitMQ did not reconnect in time.")
+        finally:
+            self._waiting_publishes -= 1
+
+    def _encode(
+        self, queue_name: str, message: dict, sender_queue: Optional[str] = None
+    ) -> tuple[bytes, dict]:
+        accept = (
+            self.peers.get(queue_name)
+            if self.message_encoding == MessageEncoding.NEGOTIATE
+            else frozenset()
+        )
+        body, content_type, content_encoding = encoding.encode(
+            message, accept, self.compression_min_bytes
         )
+        # Tells the recipient what it may send back to the sender's queue
+        headers = {encoding.ACCEPT_HEADER: self.accept}
+        if sender_queue is not None:
+            headers[encoding.SENDER_QUEUE_HEADER] = sender_queue
+        return body, {
+            "content_type": content_type,
+            "content_encoding": content_encoding,
+            "headers": headers,
+        }
 
-    async def publish(self, queue_name: str, message: str):
-        await self._publish(queue_name, message.encode())
+    async def _claim_check(self, queue_name: str, message: dict) -> dict:
+        if (
+            self.blob_store is None
+            or not isinstance(message, dict)
+            or not isinstance(message.get("data"), dict)
+            or self.claim_check_token not in self.peers.get(queue_name)
+        ):
+            return message
+        data = codec.dumps(message["data"])
+        if len(data) < self.claim_check_min_bytes:
+            return message
+        reference = await self.blob_store.put(data)
+        self.claim_checks.inc()
+        return {**message, "data": {}, "data_ref": reference.dict()}
 
-    async def publish_json(self, queue_name: str, message: dict):
-        await self._publish(queue_name, json.dumps(message).encode())
+    async def _publish(
+        self,
+        queue_name: str,
+        body: bytes,
+        properties: Optional[dict] = None,
+        wait_for_confirm: bool = True,
+    ):
+        await self._wait_for_connection()
+        if wait_for_confirm:
+            await self.publisher.publish(queue_name, body, properties)
+        else:
+            # Failures are still logged and counted once the confirm arrives
+            await self.publisher.start_publish(queue_name, body, properties)
+
+    async def publish(
+        self, queue_name: str, message: str, wait_for_confirm: bool = True
+    ):
+        await self._publish(
+            queue_name, message.encode(), wait_for_confirm=wait_for_confirm
+        )
+
+    async def publish_json(
+        self,
+        queue_name: str,
+        message: dict,
+        wait_for_confirm: bool = True,
+        sender_queue: Optional[str] = None,
+    ):
+        message = await self._claim_check(queue_name, message)
+        body, properties = self._encode(queue_name, message, sender_queue)
+        await self._publish(queue_name, body, properties, wait_for_confirm)
 
-    async def register_callback(self, queue_name: str, callback: callable):
+    async def publish_json_batch(
+        self, messages: Iterable[tuple[str, dict]], sender_queue: Optional[str] = None
+    ):
+        """Publish a burst of messages together, waiting for all confirms."""
+        messages = [
+            (queue_name, await self._claim_check(queue_name, message))
+            for queue_name, message in messages
+        ]
+        await self._wait_for_connection()
+        await self.publisher.publish_batch(
+            (queue_name, *self._encode(queue_name, message, sender_queue))
+            for queue_name, message in messages
+        )
+
+    async def register_callback(
+        self,
+        queue_name: str,
+        callback: callable,
+        prefetch_count: Optional[int] = None,
+        max_in_flight: Optional[int] = None,
+    ):
         # If callback is sync, wrap it into an async function.
         if not asyncio.iscoroutinefunction(callback):
             callback = make_async(callback)
 
         # Register the callback.
-        # NOTE: Callbacks must accept single string argument (decoded message body).
+        # NOTE: Callbacks must accept a single argument (the decoded JSON message body).
         if queue_name not in self.callbacks:
             self.callbacks[queue_name] = []
         self.callbacks[queue_name].append(callback)
 
+        if queue_name not in self.consumer_options:
+            self.consumer_options[queue_name] = (
+                prefetch_count or self.prefetch_count,
+                max_in_flight or self.max_in_flight,
+            )
+
         # If a consumer hasn't been set up for this queue yet, set it up.
-        if queue_name not in self.active_queues:
-            consumer_tag, queue = await self._setup_queue_consumer(queue_name)
-            self.active_queues[queue_name] = (consumer_tag, queue)
+        # While disconnected, it is set up once the connection is restored.
+        if self.routing_mode == RoutingMode.TOPIC:
+            if len(self.callbacks[queue_name]) == 1 and self._connected.is_set():
+                await self._start_consumer(queue_name)
+        elif queue_name not in self.active_queues and self._connected.is_set():
+            await self._start_consumer(queue_name)
+
+    def _shared_queue_for(self, routing_key: str) -> QueueConsumer:
+        # Stable across restarts, so a key is never left bound to two shared queues
+        index = zlib.crc32(routing_key.encode()) % len(self.shared_queue_names)
+        return self.active_queues[self.shared_queue_names[index]]
+
+    async def _start_consumer(self, queue_name: str):
+        if self.routing_mode == RoutingMode.TOPIC:
+            # Only a binding, deliveries arrive through the shared consumer
+            await self._shared_queue_for(queue_name).queue.bind(
+                self.topic_exchange, routing_key=queue_name
+            )
+            return
+        prefetch_count, max_in_flight = self.consumer_options[queue_name]
+        self.active_queues[queue_name] = await self._setup_queue_consumer(
+            queue_name, prefetch_count=prefetch_count, max_in_flight=max_in_flight
+        )
 
     async def _setup_queue_consumer(
-        self, queue_name: str
-    ) -> tuple[str, "AbstractQueue"]:
-        queue = await self.channel.declare_queue(queue_name)
-        consumer_tag = await queue.consume(self._create_message_handler(queue_name))
-        return consumer_tag, queue
+        self, queue_name: str, prefetch_count: int, max_in_flight: int
+    ) -> QueueConsumer:
+        channel = await self.connection.channel()
+        await channel.set_qos(prefetch_count=prefetch_count)
+        queue = await channel.declare_queue(queue_name)
+        consumer = QueueConsumer(
+            queue_name,
+            channel=channel,
+            queue=queue,
+            max_in_flight=max_in_flight,
+            lane_weights=self.lane_weights,
+        )
+        consumer.consumer_tag = await queue.consume(
+            self._create_message_handler(consumer)
+        )
+        return consumer
+
+    def _create_message_handler(self, consumer: QueueConsumer):
+        queue_name = consumer.queue_name
+        shared = self.routing_mode == RoutingMode.TOPIC
 
-    def _create_message_handler(self, queue_name: str):
         async def handle_message(message: IncomingMessage):
-            # Context manager handles acknowledgement
-            async with message.process():
-                callbacks = self.callbacks.get(queue_name, [])
-                await asyncio.gather(
-                    *[callback(message.body.decode()) for callback in callbacks],
-                    return_exceptions=True,
-                )
+            # Context manager handles acknowledgement. Failed messages
+            # are acknowledged once a retry (or dead letter) is confirmed,
+            # and are requeued if that publish fails.
+            async with message.process(requeue=True):
+                # Shared queues carry many agents, dispatch by routing key
+                routing_key = message.routing_key if shared else queue_name
+                properties = {
+                    "content_type": message.content_type,
+                    "content_encoding": message.content_encoding,
+                    "headers": dict(message.headers),
+                }
+                # Decoded before waiting for a slot, since the lane depends
+                # on the kind of message
+                try:
+                    payload = encoding.decode(
+                        message.body,
+                        message.content_type,
+                        message.content_encoding,
+                    )
+                except codec.DecodeError as e:
+                    await self._dead_letter(
+                        routing_key,
+                        message.body,
+                        properties,
+                        failure_reason(e),
+                        attempts=1,
+                    )
+                    return
+                sender_queue = message.headers.get(encoding.SENDER_QUEUE_HEADER)
+                if sender_queue:
+                    self.peers.learn(
+                        self._header(message, encoding.SENDER_QUEUE_HEADER),
+                        message.headers.get(encoding.ACCEPT_HEADER),
+                    )
+                async with consumer.scheduler.slot(lanes.lane_for(payload)):
+                    consumer.in_flight.inc()
+                    try:
+                        await self._dispatch(
+                            routing_key,
+                            queue_name,
+                            shared,
+                            message,
+                            payload,
+                            properties,
+                        )
+                    finally:
+                        consumer.in_flight.dec()
+                        consumer.consumed.inc()
 
         return handle_message
 
+    async def _dispatch(
+        self,
+        routing_key: str,
+        queue_name: str,
+        shared: bool,
+        message: IncomingMessage,
+        payload: dict,
+        properties: dict,
+    ):
+        callbacks = self.callbacks.get(routing_key, [])
+        if shared and not callbacks:
+            # The key was unbound after this message was routed here (e.g. the
+            # agent moved), so it is retried through the exchange, to whichever
+            # runtime binds the key by then, rather than dropped
+            logger.debug(
+                "(rmq) No local recipient for %s on %s",
+                routing_key,
+                queue_name,
+            )
+            await self._retry_or_dead_letter(
+                routing_key,
+                message.body,
+                properties,
+                errors.AgentNotFoundError(
+                    f"No recipient for {routing_key} on this runtime.",
+                    agent=routing_key,
+                ),
+                attempt=int(message.headers.get(ATTEMPT_HEADER, 0)),
+            )
+            return
+        # A failure retries the message for every callback, which is why
+        # callbacks must be idempotent (see MessageBroker.register_callback)
+        results = await asyncio.gather(
+            *[callback(payload) for callback in callbacks],
+            return_exceptions=True,
+        )
+        failures = [result for result in results if isinstance(result, BaseException)]
+        if failures:
+            await self._retry_or_dead_letter(
+                routing_key,
+                message.body,
+                properties,
+                failures[0],
+                attempt=int(message.headers.get(ATTEMPT_HEADER, 0)),
+            )
+
     async def deregister_callback(self, queue_name: str, callback: callable):
         # Remove the callback from the queue's callback list.
         if queue_name in self.callbacks and callback in self.callbacks[queue_name]:
@@ -126,6 +767,246 @@ class RabbitMQClient:
 
         # If it's the last callback for the queue, stop consuming from the queue.
         if not self.callbacks.get(queue_name):  # No more callbacks for this queue.
-            consumer_tag, queue = self.active_queues.pop(queue_name, None)
-            if consumer_tag:
-                await queue.cancel(consumer_tag)
+            self.consumer_options.pop(queue_name, None)
+            if self.routing_mode == RoutingMode.TOPIC:
+                if self._connected.is_set():
+                    await self._shared_queue_for(queue_name).queue.unbind(
+                        self.topic_exchange, routing_key=queue_name
+                    )
+                return
+            consumer = self.active_queues.pop(queue_name, None)
+            if consumer is not None:
+                await consumer.cancel()
+
+    async def reject(
+        self, queue_name: str, message: dict, error: BaseException, attempt: int = 0
+    ):
+        await self._wait_for_connection()
+        body, properties = self._encode(queue_name, message)
+        await self._retry_or_dead_letter(queue_name, body, properties, error, attempt)
+
+    async def _retry_or_dead_letter(
+        self,
+        queue_name: str,
+        body: bytes,
+        properties: dict,
+        error: BaseException,
+        attempt: int,
+    ):
+        # The body is passed on as-is, along with its content properties
+        if isinstance(error, MessageRejected) or attempt >= len(self.retry_exchanges):
+            await self._dead_letter(
+                queue_name, body, properties, failure_reason(error), attempt + 1
+            )
+            return
+        logger.warning(
+            "(rmq) Delivery to %s failed (attempt %d), retrying in %ss: %s",
+            queue_name,
+            attempt + 1,
+            self.retry_delays[attempt],
+            failure_reason(error),
+        )
+        await self.publisher.publish(
+            queue_name,
+            body,
+            {
+                **properties,
+                "headers": {**properties["headers"], ATTEMPT_HEADER: attempt + 1},
+            },
+            exchange_name=self.retry_exchanges[attempt],
+        )
+        self.retried.inc()
+
+    async def _dead_letter(
+        self,
+        queue_name: str,
+        body: bytes,
+        properties: dict,
+        reason: str,
+        attempts: int,
+    ):
+        logger.warning(
+            "(rmq) Dead-lettering message to %s after %d attempt(s): %s",
+            queue_name,
+            attempts,
+            reason,
+        )
+        dead_letter_id = uuid.uuid4().hex
+        await self._pin_blob(body, properties, dead_letter_id)
+        headers = {
+            **properties["headers"],
+            DEAD_LETTER_ID_HEADER: dead_letter_id,
+            ORIGINAL_QUEUE_HEADER: queue_name,
+            FAILURE_REASON_HEADER: reason,
+            ATTEMPTS_HEADER: attempts,
+            FAILED_AT_HEADER: datetime.now(timezone.utc).isoformat(),
+        }
+        await self.publisher.publish(
+            self.dead_letter_queue,
+            body,
+            {**properties, "headers": headers},
+            exchange_name="",
+        )
+        self.dead_lettered.inc()
+
+    def _blob_reference(self, body: bytes, properties: dict) -> Optional[BlobReference]:
+        if self.blob_store is None:
+            return None
+        try:
+            payload = encoding.decode(
+                body, properties.get("content_type"), properties.get("content_encoding")
+            )
+            reference = BlobReference.parse_obj(payload["data_ref"])
+        except (codec.DecodeError, KeyError, TypeError, ValidationError):
+            return None
+        if reference.store != self.blob_store.store_id:
+            return None
+        return reference
+
+    async def _pin_blob(self, body: bytes, properties: dict, dead_letter_id: str):
+        # Dead letters can wait longer than the blob TTL to be replayed
+        reference = self._blob_reference(body, properties)
+        if reference is None:
+            return
+        try:
+            await self.blob_store.pin(reference, dead_letter_id)
+        except OSError as e:
+            logger.warning("(rmq) Failed to pin blob %s: %s", reference.key, e)
+
+    async def _unpin_blob(self, message: IncomingMessage):
+        reference = self._blob_reference(
+            message.body,
+            {
+                "content_type": message.content_type,
+                "content_encoding": message.content_encoding,
+            },
+        )
+        if reference is None:
+            return
+        try:
+            await self.blob_store.unpin(
+                reference, self._header(message, DEAD_LETTER_ID_HEADER)
+            )
+        except OSError as e:
+            logger.warning("(rmq) Failed to unpin blob %s: %s", reference.key, e)
+
+    @staticmethod
+    def _header(message: IncomingMessage, name: str) -> str:
+        value = message.headers.get(name, "")
+        return value.decode() if isinstance(value, bytes) else str(value)
+
+    def _to_dead_letter(self, message: IncomingMessage) -> DeadLetter:
+        try:
+            payload = encoding.decode(
+                message.body, message.content_type, message.content_encoding
+            )
+        except codec.DecodeError:
+            payload = None
+        return DeadLetter(
+            id=self._header(message, DEAD_LETTER_ID_HEADER),
+            queue=self._header(message, ORIGINAL_QUEUE_HEADER),
+            reason=self._header(message, FAILURE_REASON_HEADER),
+            attempts=int(message.headers.get(ATTEMPTS_HEADER, 0)),
+            failed_at=self._header(message, FAILED_AT_HEADER),
+            payload=payload if isinstance(payload, dict) else None,
+        )
+
+    async def _get_dead_letters(
+        self, channel: AbstractChannel, limit: int
+    ) -> list[IncomingMessage]:
+        # Messages are held (unacknowledged) until they are acked or requeued
+        queue = await channel.declare_queue(self.dead_letter_queue, durable=True)
+        messages = []
+        while len(messages) < limit:
+            message = await queue.get(no_ack=False, fail=False)
+            if message is None:
+                break
+            messages.append(message)
+        return messages
+
+    async def list_dead_letters(
+        self, limit: int = 100, offset: int = 0
+    ) -> list[DeadLetter]:
+        await self._wait_for_connection()
+        channel = await self.connection.channel()
+        try:
+            messages = await self._get_dead_letters(channel, offset + limit)
+            # Requeued in reverse, so they keep their order in the queue
+            for message in reversed(messages):
+                await message.nack(requeue=True)
+            return [self._to_dead_letter(message) for message in messages[offset:]]
+        finally:
+            await channel.close()
+
+    async def _replay_dead_letter(self, message: IncomingMessage):
+        # Replayed messages start over, with all their retries
+        headers = {
+            name: value
+            for name, value in message.headers.items()
+            if name in (encoding.ACCEPT_HEADER, encoding.SENDER_QUEUE_HEADER)
+        }
+        await self.publisher.publish(
+            self._header(message, ORIGINAL_QUEUE_HEADER),
+            message.body,
+            {
+                "content_type": message.content_type,
+                "content_encoding": message.content_encoding,
+                "headers": headers,
+            },
+        )
+        await message.ack()
+        await self._unpin_blob(message)
+
+    async def _replay_dead_letter_page(
+        self, channel: AbstractChannel, limit: int, offset: int
+    ) -> int:
+        messages = await self._get_dead_letters(channel, offset + limit)
+        for message in messages[offset:]:
+            await self._replay_dead_letter(message)
+        for message in reversed(messages[:offset]):
+            await message.nack(requeue=True)
+        return len(messages[offset:])
+
+    async def _replay_dead_letters_by_id(
+        self, channel: AbstractChannel, ids: set[str]
+    ) -> int:
+        queue = await channel.declare_queue(self.dead_letter_queue, durable=True)
+        replayed = 0
+        # One pass over the queue, a message at a time: the others are moved to
+        # the back (a requeue would put them at the front, to be taken again),
+        # so once every message was seen they are back in their order
+        for _ in range(queue.declaration_result.message_count):
+            message = await queue.get(no_ack=False, fail=False)
+            if message is None:
+                break
+            if self._header(message, DEAD_LETTER_ID_HEADER) in ids:
+                await self._replay_dead_letter(message)
+                replayed += 1
+                continue
+            await self.publisher.publish(
+                self.dead_letter_queue,
+                message.body,
+                {
+                    "content_type": message.content_type,
+                    "content_encoding": message.content_encoding,
+                    "headers": message.headers,
+                },
+                exchange_name="",
+            )
+            await message.ack()
+        return replayed
+
+    async def replay_dead_letters(
+        self, ids: Optional[list[str]] = None, limit: int = 100, offset: int = 0
+    ) -> int:
+        await self._wait_for_connection()
+        channel = await self.connection.channel()
+        try:
+            if ids is None:
+                replayed = await self._replay_dead_letter_page(channel, limit, offset)
+            else:
+                replayed = await self._replay_dead_letters_by_id(channel, set(ids))
+        finally:
+            await channel.close()
+        logger.info("(rmq) Replayed %d dead-lettered messages", replayed)
+        return replayed
@@ -1,27 +1,42 @@
 import asyncio
-import json
-from typing import Optional
+import time
+from typing import Awaitable, Callable, Optional, Union
 
 import pydantic
+from roster_agent_runtime import codec, errors, metrics, settings
 from roster_agent_runtime.agents import AgentHandle
 from roster_agent_runtime.agents.pool import AgentPool
+from roster_agent_runtime.blobs import BlobNotFoundError, BlobStore
+from roster_agent_runtime.executors.events import (
+    EventType,
+    Resource,
+    ResourceStatusEvent,
+)
 from roster_agent_runtime.informers.events.spec import RosterResourceEvent
 from roster_agent_runtime.informers.roster import RosterInformer
 from roster_agent_runtime.logs import app_logger
 from roster_agent_runtime.models.messaging import (
+    ChatRequestPayload,
     OutgoingMessage,
     Recipient,
+    RpcRequest,
+    RpcResponse,
     ToolMessage,
     WorkflowActionTriggerPayload,
     WorkflowMessage,
 )
 from roster_agent_runtime.singletons import (
     get_agent_pool,
-    get_rabbitmq,
+    get_blob_store,
+    get_message_broker,
     get_roster_informer,
 )
+from roster_agent_runtime.util.backoff import Backoff
 
-from .rabbitmq import RabbitMQClient
+from .base import MessageBroker, MessageRejected, PublishError
+from .idempotency import IdempotencyCache
+from .lanes import LaneQueue, lane_for
+from .rpc import RpcKind
 
 logger = app_logger()
 
@@ -30,155 +45,739 @@ def queue_name_for_recipient(recipient: Recipient) -> str:
     return f"{recipient.namespace}:actor:{recipient.kind}:{recipient.name}"
 
 
+def same_agent_endpoint(current: AgentHandle, new: AgentHandle) -> bool:
+    # Handles may be rebuilt on every lookup, those reaching the same
+    # address through the same client are interchangeable
+    if current is new:
+        return True
+    return (
+        type(current) is type(new)
+        and getattr(current, "url", None) is not None
+        and getattr(current, "url", None) == getattr(new, "url", None)
+        and getattr(current, "http_client", None) is getattr(new, "http_client", None)
+    )
+
+
 def queue_name_for_agent(agent_name: str, namespace: str = "default") -> str:
     return f"{namespace}:actor:agent:{agent_name}"
 
 
+# Returns False when the queue has no local consumer
+LocalDelivery = Callable[[str, dict], Awaitable[bool]]
+
+
+class LocalInbox:
+    """
+    Delivers messages to an agent on this runtime without the broker.
+
+    As with a broker consumer, at most max_in_flight handlers run concurrently.
+    Handlers start in the order messages arrived within each lane, and by
+    weighted round-robin across lanes.
+    """
+
+    def __init__(
+        self,
+        queue_name: str,
+        handler: Callable[[dict], Awaitable[None]],
+        on_failure: Callable[[str, dict, BaseException], Awaitable[None]],
+        max_size: int,
+        max_in_flight: int,
+        lane_weights: Optional[dict[str, int]] = None,
+    ):
+        self.queue_name = queue_name
+        self.handler = handler
+        self.on_failure = on_failure
+        self.messages: LaneQueue[dict] = LaneQueue(
+            max_size, lane_weights or settings.MESSAGE_LANE_WEIGHTS
+        )
+        self.semaphore = asyncio.Semaphore(max_in_flight)
+        self.deliveries: set[asyncio.Task] = set()
+        self.closed = False
+        self.task = asyncio.create_task(self._drain())
+
+    async def put(self, payload: dict) -> bool:
+        if self.closed:
+            return False
+        await self.messages.put(lane_for(payload), payload)
+        if self.closed:
+            # Closed while waiting for space, nothing will deliver the message.
+            # The queue was emptied on close, so this removes one late message
+            # and the caller falls back to the broker for its own.
+            self.messages.get_nowait()
+            return False
+        return True
+
+    async def _drain(self):
+        while True:
+            await self.semaphore.acquire()
+            try:
+                payload = await self.messages.get()
+            except asyncio.CancelledError:
+                self.semaphore.release()
+                raise
+            delivery = asyncio.create_task(self._deliver(payload))
+            self.deliveries.add(delivery)
+            delivery.add_done_callback(self.deliveries.discard)
+
+    async def _deliver(self, payload: dict):
+        try:
+            await self.handler(payload)
+        except Exception as e:
+            # Retried (or dead-lettered) through the broker, as remote messages are
+            try:
+                await self.on_failure(self.queue_name, payload, e)
+            except Exception as reject_error:
+                logger.error(
+                    "(agent-router) Lost locally delivered message to %s: %s",
+                    self.queue_name,
+                    reject_error,
+                )
+        finally:
+            self.semaphore.release()
+
+    def close(self) -> list[dict]:
+        """Stop delivering, returning the messages which were not delivered."""
+        self.closed = True
+        self.task.cancel()
+        pending = []
+        while not self.messages.empty():
+            pending.append(self.messages.get_nowait())
+        return pending
+
+
 class AgentMessageRouter:
+    """
+    Routes messages between an agent and the broker.
+
+    The agent handle is only set while the agent is running. Until then,
+    incoming messages are held (up to pending_buffer_size of them, each for
+    at most pending_timeout) and delivered in order once it is set.
+
+    Outgoing messages are pumped by two supervised tasks: one reads the
+    agent's stream into a bounded buffer (reconnecting when it breaks), the
+    other publishes the buffer in micro-batches (retrying failed messages).
+    """
+
     def __init__(
         self,
-        agent_handle: AgentHandle,
+        agent_handle: Optional[AgentHandle],
         queue_name: str,
-        rmq_client: Optional[RabbitMQClient] = None,
+        rmq_client: Optional[MessageBroker] = None,
+        local_delivery: Optional[LocalDelivery] = None,
+        blob_store: Optional[BlobStore] = None,
+        idempotency_cache: Optional[IdempotencyCache] = None,
+        pending_buffer_size: int = settings.ROUTER_PENDING_BUFFER_SIZE,
+        pending_timeout: float = settings.ROUTER_PENDING_TIMEOUT,
+        outgoing_buffer_size: int = settings.ROUTER_OUTGOING_BUFFER_SIZE,
+        outgoing_batch_size: int = settings.ROUTER_OUTGOING_BATCH_SIZE,
     ):
-        self.agent_handle = agent_handle
+        self.agent_handle: Optional[AgentHandle] = None
         self.queue_name = queue_name
-        self.rmq_client = rmq_client or get_rabbitmq()
+        self.rmq_client = rmq_client or get_message_broker()
+        self.local_delivery = local_delivery
+        self.blob_store = blob_store or get_blob_store()
+        self.idempotency_cache = idempotency_cache
+        self.pending_buffer_size = pending_buffer_size
+        self.pending_timeout = pending_timeout
+        self.pending = 0
+        self.outgoing_batch_size = outgoing_batch_size
+        # Outgoing messages, with when they were read from the agent
+        self.outgoing: asyncio.Queue[tuple[float, OutgoingMessage]] = asyncio.Queue(
+            maxsize=outgoing_buffer_size
+        )
+        # When the oldest message in the batch being published was read
+        self._publishing_since: Optional[float] = None
+        self._publishing_count = 0
+        # Chats being served for RPC callers, by request id
+        self.rpc_tasks: dict[str, asyncio.Task] = {}
         self.outbox_consumer: Optional[asyncio.Task] = None
+        self.outbox_publisher: Optional[asyncio.Task] = None
+        self._ready = asyncio.Event()
+        self._active = False
+
+        self.pending_expired = metrics.counter("router_pending_messages_expired_total")
+        self.pending_rejected = metrics.counter(
+            "router_pending_messages_rejected_total"
+        )
+        labels = {"queue": queue_name}
+        self.outgoing_sent = metrics.counter(
+            "router_outgoing_messages_total", labels=labels
+        )
+        self.outgoing_batches = metrics.counter(
+            "router_outgoing_batches_total", labels=labels
+        )
+        self.outgoing_failures = metrics.counter(
+            "router_outgoing_publish_failures_total", labels=labels
+        )
+        self.outgoing_restarts = metrics.counter(
+            "router_outgoing_restarts_total", labels=labels
+        )
+        metrics.callback_gauge(
+            "router_outgoing_pending",
+            lambda: self.outgoing.qsize() + self._publishing_count,
+            labels=labels,
+        )
+        metrics.callback_gauge(
+            "router_outgoing_lag_seconds", self.outgoing_lag, labels=labels
+        )
+
+        if agent_handle is not None:
+            self.set_agent_handle(agent_handle)
+
+    def set_agent_handle(self, agent_handle: AgentHandle):
+        """Deliver to this handle, e.g. once the agent is running (again)."""
+        self._stop_outbox_consumer()
+        self.agent_handle = agent_handle
+        self._ready.set()
+        if self._active:
+            self._start_outbox_consumer()
+
+    def clear_agent_handle(self):
+        """Hold incoming messages, e.g. while the agent restarts."""
+        self._stop_outbox_consumer()
+        self.agent_handle = None
+        self._ready.clear()
+
+    def _start_outbox_consumer(self):
+        self.outbox_consumer = asyncio.create_task(
+            self._supervise("outgoing stream", self.consume_outgoing_messages)
+        )
+
+    def _stop_outbox_consumer(self):
+        if self.outbox_consumer is not None:
+            self.outbox_consumer.cancel()
+            self.outbox_consumer = None
 
     async def setup(self):
+        self._active = True
         # Register callback for incoming messages
         await self.rmq_client.register_callback(
             self.queue_name, self.handle_incoming_message
         )
-        # Set up consuming task for outgoing messages
-        self.outbox_consumer = asyncio.create_task(self.consume_outgoing_messages())
+        # Set up tasks for outgoing messages, the buffer outlives agent handles
+        self.outbox_publisher = asyncio.create_task(
+            self._supervise("outgoing publisher", self.publish_outgoing_messages)
+        )
+        if self.agent_handle is not None:
+            self._start_outbox_consumer()
 
     async def teardown(self):
+        self._active = False
         await self.rmq_client.deregister_callback(
             self.queue_name, self.handle_incoming_message
         )
-        self.outbox_consumer.cancel()
-        self.outbox_consumer = None
+        self._stop_outbox_consumer()
+        if self.outbox_publisher is not None:
+            self.outbox_publisher.cancel()
+            self.outbox_publisher = None
+        # Buffered messages are handed to the broker without waiting, as on close
+        while not self.outgoing.empty():
+            _, message = self.outgoing.get_nowait()
+            await self.send_outgoing_message(message)
+
+    def outgoing_lag(self) -> float:
+        """Seconds the oldest unpublished outgoing message has waited."""
+        if self._publishing_since is not None:
+            return time.monotonic() - self._publishing_since
+        return 0.0
 
-    async def handle_incoming_message(self, message: str):
+    async def _wait_for_agent(self) -> AgentHandle:
+        # Waiters are woken in the order they started waiting, so held
+        # messages are delivered in the order they arrived
+        if self.agent_handle is not None:
+            return self.agent_handle
+        if self.pending >= self.pending_buffer_size:
+            self.pending_rejected.inc()
+            raise errors.AgentNotReadyError(
+                "Too many messages are waiting for the Agent.",
+                details=self.queue_name,
+            )
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.pending_timeout
+            while self.agent_handle is None:
+                await asyncio.wait_for(
+                    self._ready.wait(), timeout=max(deadline - loop.time(), 0)
+                )
+        except asyncio.TimeoutError:
+            self.pending_expired.inc()
+            raise errors.AgentNotReadyError(
+                "The Agent did not become ready in time.", details=self.queue_name
+            )
+        finally:
+            self.pending -= 1
+        return self.agent_handle
+
+    # NOTE: Malformed messages raise MessageRejected, so they are dead-lettered
+    #   straight away. Other failures (e.g. the agent is unavailable) raise
+    #   as-is, and the message is retried after a delay.
+    async def handle_incoming_message(self, message_data: dict):
         try:
-            message_data = json.loads(message)
             message_kind = message_data["kind"]
-        except (json.JSONDecodeError, KeyError):
-            logger.debug(
+        except (KeyError, TypeError):
+            logger.warn(
                 "(agent-router) Failed to parse incoming message: %s",
-                message,
+                message_data,
             )
-            return
+            raise MessageRejected("Message has no kind.")
 
         if message_kind == "trigger_action":
             try:
                 workflow_message = WorkflowMessage(**message_data)
-            except (pydantic.ValidationError, TypeError, ValueError):
-                logger.debug(
+            except (pydantic.ValidationError, TypeError, ValueError) as e:
+                logger.warn(
                     "(agent-router) Failed to parse message data as workflow message: %s",
                     message_data,
                 )
-                return
+                raise MessageRejected("Invalid workflow message.", details=str(e))
             await self._handle_action_trigger(workflow_message)
         elif message_kind == "tool_response":
             try:
                 tool_message = ToolMessage(**message_data)
-            except (pydantic.ValidationError, TypeError, ValueError):
-                logger.debug(
+            except (pydantic.ValidationError, TypeError, ValueError) as e:
+                logger.warn(
                     "(agent-router) Failed to parse message data as tool message: %s",
                     message_data,
                 )
-                return
+                raise MessageRejected("Invalid tool message.", details=str(e))
             await self._handle_tool_response(tool_message)
+        elif message_kind == RpcKind.CHAT_REQUEST:
+            try:
+                request = RpcRequest(**message_data)
+            except (pydantic.ValidationError, TypeError, ValueError) as e:
+                logger.warn(
+                    "(agent-router) Failed to parse message data as RPC request: %s",
+                    message_data,
+                )
+                raise MessageRejected("Invalid RPC request.", details=str(e))
+            await self._handle_chat_request(request)
+        elif message_kind == RpcKind.CANCEL:
+            task = self.rpc_tasks.get(message_data.get("id"))
+            if task is not None:
+                logger.debug("(agent-router) Cancelling RPC %s", message_data["id"])
+                task.cancel()
         else:
-            logger.debug(
+            logger.warn(
                 "(agent-router) Received message with unknown kind: %s",
                 message_kind,
             )
+            raise MessageRejected(f"Unknown message kind: {message_kind}")
+
+    async def _resolve_data(self, message: Union[WorkflowMessage, ToolMessage]) -> dict:
+        # Data sent as a claim check is only read once the message is handled
+        if message.data_ref is None:
+            return message.data
+        if self.blob_store is None:
+            raise MessageRejected(
+                "Message data is in a blob store, but none is configured.",
+                details=message.data_ref.dict(),
+            )
+        try:
+            return codec.loads(await self.blob_store.get(message.data_ref))
+        except (BlobNotFoundError, codec.DecodeError) as e:
+            logger.warn(
+                "(agent-router) Failed to resolve message data %s: %s",
+                message.data_ref.key,
+                e,
+            )
+            raise MessageRejected("Message data could not be resolved.", details=str(e))
+
+    async def _handle_once(
+        self, key_parts: tuple[str, ...], handler: Callable[[], Awaitable[None]]
+    ):
+        if self.idempotency_cache is None:
+            await handler()
+            return
+        key = IdempotencyCache.key(self.queue_name, *key_parts)
+        if not await self.idempotency_cache.run_once(key, handler):
+            logger.debug("(agent-router) Suppressed duplicate message: %s", key)
 
     async def _handle_action_trigger(self, workflow_message: WorkflowMessage):
+        data = await self._resolve_data(workflow_message)
         try:
-            action_trigger = WorkflowActionTriggerPayload(**workflow_message.data)
-        except (json.JSONDecodeError, TypeError, ValueError):
-            logger.debug(
+            action_trigger = WorkflowActionTriggerPayload(**data)
+        except (TypeError, ValueError) as e:
+            logger.warn(
                 "(agent-router) Failed to parse message data as action trigger: %s",
-                workflow_message.data,
+                data,
             )
-            return
+            raise MessageRejected("Invalid action trigger.", details=str(e))
 
         logger.debug("(agent-router) Received action trigger: %s", action_trigger)
+
+        async def trigger_action():
+            agent_handle = await self._wait_for_agent()
+            try:
+                await agent_handle.trigger_action(
+                    step=action_trigger.step,
+                    action=action_trigger.action,
+                    inputs=action_trigger.inputs,
+                    role_context=action_trigger.role_context,
+                    record_id=workflow_message.id,
+                    workflow=workflow_message.workflow,
+                )
+            except Exception as e:
+                logger.warn("(agent-router) Failed to trigger action: %s", e)
+                raise
+
+        # An action is identified by the workflow record, step and action,
+        # since a record triggers many actions
+        await self._handle_once(
+            (
+                "trigger_action",
+                workflow_message.id,
+                action_trigger.step,
+                action_trigger.action,
+            ),
+            trigger_action,
+        )
+
+    async def _handle_tool_response(self, tool_message: ToolMessage):
+        async def handle_tool_response():
+            agent_handle = await self._wait_for_agent()
+            data = await self._resolve_data(tool_message)
+            try:
+                await agent_handle.handle_tool_response(
+                    invocation_id=tool_message.id,
+                    tool=tool_message.tool,
+                    data=data,
+                )
+            except Exception as e:
+                logger.warn("(agent-router) Failed to handle tool response: %s", e)
+                raise
+
+        await self._handle_once(
+            ("tool_response", tool_message.id, tool_message.tool),
+            handle_tool_response,
+        )
+
+    async def _reply(self, request: RpcRequest, response: RpcResponse):
+        # Not raised, since retrying the request would run it again
         try:
-            await self.agent_handle.trigger_action(
-                step=action_trigger.step,
-                action=action_trigger.action,
-                inputs=action_trigger.inputs,
-                role_context=action_trigger.role_context,
-                record_id=workflow_message.id,
-                workflow=workflow_message.workflow,
+            await self.rmq_client.publish_json(
+                request.reply_to, response.dict(), sender_queue=self.queue_name
             )
         except Exception as e:
-            logger.debug("(agent-router) Failed to trigger action: %s", e)
+            logger.warn(
+                "(agent-router) Failed to reply to RPC %s from %s: %s",
+                request.id,
+                self.queue_name,
+                e,
+            )
 
-    async def _handle_tool_response(self, tool_message: ToolMessage):
+    async def _handle_chat_request(self, request: RpcRequest):
+        if request.deadline is not None and request.deadline < time.time():
+            logger.debug("(agent-router) Skipping expired RPC %s", request.id)
+            return
         try:
-            await self.agent_handle.handle_tool_response(
-                invocation_id=tool_message.id,
-                tool=tool_message.tool,
-                data=tool_message.data,
+            chat_request = ChatRequestPayload(**request.data)
+        except (pydantic.ValidationError, TypeError) as e:
+            await self._reply(
+                request, RpcResponse(id=request.id, error=f"Invalid chat request: {e}")
             )
-        except Exception as e:
-            logger.debug("(agent-router) Failed to handle tool response: %s", e)
+            return
+        try:
+            agent_handle = await self._wait_for_agent()
+        except errors.AgentNotReadyError as e:
+            await self._reply(request, RpcResponse(id=request.id, error=e.message))
+            return
+
+        # Run as a task of its own, so a cancellation from the caller does not
+        # cancel (and requeue) the delivery of the request itself
+        task = asyncio.create_task(
+            agent_handle.chat(
+                identity=chat_request.identity,
+                team=chat_request.team,
+                role=chat_request.role,
+                chat_history=chat_request.chat_history,
+                execution_id=chat_request.execution_id,
+                execution_type=chat_request.execution_type,
+            )
+        )
+        self.rpc_tasks[request.id] = task
+        try:
+            await asyncio.wait({task})
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        finally:
+            self.rpc_tasks.pop(request.id, None)
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            logger.warn(
+                "(agent-router) Failed to handle chat request: %s", task.exception()
+            )
+            response = RpcResponse(id=request.id, error=str(task.exception()))
+        else:
+            response = RpcResponse(id=request.id, data={"message": task.result()})
+        await self._reply(request, response)
+
+    async def _supervise(self, name: str, run: Callable[[Backoff], Awaitable[None]]):
+        # Restarts the task with backoff whenever it ends or fails,
+        # the backoff is reset by the task once it makes progress
+        backoff = Backoff(maximum=settings.ROUTER_OUTGOING_BACKOFF_MAX)
+        while True:
+            try:
+                await run(backoff)
+                logger.warn(
+                    "(agent-router) %s for %s ended, restarting",
+                    name,
+                    self.queue_name,
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warn(
+                    "(agent-router) %s for %s failed, restarting: %s",
+                    name,
+                    self.queue_name,
+                    e,
+                )
+            self.outgoing_restarts.inc()
+            await backoff.sleep()
+
+    async def consume_outgoing_messages(self, backoff: Backoff):
+        agent_handle = self.agent_handle
+        async for message in agent_handle.outgoing_message_stream():
+            backoff.reset()
+            # Waits while the buffer is full, which applies backpressure to the agent
+            await self.outgoing.put((time.monotonic(), message))
+
+    async def publish_outgoing_messages(self, backoff: Backoff):
+        while True:
+            batch = [await self.outgoing.get()]
+            while len(batch) < self.outgoing_batch_size and not self.outgoing.empty():
+                batch.append(self.outgoing.get_nowait())
+            # The buffer is FIFO, so the batch holds the oldest messages
+            self._publishing_since = batch[0][0]
+            self._publishing_count = len(batch)
+            try:
+                await self._send_outgoing_batch(
+                    [message for _, message in batch], backoff
+                )
+            finally:
+                self._publishing_since = None
+                self._publishing_count = 0
 
-    async def consume_outgoing_messages(self):
-        # TODO: resiliency if the stream is broken
-        async for message in self.agent_handle.outgoing_message_stream():
-            await self.send_outgoing_message(message=message)
+    async def _send_outgoing_batch(
+        self, messages: list[OutgoingMessage], backoff: Backoff
+    ):
+        remaining = []
+        for message in messages:
+            queue_name = queue_name_for_recipient(message.recipient)
+            if self.local_delivery is not None and await self.local_delivery(
+                queue_name, message.payload
+            ):
+                continue
+            remaining.append((queue_name, message.payload))
+        # Retried until published, meanwhile the buffer fills up
+        while remaining:
+            try:
+                await self.rmq_client.publish_json_batch(
+                    remaining, sender_queue=self.queue_name
+                )
+                break
+            except Exception as e:
+                self.outgoing_failures.inc()
+                failed_indexes = (
+                    e.details.get("failed_indexes")
+                    if isinstance(e, PublishError) and isinstance(e.details, dict)
+                    else None
+                )
+                if failed_indexes is not None:
+                    remaining = [remaining[index] for index in failed_indexes]
+                delay = backoff.next_delay()
+                logger.warn(
+                    "(agent-router) Failed to publish %d outgoing messages from %s, "
+                    "retrying in %.2fs: %s",
+                    len(remaining),
+                    self.queue_name,
+                    delay,
+                    e,
+                )
+                await asyncio.sleep(delay)
+        backoff.reset()
+        self.outgoing_batches.inc()
+        self.outgoing_sent.inc(len(messages))
 
     async def send_outgoing_message(self, message: OutgoingMessage):
+        queue_name = queue_name_for_recipient(message.recipient)
+        if self.local_delivery is not None and await self.local_delivery(
+            queue_name, message.payload
+        ):
+            return
+        # Don't wait for the confirm, so bursts of outgoing messages are pipelined
         await self.rmq_client.publish_json(
-            queue_name=queue_name_for_recipient(message.recipient),
+            queue_name=queue_name,
             message=message.payload,
+            wait_for_confirm=False,
+            sender_queue=self.queue_name,
         )
 
 
 class MessageRouter:
+    """
+    Routes messages for the agents which are both specified and in the local
+    pool. Only those agents' queues are consumed here, so when runtimes share
+    a broker each message (and chat RPC) reaches the runtime running its agent.
+    """
+
     def __init__(
         self,
         agent_pool: Optional[AgentPool] = None,
         roster_informer: Optional[RosterInformer] = None,
-        rmq_client: Optional[RabbitMQClient] = None,
+        rmq_client: Optional[MessageBroker] = None,
+        local_delivery: bool = settings.ROUTER_LOCAL_DELIVERY,
+        local_inbox_size: int = settings.ROUTER_LOCAL_INBOX_SIZE,
+        idempotency_cache: Optional[IdempotencyCache] = None,
     ):
         self.agent_pool = agent_pool or get_agent_pool()
         self.roster_informer = roster_informer or get_roster_informer()
-        self.rmq_client = rmq_client or get_rabbitmq()
+        self.rmq_client = rmq_client or get_message_broker()
         self.agent_routers: dict[str, AgentMessageRouter] = {}
+        # Names of specified agents, of which only the local ones are routed
+        self.specified_agents: set[str] = set()
+        self.local_delivery = local_delivery
+        self.local_inbox_size = local_inbox_size
+        # Inboxes of agents on this runtime, by queue name
+        self.local_inboxes: dict[str, LocalInbox] = {}
+        # Shared by all agents on this runtime, keys include the agent's queue
+        if idempotency_cache is None and settings.ROUTER_IDEMPOTENCY_ENABLED:
+            idempotency_cache = IdempotencyCache(
+                path=settings.ROUTER_IDEMPOTENCY_FILE
+                if settings.ROUTER_IDEMPOTENCY_PERSIST
+                else None
+            )
+        self.idempotency_cache = idempotency_cache
+
+        self.local_deliveries = metrics.counter("router_local_deliveries_total")
+        metrics.callback_gauge(
+            "router_pending_messages",
+            lambda: sum(router.pending for router in self.agent_routers.values()),
+        )
 
     async def setup(self):
+        if self.idempotency_cache is not None:
+            self.idempotency_cache.open()
+        # Listen first, so no agent becomes ready unnoticed while routers are created
+        self.agent_pool.add_status_listener(self.handle_status_event)
         await self._setup_initial_agent_routers()
         self.roster_informer.add_event_listener(self.handle_agent_change)
 
+    def _is_local(self, agent_name: str) -> bool:
+        try:
+            self.agent_pool.get_agent(agent_name)
+        except errors.AgentNotFoundError:
+            return False
+        return True
+
+    def _get_running_agent_handle(self, agent_name: str) -> Optional[AgentHandle]:
+        try:
+            if self.agent_pool.get_agent(agent_name).status != "running":
+                return None
+            return self.agent_pool.get_agent_handle(agent_name)
+        except errors.RosterError as e:
+            logger.debug("(agent-router) Agent %s is not ready: %s", agent_name, e)
+            return None
+
+    def _create_agent_router(self, agent_name: str) -> AgentMessageRouter:
+        agent_router = AgentMessageRouter(
+            agent_handle=self._get_running_agent_handle(agent_name),
+            queue_name=queue_name_for_agent(agent_name),
+            rmq_client=self.rmq_client,
+            local_delivery=self.deliver_local if self.local_delivery else None,
+            idempotency_cache=self.idempotency_cache,
+        )
+        self.agent_routers[agent_name] = agent_router
+        if self.local_delivery:
+            self.local_inboxes[agent_router.queue_name] = LocalInbox(
+                agent_router.queue_name,
+                handler=agent_router.handle_incoming_message,
+                on_failure=self.rmq_client.reject,
+                max_size=self.local_inbox_size,
+                max_in_flight=settings.RABBITMQ_MAX_IN_FLIGHT,
+            )
+        return agent_router
+
+    async def _close_local_inbox(self, queue_name: str):
+        inbox = self.local_inboxes.pop(queue_name, None)
+        if inbox is None:
+            return
+        # Undelivered messages go through the broker, and wait in its queue
+        for payload in inbox.close():
+            await self.rmq_client.publish_json(
+                queue_name=queue_name, message=payload, wait_for_confirm=False
+            )
+
+    async def deliver_local(self, queue_name: str, payload: dict) -> bool:
+        inbox = self.local_inboxes.get(queue_name)
+        if inbox is None:
+            return False
+        # Copied through the codec as the broker would, so the sender and
+        # recipient never share the payload
+        if not await inbox.put(codec.loads(codec.dumps(payload))):
+            return False
+        self.local_deliveries.inc()
+        return True
+
     async def _setup_initial_agent_routers(self):
         agents = self.roster_informer.list()
         setup_coros = []
         for agent in agents:
-            handle = self.agent_pool.get_agent_handle(agent.name)
-            agent_router = AgentMessageRouter(
-                agent_handle=handle,
-                queue_name=queue_name_for_agent(agent.name),
-                rmq_client=self.rmq_client,
-            )
-            self.agent_routers[agent.name] = agent_router
+            self.specified_agents.add(agent.name)
+            if not self._is_local(agent.name):
+                continue
+            agent_router = self._create_agent_router(agent.name)
             setup_coros.append(agent_router.setup())
         await asyncio.gather(*setup_coros)
 
     async def teardown(self):
+        self.agent_pool.remove_status_listener(self.handle_status_event)
         teardown_coros = []
         for agent_router in self.agent_routers.values():
             teardown_coros.append(agent_router.teardown())
         await asyncio.gather(*teardown_coros)
+        for queue_name in list(self.local_inboxes.keys()):
+            await self._close_local_inbox(queue_name)
         self.agent_routers = {}
+        if self.idempotency_cache is not None:
+            self.idempotency_cache.close()
+
+    def handle_status_event(self, event: ResourceStatusEvent):
+        if event.resource_type != Resource.AGENT:
+            return
+        agent_router = self.agent_routers.get(event.name)
+        if agent_router is None:
+            # Placed on this runtime, its router checks the status once created.
+            # Agents which are not specified (yet) get one once they are.
+            if (
+                event.event_type == EventType.PUT
+                and event.name in self.specified_agents
+            ):
+                asyncio.create_task(self._add_agent_router(event.name))
+            return
+        if event.event_type == EventType.DELETE:
+            # Gone from this runtime, its messages wait for its next owner
+            asyncio.create_task(self._remove_agent_router(event.name))
+            return
+        if event.event_type == EventType.PUT:
+            # Handles are fetched again, since updating an agent may replace it
+            agent_handle = self._get_running_agent_handle(event.name)
+        else:
+            agent_handle = None
+        if agent_handle is not None:
+            if agent_router.agent_handle is not None and same_agent_endpoint(
+                agent_router.agent_handle, agent_handle
+            ):
+                # Still running where it was, keep the outgoing stream going
+                return
+            logger.debug("(agent-router) Agent %s is ready", event.name)
+            agent_router.set_agent_handle(agent_handle)
+        elif agent_router.agent_handle is not None:
+            logger.debug("(agent-router) Agent %s is not ready", event.name)
+            agent_router.clear_agent_handle()
 
     def handle_agent_change(self, event: RosterResourceEvent):
         logger.info("Router received spec event: %s", event)
@@ -195,28 +794,37 @@ class MessageRouter:
             logger.debug("(agent-router) Unknown event: %s", event)
 
     async def _handle_agent_added(self, event: RosterResourceEvent):
-        if event.name in self.agent_routers:
+        self.specified_agents.add(event.name)
+        if not self._is_local(event.name):
             logger.debug(
-                "(agent-router) Router already exists for %s, ignoring", event.name
+                "(agent-router) Agent %s is not in the local pool, not routing",
+                event.name,
             )
             return
+        await self._add_agent_router(event.name)
 
-        handle = self.agent_pool.get_agent_handle(event.name)
-        agent_router = AgentMessageRouter(
-            agent_handle=handle,
-            queue_name=queue_name_for_agent(event.name),
-            rmq_client=self.rmq_client,
-        )
-        self.agent_routers[event.name] = agent_router
+    async def _handle_agent_removed(self, event: RosterResourceEvent):
+        self.specified_agents.discard(event.name)
+        await self._remove_agent_router(event.name)
+
+    async def _add_agent_router(self, agent_name: str):
+        if agent_name in self.agent_routers:
+            logger.debug(
+                "(agent-router) Router already exists for %s, ignoring", agent_name
+            )
+            return
+
+        agent_router = self._create_agent_router(agent_name)
         await agent_router.setup()
 
-    async def _handle_agent_removed(self, event: RosterResourceEvent):
-        agent_router = self.agent_routers.pop(event.name, None)
+    async def _remove_agent_router(self, agent_name: str):
+        agent_router = self.agent_routers.pop(agent_name, None)
         if agent_router is None:
             logger.debug(
                 "(agent-router) Agent (%s) removed but router not found, ignoring",
-                event.name,
+                agent_name,
             )
             return
 
+        await self._close_local_inbox(agent_router.queue_name)
         await agent_router.teardown()
@@ -0,0 +1,143 @@
+import asyncio
+import time
+import uuid
+from typing import Optional
+
+import pydantic
+from roster_agent_runtime import errors, metrics, settings
+from roster_agent_runtime.logs import app_logger
+from roster_agent_runtime.models.messaging import RpcRequest, RpcResponse
+from roster_agent_runtime.singletons import get_message_broker
+
+from .base import MessageBroker
+
+logger = app_logger()
+
+
+class RpcKind:
+    CHAT_REQUEST = "chat_request"
+    CANCEL = "rpc_cancel"
+    RESPONSE = "rpc_response"
+
+
+class RpcError(errors.RosterError):
+    """Exception raised when a remote handler fails a request."""
+
+    def __init__(self, message="The remote request failed.", details=None):
+        super().__init__(message, details)
+
+
+class RpcTimeoutError(RpcError):
+    """Exception raised when no response arrives before the request's deadline."""
+
+    def __init__(self, message="The remote request timed out.", details=None):
+        super().__init__(message, details)
+
+
+class RpcClient:
+    """
+    Request/response over the message bus.
+
+    Requests are published to the queue of the actor which serves them, and
+    name this runtime's reply queue. Responses are matched to waiting callers
+    by correlation id, so any number of requests can be outstanding. Callers
+    which time out (or are cancelled) send a cancellation, and responses which
+    arrive after that are dropped.
+    """
+
+    def __init__(
+        self,
+        broker: Optional[MessageBroker] = None,
+        reply_queue: str = settings.RPC_REPLY_QUEUE,
+        timeout: float = settings.RPC_TIMEOUT,
+    ):
+        self.broker = broker or get_message_broker()
+        self.reply_queue = reply_queue
+        self.timeout = timeout
+        self.pending: dict[str, asyncio.Future] = {}
+        self.cancellations: set[asyncio.Task] = set()
+
+        self.requests = metrics.counter("rpc_requests_total")
+        self.timeouts = metrics.counter("rpc_timeouts_total")
+        self.late_responses = metrics.counter("rpc_late_responses_total")
+        metrics.callback_gauge("rpc_pending_requests", lambda: len(self.pending))
+
+    async def setup(self):
+        await self.broker.register_callback(self.reply_queue, self.handle_response)
+
+    async def teardown(self):
+        await self.broker.deregister_callback(self.reply_queue, self.handle_response)
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(RpcError("The RPC client was shut down."))
+        self.pending = {}
+
+    async def handle_response(self, message: dict):
+        try:
+            response = RpcResponse(**message)
+        except (pydantic.ValidationError, TypeError) as e:
+            # Nothing is waiting on a malformed response, so it is dropped
+            logger.warn("(rpc) Failed to parse response: %s; %s", message, e)
+            return
+        future = self.pending.pop(response.id, None)
+        if future is None or future.done():
+            self.late_responses.inc()
+            logger.debug(
+                "(rpc) Dropping response to %s, no longer waiting", response.id
+            )
+            return
+        future.set_result(response)
+
+    def _send_cancel(self, queue_name: str, request_id: str):
+        async def send():
+            try:
+                await self.broker.publish_json(
+                    queue_name,
+                    {"kind": RpcKind.CANCEL, "id": request_id},
+                    wait_for_confirm=False,
+                )
+            except Exception as e:
+                logger.debug("(rpc) Failed to cancel %s: %s", request_id, e)
+
+        # Sent in the background, the caller may itself be cancelled
+        task = asyncio.create_task(send())
+        self.cancellations.add(task)
+        task.add_done_callback(self.cancellations.discard)
+
+    async def call(
+        self,
+        queue_name: str,
+        kind: str,
+        data: dict,
+        timeout: Optional[float] = None,
+    ) -> dict:
+        """Send a request to the actor consuming queue_name, returning its response data."""
+        timeout = timeout if timeout is not None else self.timeout
+        request = RpcRequest(
+            id=uuid.uuid4().hex,
+            kind=kind,
+            reply_to=self.reply_queue,
+            # Lets the handler skip requests which nobody is waiting for anymore
+            deadline=time.time() + timeout,
+            data=data,
+        )
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request.id] = future
+        self.requests.inc()
+        try:
+            await self.broker.publish_json(
+                queue_name, request.dict(), sender_queue=self.reply_queue
+            )
+            response: RpcResponse = await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            self.timeouts.inc()
+            self._send_cancel(queue_name, request.id)
+            raise RpcTimeoutError(details={"queue": queue_name, "timeout": timeout})
+        except asyncio.CancelledError:
+            self._send_cancel(queue_name, request.id)
+            raise
+        finally:
+            self.pending.pop(request.id, None)
+        if response.error:
+            raise RpcError(response.error, details={"queue": queue_name})
+        return response.data
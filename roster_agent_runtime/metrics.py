@@ -0,0 +1,179 @@
+import bisect
+from typing import Callable, Optional, Sequence, Union
+
+# NOTE: This is a deliberately small, dependency-free metrics registry.
+#   Values are exposed as a JSON snapshot through the runtime API (/metrics).
+
+Labels = Optional[dict[str, str]]
+
+
+def _metric_key(name: str, labels: Labels = None) -> str:
+    if not labels:
+        return name
+    label_str = ",".join(f"{key}={value}" for key, value in sorted(labels.items()))
+    return f"{name}{{{label_str}}}"
+
+
+class Counter:
+    def __init__(self, name: str, description: str = ""):
+        self.name = name
+        self.description = description
+        self.value = 0
+
+    def inc(self, amount: Union[int, float] = 1):
+        self.value += amount
+
+    def snapshot(self) -> Union[int, float]:
+        return self.value
+
+
+class Gauge:
+    def __init__(self, name: str, description: str = ""):
+        self.name = name
+        self.description = description
+        self.value = 0
+
+    def set(self, value: Union[int, float]):
+        self.value = value
+
+    def inc(self, amount: Union[int, float] = 1):
+        self.value += amount
+
+    def dec(self, amount: Union[int, float] = 1):
+        self.value -= amount
+
+    def snapshot(self) -> Union[int, float]:
+        return self.value
+
+
+class CallbackGauge:
+    # Gauge whose value is read from a callback when a snapshot is taken
+    def __init__(self, name: str, description: str = ""):
+        self.name = name
+        self.description = description
+        self.callback: Callable[[], Union[int, float, dict]] = lambda: 0
+
+    def set_callback(self, callback: Callable[[], Union[int, float, dict]]):
+        self.callback = callback
+
+    def snapshot(self) -> Union[int, float, dict]:
+        return self.callback()
+
+
+# Upper bounds (seconds) of latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histogram:
+    # Cumulative buckets, as in Prometheus: each counts observations <= its bound
+    def __init__(
+        self,
+        name: str,
+        description: str = "",
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i in range(bisect.bisect_left(self.buckets, value), len(self.buckets)):
+            self.counts[i] += 1
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": {
+                str(bound): count for bound, count in zip(self.buckets, self.counts)
+            },
+        }
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: dict[str, Union[Counter, Gauge, CallbackGauge, Histogram]] = {}
+
+    def _get_or_create(
+        self, metric_class, name: str, description: str, labels, **kwargs
+    ):
+        key = _metric_key(name, labels)
+        metric = self.metrics.get(key)
+        if metric is None:
+            metric = metric_class(key, description, **kwargs)
+            self.metrics[key] = metric
+        elif not isinstance(metric, metric_class):
+            raise TypeError(f"Metric {key} already registered as another type")
+        return metric
+
+    def counter(self, name: str, description: str = "", labels: Labels = None):
+        return self._get_or_create(Counter, name, description, labels)
+
+    def gauge(self, name: str, description: str = "", labels: Labels = None):
+        return self._get_or_create(Gauge, name, description, labels)
+
+    def callback_gauge(
+        self,
+        name: str,
+        callback: Callable[[], Union[int, float, dict]],
+        description: str = "",
+        labels: Labels = None,
+    ):
+        gauge = self._get_or_create(CallbackGauge, name, description, labels)
+        gauge.set_callback(callback)
+        return gauge
+
+    def histogram(
+        self,
+        name: str,
+        description: str = "",
+        labels: Labels = None,
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        return self._get_or_create(
+            Histogram, name, description, labels, buckets=buckets
+        )
+
+    def remove(self, name: str, labels: Labels = None):
+        self.metrics.pop(_metric_key(name, labels), None)
+
+    def snapshot(self) -> dict:
+        return {key: metric.snapshot() for key, metric in sorted(self.metrics.items())}
+
+
+REGISTRY = MetricsRegistry()
+
+
+def counter(name: str, description: str = "", labels: Labels = None) -> Counter:
+    return REGISTRY.counter(name, description, labels)
+
+
+def gauge(name: str, description: str = "", labels: Labels = None) -> Gauge:
+    return REGISTRY.gauge(name, description, labels)
+
+
+def callback_gauge(
+    name: str,
+    callback: Callable[[], Union[int, float, dict]],
+    description: str = "",
+    labels: Labels = None,
+) -> CallbackGauge:
+    return REGISTRY.callback_gauge(name, callback, description, labels)
+
+
+def histogram(
+    name: str,
+    description: str = "",
+    labels: Labels = None,
+    buckets: Sequence[float] = LATENCY_BUCKETS,
+) -> Histogram:
+    return REGISTRY.histogram(name, description, labels, buckets)
+
+
+def remove(name: str, labels: Labels = None):
+    REGISTRY.remove(name, labels)
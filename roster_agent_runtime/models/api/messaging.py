@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic import BaseModel, Field
 
 from ..conversation import ConversationMessage
@@ -27,3 +29,49 @@ class ChatPromptAgentArgs(BaseModel):
                 "message": ConversationMessage.Config.schema_extra["example"],
             }
         }
+
+
+class DeadLetter(BaseModel):
+    id: str = Field(description="An identifier for the dead-lettered message.")
+    queue: str = Field(description="The queue the message was originally sent to.")
+    reason: str = Field(description="Why the message could not be handled.")
+    attempts: int = Field(description="How many times delivery was attempted.")
+    failed_at: str = Field(description="When the message was dead-lettered (UTC).")
+    payload: Optional[dict] = Field(
+        default=None, description="The message, if it could be decoded."
+    )
+
+    class Config:
+        validate_assignment = True
+        schema_extra = {
+            "example": {
+                "id": "9f1c2b0e6d3a4f5e8b7c6d5e4f3a2b1c",
+                "queue": "default:actor:agent:Alice",
+                "reason": "AgentError: The Agent failed to start.",
+                "attempts": 5,
+                "failed_at": "2023-08-01T12:00:00+00:00",
+                "payload": {"kind": "trigger_action"},
+            }
+        }
+
+
+class ReplayDeadLettersArgs(BaseModel):
+    ids: Optional[list[str]] = Field(
+        default=None,
+        description=(
+            "The dead letters to replay, found anywhere in the queue. "
+            "If omitted, a page of dead letters is replayed."
+        ),
+    )
+    limit: int = Field(
+        default=100,
+        description="How many dead letters to replay, if no ids are given.",
+    )
+    offset: int = Field(
+        default=0,
+        description="How many of the oldest dead letters to skip, if no ids are given.",
+    )
+
+    class Config:
+        validate_assignment = True
+        schema_extra = {"example": {"ids": ["9f1c2b0e6d3a4f5e8b7c6d5e4f3a2b1c"]}}
@@ -2,9 +2,26 @@ from typing import Optional
 
 from pydantic import BaseModel, Field
 from roster_agent_runtime.models.common import TypedArgument, TypedResult
+from roster_agent_runtime.models.conversation import ConversationMessage
 from roster_agent_runtime.models.files import FileContents
 
 
+class BlobReference(BaseModel):
+    store: str = Field(description="The blob store holding the data.")
+    key: str = Field(description="The content address (SHA-256) of the data.")
+    size: int = Field(description="The size of the data in bytes.")
+
+    class Config:
+        validate_assignment = True
+        schema_extra = {
+            "example": {
+                "store": "runtime-host",
+                "key": "9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08",
+                "size": 524288,
+            }
+        }
+
+
 class WorkflowActionTriggerPayload(BaseModel):
     step: str = Field(
         description="The name of the Step reporting outputs in this payload."
@@ -36,6 +53,10 @@ class WorkflowMessage(BaseModel):
     workflow: str = Field(description="The workflow this message refers to.")
     kind: str = Field(description="The kind of the message data.")
     data: dict = Field(default_factory=dict, description="The data of the message.")
+    data_ref: Optional[BlobReference] = Field(
+        default=None,
+        description="Where the data is stored instead, if it was too large to send.",
+    )
 
     class Config:
         validate_assignment = True
@@ -74,6 +95,10 @@ class ToolMessage(BaseModel):
     kind: str = Field(description="The kind of the message data.")
     tool: str = Field(description="The tool which this message refers to.")
     data: dict = Field(default_factory=dict, description="The data of the message.")
+    data_ref: Optional[BlobReference] = Field(
+        default=None,
+        description="Where the data is stored instead, if it was too large to send.",
+    )
     error: str = Field(
         default="",
         description="An error message returned by the tool, if any.",
@@ -94,6 +119,76 @@ class ToolMessage(BaseModel):
         }
 
 
+class RpcRequest(BaseModel):
+    id: str = Field(description="The correlation identifier of the request.")
+    kind: str = Field(description="The kind of the request.")
+    reply_to: str = Field(description="The queue to send the response to.")
+    deadline: Optional[float] = Field(
+        default=None,
+        description="When the caller stops waiting (seconds since the epoch).",
+    )
+    data: dict = Field(default_factory=dict, description="The data of the request.")
+
+    class Config:
+        validate_assignment = True
+        schema_extra = {
+            "example": {
+                "id": "5b2c3a1e0f9d4c8b7a6e5d4c3b2a1f0e",
+                "kind": "chat_request",
+                "reply_to": "roster-runtime:runtime-host:replies",
+                "deadline": 1690891200.0,
+                "data": {"identity": "my_identity"},
+            }
+        }
+
+
+class RpcResponse(BaseModel):
+    id: str = Field(description="The correlation identifier of the request.")
+    kind: str = Field(default="rpc_response", description="The kind of the message.")
+    data: dict = Field(default_factory=dict, description="The data of the response.")
+    error: str = Field(
+        default="",
+        description="An error message returned by the handler, if any.",
+    )
+
+    class Config:
+        validate_assignment = True
+        schema_extra = {
+            "example": {
+                "id": "5b2c3a1e0f9d4c8b7a6e5d4c3b2a1f0e",
+                "kind": "rpc_response",
+                "data": {"message": "Hello!"},
+                "error": "",
+            }
+        }
+
+
+class ChatRequestPayload(BaseModel):
+    identity: str = Field(description="The name of the agent.")
+    team: str = Field(description="The name of the team which the agent is on.")
+    role: str = Field(
+        description="The name of the role on the team which identifies the agent."
+    )
+    chat_history: list[ConversationMessage] = Field(
+        description="The conversation, ending with the prompt."
+    )
+    execution_id: str = Field(default="", description="The execution, if any.")
+    execution_type: str = Field(default="", description="The execution type, if any.")
+
+    class Config:
+        validate_assignment = True
+        schema_extra = {
+            "example": {
+                "identity": "my_identity",
+                "team": "my_team",
+                "role": "my_role",
+                "chat_history": [ConversationMessage.Config.schema_extra["example"]],
+                "execution_id": "",
+                "execution_type": "",
+            }
+        }
+
+
 class Recipient(BaseModel):
     kind: str = Field(
         description="The kind of recipient (agent, roster-admin, tool etc.)"
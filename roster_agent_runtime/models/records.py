@@ -0,0 +1,103 @@
+import sys
+from dataclasses import dataclass
+from typing import Optional, Tuple, Union
+
+from roster_agent_runtime.models.agent import AgentContainer, AgentStatus
+
+# NOTE: Records are the runtime's internal representation of hot-path state.
+#   They skip validation entirely, so they should only be built from trusted
+#   sources (executors, stores). Pydantic models are built from records only
+#   at the API and serialization boundaries.
+
+# __slots__ support for dataclasses requires Python 3.10+
+_DATACLASS_OPTIONS = {"frozen": True}
+if sys.version_info >= (3, 10):
+    _DATACLASS_OPTIONS["slots"] = True
+
+
+def record(cls):
+    return dataclass(**_DATACLASS_OPTIONS)(cls)
+
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def freeze_labels(labels: Optional[dict[str, str]]) -> Optional[Labels]:
+    # Sorted pairs, so records stay hashable and equal labels compare equal
+    if labels is None:
+        return None
+    return tuple(sorted(labels.items()))
+
+
+@record
+class AgentContainerRecord:
+    id: str
+    name: str
+    image: str
+    status: str
+    labels: Optional[Labels] = None
+
+    @classmethod
+    def from_model(cls, container: AgentContainer) -> "AgentContainerRecord":
+        return cls(
+            id=container.id,
+            name=container.name,
+            image=container.image,
+            status=container.status,
+            labels=freeze_labels(container.labels),
+        )
+
+    def label(self, name: str) -> Optional[str]:
+        return dict(self.labels or ()).get(name)
+
+    def to_model(self) -> AgentContainer:
+        return AgentContainer(**self.to_dict())
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "image": self.image,
+            "status": self.status,
+            "labels": dict(self.labels) if self.labels is not None else None,
+        }
+
+
+@record
+class AgentStatusRecord:
+    name: str
+    executor: str
+    status: str
+    container: Optional[AgentContainerRecord] = None
+
+    @classmethod
+    def from_model(cls, agent_status: AgentStatus) -> "AgentStatusRecord":
+        return cls(
+            name=agent_status.name,
+            executor=agent_status.executor,
+            status=agent_status.status,
+            container=AgentContainerRecord.from_model(agent_status.container)
+            if agent_status.container is not None
+            else None,
+        )
+
+    @classmethod
+    def coerce(
+        cls, agent_status: Union[AgentStatus, "AgentStatusRecord"]
+    ) -> "AgentStatusRecord":
+        if isinstance(agent_status, cls):
+            return agent_status
+        return cls.from_model(agent_status)
+
+    def to_model(self) -> AgentStatus:
+        return AgentStatus(**self.to_dict())
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "executor": self.executor,
+            "status": self.status,
+            "container": self.container.to_dict()
+            if self.container is not None
+            else None,
+        }
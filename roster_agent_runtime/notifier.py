@@ -1,49 +1,205 @@
 import asyncio
+import os
+from collections import OrderedDict
+from typing import Optional
 
-import aiohttp
-
-from roster_agent_runtime import settings
+from roster_agent_runtime import codec, metrics, settings
 from roster_agent_runtime.controllers.events.status import ControllerStatusEvent
+from roster_agent_runtime.http_client import HttpClient
 from roster_agent_runtime.logs import app_logger
+from roster_agent_runtime.outbox import Outbox, OutboxRelay
+from roster_agent_runtime.singletons import get_http_client
+from roster_agent_runtime.util.backoff import Backoff
 
 logger = app_logger()
 
 
+class OverflowPolicy:
+    DROP_OLDEST = "drop_oldest"
+    DROP_NEWEST = "drop_newest"
+
+
 class RosterNotifier:
-    def __init__(self, url: str = settings.ROSTER_API_STATUS_UPDATE_URL):
+    # Responses from a Roster API without the batch endpoint,
+    # in which case events are sent one at a time instead.
+    BATCH_UNSUPPORTED_STATUSES = (404, 405)
+
+    def __init__(
+        self,
+        url: str = settings.ROSTER_API_STATUS_UPDATE_URL,
+        http_client: Optional[HttpClient] = None,
+        batch_url: Optional[str] = settings.ROSTER_API_STATUS_UPDATE_BATCH_URL,
+        batch_size: int = settings.NOTIFIER_BATCH_SIZE,
+        flush_interval: float = settings.NOTIFIER_FLUSH_INTERVAL,
+        max_pending: int = settings.NOTIFIER_MAX_PENDING,
+        overflow_policy: str = settings.NOTIFIER_OVERFLOW_POLICY,
+        outbox: Optional[Outbox] = None,
+    ):
+        if overflow_policy not in (
+            OverflowPolicy.DROP_OLDEST,
+            OverflowPolicy.DROP_NEWEST,
+        ):
+            raise ValueError(f"Unknown overflow policy: {overflow_policy}")
         self.url = url
+        self.batch_url = batch_url
+        self.http_client = http_client or get_http_client()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.overflow_policy = overflow_policy
+        self.backoff = Backoff(maximum=settings.NOTIFIER_BACKOFF_MAX)
         self.task = None
-        self._event_queue = None
+
+        # With an outbox, flushed events are persisted to disk and delivered
+        # (with retries) by the relay, so an outage does not lose events.
+        if outbox is None and settings.OUTBOX_ENABLED:
+            outbox = Outbox(os.path.join(settings.OUTBOX_DIR, "status"), name="status")
+        self.outbox_relay: Optional[OutboxRelay] = (
+            OutboxRelay(
+                outbox,
+                deliver=self._deliver_outbox_records,
+                backoff=Backoff(maximum=settings.NOTIFIER_BACKOFF_MAX),
+            )
+            if outbox is not None
+            else None
+        )
+
+        # Pending events keyed by resource, so that only the latest event
+        # for each resource is delivered (the latest status wins).
+        self._pending: OrderedDict[tuple, ControllerStatusEvent] = OrderedDict()
+        self._flush_requested: Optional[asyncio.Event] = None
+
+        self.events_received = metrics.counter("notifier_events_total")
+        self.events_coalesced = metrics.counter("notifier_events_coalesced_total")
+        self.events_dropped = metrics.counter("notifier_events_dropped_total")
+        self.requests_sent = metrics.counter("notifier_requests_total")
+        self.send_failures = metrics.counter("notifier_send_failures_total")
+        metrics.callback_gauge("notifier_pending_events", lambda: len(self._pending))
+
+    @staticmethod
+    def _event_key(event: ControllerStatusEvent) -> tuple:
+        return event.resource_type, event.name
 
     def push_event(self, event: ControllerStatusEvent):
-        if self._event_queue is None:
+        if self.task is None:
             raise RuntimeError("RosterStatusChangeNotifier not started")
-        event_data = event.dict()
-        self._event_queue.put_nowait(event_data)
+        self.events_received.inc()
+        key = self._event_key(event)
+        if key in self._pending:
+            self.events_coalesced.inc()
+        elif len(self._pending) >= self.max_pending:
+            self.events_dropped.inc()
+            if self.overflow_policy == OverflowPolicy.DROP_NEWEST:
+                logger.debug("(rstr-notif) Queue full, dropping event %s", key)
+                return
+            dropped_key, _ = self._pending.popitem(last=False)
+            logger.debug("(rstr-notif) Queue full, dropping event %s", dropped_key)
+        self._pending[key] = event
+        if len(self._pending) >= self.batch_size:
+            self._flush_requested.set()
+
+    def _take_batch(self) -> list[tuple[tuple, ControllerStatusEvent]]:
+        batch = []
+        while self._pending and len(batch) < self.batch_size:
+            batch.append(self._pending.popitem(last=False))
+        return batch
+
+    def _requeue_batch(self, batch: list[tuple[tuple, ControllerStatusEvent]]):
+        # Events which arrived after the batch was taken are newer, keep those
+        for key, event in reversed(batch):
+            if key in self._pending:
+                continue
+            if len(self._pending) >= self.max_pending:
+                self.events_dropped.inc()
+                continue
+            self._pending[key] = event
+            self._pending.move_to_end(key, last=False)
+
+    async def _post(self, url: str, payload) -> None:
+        self.requests_sent.inc()
+        async with self.http_client.post(url, json=payload, raise_for_status=True):
+            pass
+
+    async def _send_batch(self, payloads: list[dict]):
+        if self.batch_url is not None:
+            async with self.http_client.post(self.batch_url, json=payloads) as resp:
+                self.requests_sent.inc()
+                if resp.status not in self.BATCH_UNSUPPORTED_STATUSES:
+                    resp.raise_for_status()
+                    return
+            logger.warn(
+                "(rstr-notif) Batch endpoint %s unavailable, sending events individually",
+                self.batch_url,
+            )
+            self.batch_url = None
+        for payload in payloads:
+            await self._post(self.url, payload)
+
+    async def _deliver_outbox_records(self, records: list[bytes]):
+        await self._send_batch([codec.loads(record) for record in records])
+
+    @staticmethod
+    def _outbox_records(
+        batch: list[tuple[tuple, ControllerStatusEvent]]
+    ) -> list[bytes]:
+        return [codec.dumps(event.dict()) for _, event in batch]
+
+    async def _persist_batch(self, batch: list[tuple[tuple, ControllerStatusEvent]]):
+        await self.outbox_relay.persist(self._outbox_records(batch))
+
+    async def _wait_for_flush(self):
+        if len(self._pending) >= self.batch_size:
+            return
+        try:
+            await asyncio.wait_for(
+                self._flush_requested.wait(), timeout=self.flush_interval
+            )
+        except asyncio.TimeoutError:
+            pass
 
     async def start(self):
-        self._event_queue = asyncio.Queue()
         while True:
-            payload = await self._event_queue.get()
-            logger.debug("(rstr-notif) Sending status event %s", payload)
+            await self._wait_for_flush()
+            self._flush_requested.clear()
+            batch = self._take_batch()
+            if not batch:
+                continue
+            if self.outbox_relay is not None:
+                await self._persist_batch(batch)
+                continue
+            logger.debug("(rstr-notif) Sending %d status events", len(batch))
             try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.post(
-                        self.url, json=payload, raise_for_status=True
-                    ):
-                        pass
+                await self._send_batch([event.dict() for _, event in batch])
+                self.backoff.reset()
+            except asyncio.CancelledError:
+                self._requeue_batch(batch)
+                raise
             except Exception as e:
+                self.send_failures.inc()
+                self._requeue_batch(batch)
+                delay = self.backoff.next_delay()
                 logger.warn(
-                    "(rstr-notif) Failed to send status event to %s\n%s", self.url, e
+                    "(rstr-notif) Failed to send status events to %s, retrying in %.2fs\n%s",
+                    self.batch_url or self.url,
+                    delay,
+                    e,
                 )
-                pass
+                await asyncio.sleep(delay)
 
     def setup(self):
         if self.task is not None:
             raise RuntimeError("RosterStatusChangeNotifier already started")
+        self._flush_requested = asyncio.Event()
+        if self.outbox_relay is not None:
+            self.outbox_relay.start()
         self.task = asyncio.create_task(self.start())
 
     def teardown(self):
         if self.task is not None:
             self.task.cancel()
             self.task = None
+        if self.outbox_relay is not None:
+            # Pending events are persisted too, to be delivered after a restart
+            pending = list(self._pending.items())
+            self._pending.clear()
+            self.outbox_relay.stop(records=self._outbox_records(pending))
@@ -0,0 +1,413 @@
+import asyncio
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, NamedTuple, Optional, Sequence
+
+from roster_agent_runtime import metrics, settings
+from roster_agent_runtime.logs import app_logger
+from roster_agent_runtime.util.backoff import Backoff
+
+logger = app_logger()
+
+# Each record is framed with its length as a big-endian unsigned int
+_HEADER = struct.Struct(">I")
+
+
+class PartialDeliveryError(Exception):
+    """Raised by a delivery which failed after delivering the first records."""
+
+    def __init__(self, delivered: int):
+        super().__init__(f"Delivered {delivered} records before failing")
+        self.delivered = delivered
+
+
+class Position(NamedTuple):
+    segment: int
+    offset: int
+
+
+class Outbox:
+    """
+    Append-only log of records on local disk, split into rotating segments.
+
+    Producers append records; a single consumer reads from the committed
+    position and commits once records have been delivered. Only positions are
+    kept in memory, so an outage grows the log on disk (up to max_bytes)
+    rather than the process.
+    """
+
+    SEGMENT_SUFFIX = ".log"
+    COMMITTED_FILE = "committed"
+
+    def __init__(
+        self,
+        directory: str,
+        segment_bytes: int = settings.OUTBOX_SEGMENT_BYTES,
+        max_bytes: int = settings.OUTBOX_MAX_BYTES,
+        fsync: bool = settings.OUTBOX_FSYNC,
+        name: str = "default",
+    ):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.fsync = fsync
+        self.name = name
+
+        self.segments: list[int] = []
+        self._segment_sizes: dict[int, int] = {}
+        self.committed = Position(0, 0)
+        self._read_position = Position(0, 0)
+        self._writer = None
+        self._write_offset = 0
+        self._reader = None
+        self._reader_segment: Optional[int] = None
+
+        labels = {"outbox": name}
+        self.appended = metrics.counter("outbox_records_appended_total", labels=labels)
+        self.dropped = metrics.counter("outbox_records_dropped_total", labels=labels)
+        metrics.callback_gauge("outbox_bytes", self.size_bytes, labels=labels)
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"{segment:020d}{self.SEGMENT_SUFFIX}")
+
+    def _committed_path(self) -> str:
+        return os.path.join(self.directory, self.COMMITTED_FILE)
+
+    def open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.segments = sorted(
+            int(filename[: -len(self.SEGMENT_SUFFIX)])
+            for filename in os.listdir(self.directory)
+            if filename.endswith(self.SEGMENT_SUFFIX)
+        )
+        if not self.segments:
+            self.segments = [0]
+        self._segment_sizes = {
+            segment: self._scan_valid_size(self._segment_path(segment))
+            for segment in self.segments
+        }
+        self.committed = self._load_committed()
+        if self.committed.segment < self.segments[0]:
+            self.committed = Position(self.segments[0], 0)
+        self._read_position = self.committed
+        self._open_writer(self.segments[-1])
+
+    def close(self):
+        if self._writer is not None:
+            self.flush()
+            self._writer.close()
+            self._writer = None
+        self._close_reader()
+
+    def _load_committed(self) -> Position:
+        try:
+            with open(self._committed_path(), "r") as f:
+                segment, offset = f.read().split()
+                return Position(int(segment), int(offset))
+        except (OSError, ValueError):
+            return Position(self.segments[0], 0)
+
+    def _open_writer(self, segment: int):
+        path = self._segment_path(segment)
+        # Drop a record torn by a crash mid-write, or the next append would
+        # be unreadable behind it
+        valid_size = self._scan_valid_size(path)
+        with open(path, "ab") as f:
+            f.truncate(valid_size)
+        self._writer = open(path, "ab")
+        self._write_offset = valid_size
+        self._segment_sizes[segment] = valid_size
+
+    @staticmethod
+    def _scan_valid_size(path: str) -> int:
+        if not os.path.exists(path):
+            return 0
+        offset = 0
+        with open(path, "rb") as f:
+            while True:
+                header = f.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    return offset
+                (length,) = _HEADER.unpack(header)
+                if len(f.read(length)) < length:
+                    return offset
+                offset += _HEADER.size + length
+
+    def _rotate(self):
+        self.flush()
+        self._writer.close()
+        segment = self.segments[-1] + 1
+        self.segments.append(segment)
+        self._open_writer(segment)
+
+    def append(self, record: bytes):
+        self._writer.write(_HEADER.pack(len(record)))
+        self._writer.write(record)
+        self._write_offset += _HEADER.size + len(record)
+        self._segment_sizes[self.segments[-1]] = self._write_offset
+        self.appended.inc()
+        if self.fsync:
+            self.flush()
+        if self._write_offset >= self.segment_bytes:
+            self._rotate()
+        self._enforce_max_bytes()
+
+    def flush(self):
+        if self._writer is None:
+            return
+        self._writer.flush()
+        if self.fsync:
+            os.fsync(self._writer.fileno())
+
+    def _enforce_max_bytes(self):
+        # Over budget: discard the oldest undelivered segment (never the active one)
+        while self.size_bytes() > self.max_bytes:
+            if len(self.segments) == 1:
+                if not self._write_offset:
+                    return
+                # The active segment alone is over budget, seal it so it can be dropped
+                self._rotate()
+                continue
+            segment = self.segments[0]
+            start = self.committed.offset if self.committed.segment == segment else 0
+            dropped = self._count_records(segment, start)
+            logger.warn(
+                "(outbox) [%s] Over %s bytes, dropping %s undelivered records",
+                self.name,
+                self.max_bytes,
+                dropped,
+            )
+            self.dropped.inc(dropped)
+            self._remove_segment(segment)
+            if self._read_position.segment <= segment:
+                self._read_position = Position(self.segments[0], 0)
+            if self.committed.segment <= segment:
+                self._write_committed(Position(self.segments[0], 0))
+
+    def _count_records(self, segment: int, offset: int) -> int:
+        count = 0
+        with open(self._segment_path(segment), "rb") as f:
+            f.seek(offset)
+            while True:
+                header = f.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    return count
+                (length,) = _HEADER.unpack(header)
+                f.seek(length, os.SEEK_CUR)
+                count += 1
+
+    def _remove_segment(self, segment: int):
+        if self._reader_segment == segment:
+            self._close_reader()
+        self.segments.remove(segment)
+        self._segment_sizes.pop(segment, None)
+        try:
+            os.remove(self._segment_path(segment))
+        except FileNotFoundError:
+            pass
+
+    def _live(self, position: Position) -> Position:
+        # Positions in a segment dropped over max_bytes (e.g. while its records
+        # were being delivered) move on to the oldest remaining segment
+        if position.segment < self.segments[0]:
+            return Position(self.segments[0], 0)
+        return position
+
+    def size_bytes(self) -> int:
+        # Copied first, metrics snapshots read this while the writer appends
+        return sum(list(self._segment_sizes.values()))
+
+    def _close_reader(self):
+        if self._reader is not None:
+            self._reader.close()
+        self._reader = None
+        self._reader_segment = None
+
+    def _open_reader(self, position: Position):
+        if self._reader_segment != position.segment:
+            self._close_reader()
+            self._reader = open(self._segment_path(position.segment), "rb")
+            self._reader_segment = position.segment
+        self._reader.seek(position.offset)
+
+    def read_batch(self, max_records: int) -> tuple[list[bytes], Position]:
+        """Read records after the last read (or committed) position."""
+        self.flush()
+        records: list[bytes] = []
+        position = self._live(self._read_position)
+        while len(records) < max_records:
+            self._open_reader(position)
+            header = self._reader.read(_HEADER.size)
+            if len(header) == _HEADER.size:
+                (length,) = _HEADER.unpack(header)
+                record = self._reader.read(length)
+                if len(record) == length:
+                    records.append(record)
+                    position = Position(
+                        position.segment, position.offset + _HEADER.size + length
+                    )
+                    continue
+            # End of this segment, move on to the next one if it exists
+            later_segments = [s for s in self.segments if s > position.segment]
+            if not later_segments:
+                break
+            position = Position(later_segments[0], 0)
+        self._read_position = position
+        return records, position
+
+    def rewind(self):
+        """Re-read from the committed position (e.g. after a failed delivery)."""
+        self._read_position = self._live(self.committed)
+
+    def commit(self, position: Position):
+        position = self._live(position)
+        self._write_committed(position)
+        # Segments entirely before the committed position are delivered
+        for segment in [s for s in self.segments if s < position.segment]:
+            self._remove_segment(segment)
+
+    def _write_committed(self, position: Position):
+        tmp_path = self._committed_path() + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(f"{position.segment} {position.offset}")
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self._committed_path())
+        self.committed = position
+
+
+class OutboxRelay:
+    """
+    Delivers records from an Outbox, committing only after delivery succeeds.
+
+    The Outbox is not thread-safe, and its writes (and fsyncs) would stall the
+    event loop, so while the relay runs all access to it goes through the
+    relay, which runs it in order on a writer thread of its own.
+    """
+
+    def __init__(
+        self,
+        outbox: Outbox,
+        deliver: Callable[[list[bytes]], Awaitable[None]],
+        batch_size: int = settings.OUTBOX_BATCH_SIZE,
+        poll_interval: float = 1.0,
+        backoff: Optional[Backoff] = None,
+    ):
+        self.outbox = outbox
+        self.deliver = deliver
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.backoff = backoff or Backoff()
+        self.task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._writer: Optional[ThreadPoolExecutor] = None
+
+        labels = {"outbox": outbox.name}
+        self.delivered = metrics.counter(
+            "outbox_records_delivered_total", labels=labels
+        )
+        self.failures = metrics.counter("outbox_delivery_failures_total", labels=labels)
+
+    def notify(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _run(self, func, *args) -> Awaitable:
+        # Submitted right away and shielded, so work is done in the order it
+        # was requested, even by a caller which is cancelled meanwhile
+        return asyncio.shield(asyncio.wrap_future(self._writer.submit(func, *args)))
+
+    def _append(self, records: Sequence[bytes]):
+        for record in records:
+            self.outbox.append(record)
+        self.outbox.flush()
+
+    async def persist(self, records: Sequence[bytes]):
+        """Append records to the outbox, and wake the relay to deliver them."""
+        await self._run(self._append, records)
+        self.notify()
+
+    def _commit_delivered(self, delivered: int):
+        self.outbox.rewind()
+        _, position = self.outbox.read_batch(delivered)
+        self.outbox.commit(position)
+
+    async def _wait_for_records(self):
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def run(self):
+        while True:
+            try:
+                records, position = await self._run(
+                    self.outbox.read_batch, self.batch_size
+                )
+            except Exception as e:
+                self.failures.inc()
+                await self._run(self.outbox.rewind)
+                delay = self.backoff.next_delay()
+                logger.error(
+                    "(outbox) [%s] Failed to read records, retrying in %.2fs: %s",
+                    self.outbox.name,
+                    delay,
+                    e,
+                )
+                await asyncio.sleep(delay)
+                continue
+            if not records:
+                await self._wait_for_records()
+                continue
+            # Only stop cancels delivery, no rewind is needed since the outbox
+            # is reopened from the committed position
+            try:
+                await self.deliver(records)
+            except Exception as e:
+                self.failures.inc()
+                if isinstance(e, PartialDeliveryError) and e.delivered:
+                    # Commit what went through, so it is not delivered again
+                    await self._run(self._commit_delivered, e.delivered)
+                    self.delivered.inc(e.delivered)
+                await self._run(self.outbox.rewind)
+                delay = self.backoff.next_delay()
+                logger.warn(
+                    "(outbox) [%s] Delivery failed, retrying in %.2fs: %s",
+                    self.outbox.name,
+                    delay,
+                    e,
+                )
+                await asyncio.sleep(delay)
+                continue
+            await self._run(self.outbox.commit, position)
+            self.delivered.inc(len(records))
+            self.backoff.reset()
+
+    def start(self):
+        if self.task is not None:
+            raise RuntimeError("Outbox relay already started")
+        self.outbox.open()
+        self._writer = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix=f"outbox-{self.outbox.name}"
+        )
+        self._wakeup = asyncio.Event()
+        self.task = asyncio.create_task(self.run())
+
+    def stop(self, records: Sequence[bytes] = ()):
+        """
+        Stop delivering, and close the outbox once the writes already requested
+        are done, after appending records (e.g. those the producer still held).
+        """
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        if self._writer is None:
+            return
+        if records:
+            self._writer.submit(self._append, records)
+        self._writer.submit(self.outbox.close)
+        self._writer.shutdown(wait=True)
+        self._writer = None
@@ -1,11 +1,22 @@
+from typing import Optional
+
+from roster_agent_runtime import errors
 from roster_agent_runtime.agents import AgentHandle
 from roster_agent_runtime.agents.pool import AgentPool
+from roster_agent_runtime.logs import app_logger
+from roster_agent_runtime.messaging.router import queue_name_for_agent
+from roster_agent_runtime.messaging.rpc import RpcClient, RpcKind
 from roster_agent_runtime.models.conversation import ConversationMessage
+from roster_agent_runtime.models.messaging import ChatRequestPayload
+
+logger = app_logger()
 
 
 class AgentService:
-    def __init__(self, pool: AgentPool):
+    def __init__(self, pool: AgentPool, rpc_client: Optional[RpcClient] = None):
         self.pool = pool
+        # Forwards requests for agents which are not in the local pool
+        self.rpc_client = rpc_client
 
     def _get_agent_handle(self, name: str) -> AgentHandle:
         return self.pool.get_agent_handle(name)
@@ -21,7 +32,25 @@ class AgentService:
         execution_id: str = "",
         execution_type: str = "",
     ) -> str:
-        agent = self._get_agent_handle(name)
+        try:
+            agent = self._get_agent_handle(name)
+        except errors.AgentNotFoundError:
+            if self.rpc_client is None:
+                raise
+            logger.debug("(agent-svc) Forwarding chat for %s over RPC", name)
+            response = await self.rpc_client.call(
+                queue_name_for_agent(name),
+                RpcKind.CHAT_REQUEST,
+                ChatRequestPayload(
+                    identity=identity,
+                    team=team,
+                    role=role,
+                    chat_history=[*history, message],
+                    execution_id=execution_id,
+                    execution_type=execution_type,
+                ).dict(),
+            )
+            return response["message"]
         return await agent.chat(
             identity=identity,
             team=team,
@@ -1,4 +1,5 @@
 import logging
+import socket
 
 from environs import Env
 
@@ -11,13 +12,176 @@ LOG_LEVEL = getattr(logging, env.str("ROSTER_RUNTIME_LOG_LEVEL", "DEBUG"), "DEBU
 
 PORT = env.int("ROSTER_RUNTIME_PORT", 7890)
 
+# JSON codec backend: auto (fastest installed), orjson, msgspec or json
+JSON_CODEC = env.str("ROSTER_RUNTIME_JSON_CODEC", "auto")
+
+# Message broker: rabbitmq, or memory (in-process, single node only)
+MESSAGE_BROKER = env.str("ROSTER_RUNTIME_MESSAGE_BROKER", "rabbitmq")
+# Messages held by each in-memory queue before publishes are rejected
+MEMORY_BROKER_MAX_QUEUE_SIZE = env.int(
+    "ROSTER_RUNTIME_MEMORY_BROKER_MAX_QUEUE_SIZE", 10000
+)
+
+# Message encoding between runtimes:
+#   negotiate: msgpack and compression for peers which advertise support, JSON otherwise
+#   json: always plain JSON
+MESSAGE_ENCODING = env.str("ROSTER_RUNTIME_MESSAGE_ENCODING", "negotiate")
+MESSAGE_COMPRESSION_MIN_BYTES = env.int(
+    "ROSTER_RUNTIME_MESSAGE_COMPRESSION_MIN_BYTES", 16384
+)
+# How long (seconds) what a peer accepts is remembered, and for how many peers
+MESSAGE_PEER_CAPABILITY_TTL = env.float(
+    "ROSTER_RUNTIME_MESSAGE_PEER_CAPABILITY_TTL", 300.0
+)
+MESSAGE_PEER_CAPABILITY_MAX = env.int(
+    "ROSTER_RUNTIME_MESSAGE_PEER_CAPABILITY_MAX", 10000
+)
+# Delays (seconds) between redeliveries of failed messages, dead-lettered after the last
+MESSAGE_RETRY_DELAYS = env.list(
+    "ROSTER_RUNTIME_MESSAGE_RETRY_DELAYS", [1.0, 5.0, 30.0, 120.0], subcast=float
+)
+DEAD_LETTER_QUEUE = env.str("ROSTER_RUNTIME_DEAD_LETTER_QUEUE", "roster.dead-letter")
+# Dead letters kept by the in-memory broker, oldest are dropped first
+MEMORY_BROKER_MAX_DEAD_LETTERS = env.int(
+    "ROSTER_RUNTIME_MEMORY_BROKER_MAX_DEAD_LETTERS", 10000
+)
+
+# Message lanes, scheduled by weight when handlers are at max in flight,
+# so tool responses (which unblock in-progress actions) are not queued
+# behind new action triggers
+MESSAGE_LANE_WEIGHTS = env.dict(
+    "ROSTER_RUNTIME_MESSAGE_LANE_WEIGHTS",
+    {"response": 4, "default": 1},
+    subcast_values=int,
+)
+
+# Message Router Config
+# Deliver messages between agents on this runtime without the broker
+ROUTER_LOCAL_DELIVERY = env.bool("ROSTER_RUNTIME_ROUTER_LOCAL_DELIVERY", True)
+# Locally delivered messages waiting for each agent (per lane), senders wait beyond this
+ROUTER_LOCAL_INBOX_SIZE = env.int("ROSTER_RUNTIME_ROUTER_LOCAL_INBOX_SIZE", 1000)
+# Messages held for each agent which is not running yet (e.g. starting up),
+# beyond this, or once held for longer than the timeout, they are retried
+ROUTER_PENDING_BUFFER_SIZE = env.int("ROSTER_RUNTIME_ROUTER_PENDING_BUFFER_SIZE", 100)
+ROUTER_PENDING_TIMEOUT = env.float("ROSTER_RUNTIME_ROUTER_PENDING_TIMEOUT", 30.0)
+# Outgoing messages read from each agent but not yet published, the agent's
+# stream waits beyond this
+ROUTER_OUTGOING_BUFFER_SIZE = env.int(
+    "ROSTER_RUNTIME_ROUTER_OUTGOING_BUFFER_SIZE", 1000
+)
+# Outgoing messages published together, waiting for all of their confirms
+ROUTER_OUTGOING_BATCH_SIZE = env.int("ROSTER_RUNTIME_ROUTER_OUTGOING_BATCH_SIZE", 100)
+ROUTER_OUTGOING_BACKOFF_MAX = env.float(
+    "ROSTER_RUNTIME_ROUTER_OUTGOING_BACKOFF_MAX", 30.0
+)
+# Suppress redelivered action triggers and tool responses which were already handled
+ROUTER_IDEMPOTENCY_ENABLED = env.bool("ROSTER_RUNTIME_ROUTER_IDEMPOTENCY_ENABLED", True)
+ROUTER_IDEMPOTENCY_MAX_SIZE = env.int(
+    "ROSTER_RUNTIME_ROUTER_IDEMPOTENCY_MAX_SIZE", 10000
+)
+ROUTER_IDEMPOTENCY_TTL = env.float(
+    "ROSTER_RUNTIME_ROUTER_IDEMPOTENCY_TTL", 24 * 60 * 60.0
+)
+# Keep handled message keys on disk, so they survive a restart
+ROUTER_IDEMPOTENCY_PERSIST = env.bool(
+    "ROSTER_RUNTIME_ROUTER_IDEMPOTENCY_PERSIST", False
+)
+ROUTER_IDEMPOTENCY_FILE = env.str(
+    "ROSTER_RUNTIME_ROUTER_IDEMPOTENCY_FILE", ".roster/idempotency.log"
+)
+# The file is rewritten with only live keys once it holds this many times as many
+ROUTER_IDEMPOTENCY_COMPACT_RATIO = env.int(
+    "ROSTER_RUNTIME_ROUTER_IDEMPOTENCY_COMPACT_RATIO", 4
+)
+
 # RabbitMQ Client Config
 RABBITMQ_USER = env.str("ROSTER_RUNTIME_RABBITMQ_USER", "guest")
 RABBITMQ_PASSWORD = env.str("ROSTER_RUNTIME_RABBITMQ_PASSWORD", "guest")
 RABBITMQ_HOST = env.str("ROSTER_RUNTIME_RABBITMQ_HOST", "localhost")
 RABBITMQ_PORT = env.int("ROSTER_RUNTIME_RABBITMQ_PORT", 5672)
 RABBITMQ_VHOST = env.str("ROSTER_RUNTIME_RABBITMQ_VHOST", "/")
+# Channels shared by publishers (each consumer gets its own channel)
+RABBITMQ_CHANNEL_POOL_SIZE = env.int("ROSTER_RUNTIME_RABBITMQ_CHANNEL_POOL_SIZE", 4)
+# Published messages awaiting a broker confirm, publishers wait beyond this
+RABBITMQ_PUBLISH_WINDOW = env.int("ROSTER_RUNTIME_RABBITMQ_PUBLISH_WINDOW", 256)
+# Unacknowledged messages the broker will deliver to each consumer
+RABBITMQ_PREFETCH_COUNT = env.int("ROSTER_RUNTIME_RABBITMQ_PREFETCH_COUNT", 32)
+# Messages handled concurrently by each consumer
+RABBITMQ_MAX_IN_FLIGHT = env.int("ROSTER_RUNTIME_RABBITMQ_MAX_IN_FLIGHT", 8)
+RABBITMQ_RECONNECT_BACKOFF_MAX = env.float(
+    "ROSTER_RUNTIME_RABBITMQ_RECONNECT_BACKOFF_MAX", 30.0
+)
+# What publishes do while the connection is down:
+#   buffer: wait for the connection (bounded by count and timeout)
+#   fail: raise immediately
+RABBITMQ_DISCONNECTED_POLICY = env.str(
+    "ROSTER_RUNTIME_RABBITMQ_DISCONNECTED_POLICY", "buffer"
+)
+RABBITMQ_DISCONNECTED_BUFFER_SIZE = env.int(
+    "ROSTER_RUNTIME_RABBITMQ_DISCONNECTED_BUFFER_SIZE", 1000
+)
+RABBITMQ_DISCONNECTED_TIMEOUT = env.float(
+    "ROSTER_RUNTIME_RABBITMQ_DISCONNECTED_TIMEOUT", 30.0
+)
+# How messages reach agents (every runtime and publisher must agree):
+#   queue: one queue and consumer per agent, via the default exchange
+#   topic: agents are bindings on a few shared queues per runtime, via a topic exchange.
+#     With several runtimes, each binds only the agents running on it.
+RABBITMQ_ROUTING_MODE = env.str("ROSTER_RUNTIME_RABBITMQ_ROUTING_MODE", "queue")
+RABBITMQ_TOPIC_EXCHANGE = env.str(
+    "ROSTER_RUNTIME_RABBITMQ_TOPIC_EXCHANGE", "roster.actors"
+)
+# Names this runtime's shared queues, must be stable across restarts
+RABBITMQ_RUNTIME_ID = env.str(
+    "ROSTER_RUNTIME_RABBITMQ_RUNTIME_ID", socket.gethostname()
+)
+RABBITMQ_SHARED_QUEUES = env.int("ROSTER_RUNTIME_RABBITMQ_SHARED_QUEUES", 1)
+# Shared queues carry traffic for many agents, so they get larger limits
+RABBITMQ_SHARED_PREFETCH_COUNT = env.int(
+    "ROSTER_RUNTIME_RABBITMQ_SHARED_PREFETCH_COUNT", 256
+)
+RABBITMQ_SHARED_MAX_IN_FLIGHT = env.int(
+    "ROSTER_RUNTIME_RABBITMQ_SHARED_MAX_IN_FLIGHT", 64
+)
+
+# Shared HTTP Client Config
+HTTP_POOL_LIMIT = env.int("ROSTER_RUNTIME_HTTP_POOL_LIMIT", 100)
+HTTP_POOL_LIMIT_PER_HOST = env.int("ROSTER_RUNTIME_HTTP_POOL_LIMIT_PER_HOST", 20)
+HTTP_KEEPALIVE_TIMEOUT = env.float("ROSTER_RUNTIME_HTTP_KEEPALIVE_TIMEOUT", 30.0)
+HTTP_DNS_CACHE_TTL = env.int("ROSTER_RUNTIME_HTTP_DNS_CACHE_TTL", 300)
+HTTP_CONNECT_TIMEOUT = env.float("ROSTER_RUNTIME_HTTP_CONNECT_TIMEOUT", 5.0)
+HTTP_READ_TIMEOUT = env.float("ROSTER_RUNTIME_HTTP_READ_TIMEOUT", 30.0)
+HTTP_TOTAL_TIMEOUT = env.float("ROSTER_RUNTIME_HTTP_TOTAL_TIMEOUT", 60.0)
 
+# Agent HTTP Client Config (requests to Agents' own servers, one pool per executor)
+AGENT_HTTP_POOL_LIMIT_PER_HOST = env.int(
+    "ROSTER_RUNTIME_AGENT_HTTP_POOL_LIMIT_PER_HOST", 10
+)
+AGENT_HTTP_CONNECT_TIMEOUT = env.float("ROSTER_RUNTIME_AGENT_HTTP_CONNECT_TIMEOUT", 5.0)
+# Chat responses wait on the Agent's model, so reads may take much longer
+# than other HTTP traffic; streams from Agents have no read timeout.
+# Over WebSockets it bounds each response as a whole (a single frame), from
+# when the request is sent, rather than the time between reads.
+AGENT_HTTP_READ_TIMEOUT = env.float("ROSTER_RUNTIME_AGENT_HTTP_READ_TIMEOUT", 300.0)
+# How the runtime talks to HTTP Agents:
+#   http: a POST per request, plus a long-lived GET per stream
+#   websocket: everything over one connection per Agent (HTTP for Agents without /ws)
+AGENT_TRANSPORT = env.str("ROSTER_RUNTIME_AGENT_TRANSPORT", "http")
+# Stream events each Agent may send ahead of the runtime reading them (per stream)
+AGENT_WS_STREAM_WINDOW = env.int("ROSTER_RUNTIME_AGENT_WS_STREAM_WINDOW", 64)
+# Requests awaiting a response on each connection, callers wait beyond this
+AGENT_WS_MAX_IN_FLIGHT = env.int("ROSTER_RUNTIME_AGENT_WS_MAX_IN_FLIGHT", 32)
+AGENT_WS_HEARTBEAT = env.float("ROSTER_RUNTIME_AGENT_WS_HEARTBEAT", 20.0)
+AGENT_WS_BACKOFF_MAX = env.float("ROSTER_RUNTIME_AGENT_WS_BACKOFF_MAX", 30.0)
+
+# Docker Executor Config
+# Reach Docker Agents over a Unix socket in a bind-mounted directory, rather
+# than a published port (and docker-proxy). Only applies to new containers.
+DOCKER_AGENT_SOCKETS = env.bool("ROSTER_RUNTIME_DOCKER_AGENT_SOCKETS", False)
+# Holds a directory per Agent; must be the same path on the Docker host
+DOCKER_AGENT_SOCKET_DIR = env.str(
+    "ROSTER_RUNTIME_DOCKER_AGENT_SOCKET_DIR", "/tmp/roster-agent-sockets"
+)
 
 # Roster API Config
 ROSTER_API_URL = env.str("ROSTER_RUNTIME_API_URL", "http://localhost:7888/v0.1")
@@ -27,7 +191,96 @@ ROSTER_API_STATUS_UPDATE_PATH = env.str(
     "ROSTER_RUNTIME_API_STATUS_UPDATE_PATH", "/status-update"
 )
 ROSTER_API_STATUS_UPDATE_URL = ROSTER_API_URL + ROSTER_API_STATUS_UPDATE_PATH
+ROSTER_API_STATUS_UPDATE_BATCH_PATH = env.str(
+    "ROSTER_RUNTIME_API_STATUS_UPDATE_BATCH_PATH", "/status-updates"
+)
+ROSTER_API_STATUS_UPDATE_BATCH_URL = (
+    ROSTER_API_URL + ROSTER_API_STATUS_UPDATE_BATCH_PATH
+)
 ROSTER_API_ACTIVITY_PATH = env.str("ROSTER_RUNTIME_API_ACTIVITY_PATH", "/activities")
 ROSTER_API_ACTIVITY_URL = ROSTER_API_URL + ROSTER_API_ACTIVITY_PATH
+ROSTER_API_ACTIVITY_BATCH_PATH = env.str(
+    "ROSTER_RUNTIME_API_ACTIVITY_BATCH_PATH", "/activities/batch"
+)
+ROSTER_API_ACTIVITY_BATCH_URL = ROSTER_API_URL + ROSTER_API_ACTIVITY_BATCH_PATH
 ROSTER_API_AGENTS_PATH = env.str("ROSTER_RUNTIME_API_AGENTS_PATH", "/agents")
 ROSTER_API_AGENTS_URL = ROSTER_API_URL + ROSTER_API_AGENTS_PATH
+
+# Roster Informer Config
+ROSTER_INFORMER_SYNC_TIMEOUT = env.float("ROSTER_RUNTIME_INFORMER_SYNC_TIMEOUT", 10.0)
+ROSTER_INFORMER_BACKOFF_INITIAL = env.float(
+    "ROSTER_RUNTIME_INFORMER_BACKOFF_INITIAL", 0.5
+)
+ROSTER_INFORMER_BACKOFF_MAX = env.float("ROSTER_RUNTIME_INFORMER_BACKOFF_MAX", 30.0)
+
+# Roster Notifier Config
+NOTIFIER_BATCH_SIZE = env.int("ROSTER_RUNTIME_NOTIFIER_BATCH_SIZE", 500)
+NOTIFIER_FLUSH_INTERVAL = env.float("ROSTER_RUNTIME_NOTIFIER_FLUSH_INTERVAL", 0.5)
+NOTIFIER_MAX_PENDING = env.int("ROSTER_RUNTIME_NOTIFIER_MAX_PENDING", 10000)
+# What to do with a new event when NOTIFIER_MAX_PENDING is reached:
+#   drop_oldest: evict the longest pending event
+#   drop_newest: discard the incoming event
+NOTIFIER_OVERFLOW_POLICY = env.str(
+    "ROSTER_RUNTIME_NOTIFIER_OVERFLOW_POLICY", "drop_oldest"
+)
+NOTIFIER_BACKOFF_MAX = env.float("ROSTER_RUNTIME_NOTIFIER_BACKOFF_MAX", 30.0)
+
+# Outbox Config (disk-backed delivery of status and activity events)
+OUTBOX_ENABLED = env.bool("ROSTER_RUNTIME_OUTBOX_ENABLED", False)
+OUTBOX_DIR = env.str("ROSTER_RUNTIME_OUTBOX_DIR", ".roster/outbox")
+OUTBOX_SEGMENT_BYTES = env.int("ROSTER_RUNTIME_OUTBOX_SEGMENT_BYTES", 16 * 1024 * 1024)
+OUTBOX_MAX_BYTES = env.int("ROSTER_RUNTIME_OUTBOX_MAX_BYTES", 1024 * 1024 * 1024)
+OUTBOX_FSYNC = env.bool("ROSTER_RUNTIME_OUTBOX_FSYNC", False)
+OUTBOX_BATCH_SIZE = env.int("ROSTER_RUNTIME_OUTBOX_BATCH_SIZE", 500)
+
+# Activity Uploader Config (node-wide batching of agent activity events)
+ACTIVITY_BATCH_SIZE = env.int("ROSTER_RUNTIME_ACTIVITY_BATCH_SIZE", 500)
+ACTIVITY_FLUSH_INTERVAL = env.float("ROSTER_RUNTIME_ACTIVITY_FLUSH_INTERVAL", 0.25)
+# Per-agent buffer; a full buffer blocks that agent's activity stream only
+ACTIVITY_MAX_PENDING_PER_AGENT = env.int(
+    "ROSTER_RUNTIME_ACTIVITY_MAX_PENDING_PER_AGENT", 1000
+)
+# gzip or none
+ACTIVITY_COMPRESSION = env.str("ROSTER_RUNTIME_ACTIVITY_COMPRESSION", "gzip")
+ACTIVITY_COMPRESSION_MIN_BYTES = env.int(
+    "ROSTER_RUNTIME_ACTIVITY_COMPRESSION_MIN_BYTES", 1024
+)
+ACTIVITY_BACKOFF_MAX = env.float("ROSTER_RUNTIME_ACTIVITY_BACKOFF_MAX", 30.0)
+
+# Activity Hub Config (fan-out of agent activity streams)
+# Recent events kept per agent, replayed to late subscribers
+ACTIVITY_REPLAY_BUFFER_SIZE = env.int("ROSTER_RUNTIME_ACTIVITY_REPLAY_BUFFER_SIZE", 256)
+# Slow subscribers lose their oldest events beyond this
+ACTIVITY_SUBSCRIBER_QUEUE_SIZE = env.int(
+    "ROSTER_RUNTIME_ACTIVITY_SUBSCRIBER_QUEUE_SIZE", 1000
+)
+ACTIVITY_SSE_HEARTBEAT_INTERVAL = env.float(
+    "ROSTER_RUNTIME_ACTIVITY_SSE_HEARTBEAT_INTERVAL", 15.0
+)
+# Agent activity streams which end or fail are read again after a backoff
+ACTIVITY_READER_BACKOFF_MAX = env.float(
+    "ROSTER_RUNTIME_ACTIVITY_READER_BACKOFF_MAX", 30.0
+)
+
+# Blob Store Config (claim checks for oversized messages)
+# none, or local (a directory which every runtime sharing the store can read)
+BLOB_STORE = env.str("ROSTER_RUNTIME_BLOB_STORE", "none")
+BLOB_STORE_DIR = env.str("ROSTER_RUNTIME_BLOB_STORE_DIR", ".roster/blobs")
+# Peers only exchange claim checks when they use the same store
+BLOB_STORE_ID = env.str("ROSTER_RUNTIME_BLOB_STORE_ID", socket.gethostname())
+# Message data larger than this is sent as a reference to a blob
+CLAIM_CHECK_MIN_BYTES = env.int("ROSTER_RUNTIME_CLAIM_CHECK_MIN_BYTES", 256 * 1024)
+# Blobs are removed once unused for this long (seconds), which must outlast
+# the retries of the messages referencing them (dead letters pin their blobs
+# until they are replayed)
+BLOB_TTL = env.float("ROSTER_RUNTIME_BLOB_TTL", 7 * 24 * 60 * 60.0)
+BLOB_SWEEP_INTERVAL = env.float("ROSTER_RUNTIME_BLOB_SWEEP_INTERVAL", 600.0)
+
+# RPC Config (requests over the message bus, e.g. chat with agents on other runtimes)
+RPC_ENABLED = env.bool("ROSTER_RUNTIME_RPC_ENABLED", True)
+# Replies to this runtime's requests are sent here
+RPC_REPLY_QUEUE = env.str(
+    "ROSTER_RUNTIME_RPC_REPLY_QUEUE", f"roster-runtime:{RABBITMQ_RUNTIME_ID}:replies"
+)
+# Chat prompts many LLM calls, so the default is generous
+RPC_TIMEOUT = env.float("ROSTER_RUNTIME_RPC_TIMEOUT", 300.0)
@@ -1,11 +1,17 @@
 from typing import TYPE_CHECKING, Optional
 
 if TYPE_CHECKING:
+    from roster_agent_runtime.activity.hub import ActivityHub
+    from roster_agent_runtime.activity.uploader import ActivityUploader
     from roster_agent_runtime.agents.pool import AgentPool
+    from roster_agent_runtime.blobs import BlobStore
     from roster_agent_runtime.controllers.agent import AgentController
+    from roster_agent_runtime.http_client import HttpClient
     from roster_agent_runtime.informers.roster import RosterInformer
+    from roster_agent_runtime.messaging.base import MessageBroker
     from roster_agent_runtime.messaging.rabbitmq import RabbitMQClient
     from roster_agent_runtime.messaging.router import MessageRouter
+    from roster_agent_runtime.messaging.rpc import RpcClient
     from roster_agent_runtime.notifier import RosterNotifier
     from roster_agent_runtime.services.agent import AgentService
 
@@ -15,7 +21,64 @@ AGENT_POOL: Optional["AgentPool"] = None
 AGENT_CONTROLLER: Optional["AgentController"] = None
 AGENT_SERVICE: Optional["AgentService"] = None
 RABBITMQ_CLIENT: Optional["RabbitMQClient"] = None
+MESSAGE_BROKER: Optional["MessageBroker"] = None
 MESSAGE_ROUTER: Optional["MessageRouter"] = None
+HTTP_CLIENT: Optional["HttpClient"] = None
+ACTIVITY_UPLOADER: Optional["ActivityUploader"] = None
+ACTIVITY_HUB: Optional["ActivityHub"] = None
+BLOB_STORE: Optional["BlobStore"] = None
+RPC_CLIENT: Optional["RpcClient"] = None
+
+
+def get_http_client() -> "HttpClient":
+    global HTTP_CLIENT
+    if HTTP_CLIENT is not None:
+        return HTTP_CLIENT
+
+    from roster_agent_runtime.http_client import HttpClient
+
+    HTTP_CLIENT = HttpClient(name="roster")
+    return HTTP_CLIENT
+
+
+def get_activity_hub() -> "ActivityHub":
+    global ACTIVITY_HUB
+    if ACTIVITY_HUB is not None:
+        return ACTIVITY_HUB
+
+    from roster_agent_runtime.activity.hub import ActivityHub
+
+    ACTIVITY_HUB = ActivityHub()
+    return ACTIVITY_HUB
+
+
+def get_activity_uploader() -> "ActivityUploader":
+    global ACTIVITY_UPLOADER
+    if ACTIVITY_UPLOADER is not None:
+        return ACTIVITY_UPLOADER
+
+    from roster_agent_runtime.activity.uploader import ActivityUploader
+
+    ACTIVITY_UPLOADER = ActivityUploader()
+    return ACTIVITY_UPLOADER
+
+
+def get_blob_store() -> Optional["BlobStore"]:
+    global BLOB_STORE
+    if BLOB_STORE is not None:
+        return BLOB_STORE
+
+    from roster_agent_runtime import settings
+
+    if settings.BLOB_STORE == "none":
+        return None
+    elif settings.BLOB_STORE == "local":
+        from roster_agent_runtime.blobs import LocalBlobStore
+
+        BLOB_STORE = LocalBlobStore()
+    else:
+        raise ValueError(f"Unknown blob store: {settings.BLOB_STORE}")
+    return BLOB_STORE
 
 
 def get_roster_informer() -> "RosterInformer":
@@ -76,7 +139,7 @@ def get_agent_service() -> "AgentService":
 
     from roster_agent_runtime.services.agent import AgentService
 
-    AGENT_SERVICE = AgentService(pool=get_agent_pool())
+    AGENT_SERVICE = AgentService(pool=get_agent_pool(), rpc_client=get_rpc_client())
     return AGENT_SERVICE
 
 
@@ -87,10 +150,28 @@ def get_rabbitmq() -> "RabbitMQClient":
 
     from roster_agent_runtime.messaging.rabbitmq import RabbitMQClient
 
-    RABBITMQ_CLIENT = RabbitMQClient()
+    RABBITMQ_CLIENT = RabbitMQClient(blob_store=get_blob_store())
     return RABBITMQ_CLIENT
 
 
+def get_message_broker() -> "MessageBroker":
+    global MESSAGE_BROKER
+    if MESSAGE_BROKER is not None:
+        return MESSAGE_BROKER
+
+    from roster_agent_runtime import settings
+
+    if settings.MESSAGE_BROKER == "memory":
+        from roster_agent_runtime.messaging.memory import InMemoryBroker
+
+        MESSAGE_BROKER = InMemoryBroker()
+    elif settings.MESSAGE_BROKER == "rabbitmq":
+        MESSAGE_BROKER = get_rabbitmq()
+    else:
+        raise ValueError(f"Unknown message broker: {settings.MESSAGE_BROKER}")
+    return MESSAGE_BROKER
+
+
 def get_message_router() -> "MessageRouter":
     global MESSAGE_ROUTER
     if MESSAGE_ROUTER is not None:
@@ -100,3 +181,19 @@ def get_message_router() -> "MessageRouter":
 
     MESSAGE_ROUTER = MessageRouter()
     return MESSAGE_ROUTER
+
+
+def get_rpc_client() -> Optional["RpcClient"]:
+    global RPC_CLIENT
+    if RPC_CLIENT is not None:
+        return RPC_CLIENT
+
+    from roster_agent_runtime import settings
+
+    if not settings.RPC_ENABLED:
+        return None
+
+    from roster_agent_runtime.messaging.rpc import RpcClient
+
+    RPC_CLIENT = RpcClient()
+    return RPC_CLIENT
@@ -0,0 +1,25 @@
+import asyncio
+import random
+
+
+class Backoff:
+    """Exponential backoff with full jitter."""
+
+    def __init__(
+        self, initial: float = 0.5, maximum: float = 30.0, multiplier: float = 2.0
+    ):
+        self.initial = initial
+        self.maximum = maximum
+        self.multiplier = multiplier
+        self.attempts = 0
+
+    def next_delay(self) -> float:
+        ceiling = min(self.maximum, self.initial * (self.multiplier**self.attempts))
+        self.attempts += 1
+        return random.uniform(0, ceiling)
+
+    def reset(self):
+        self.attempts = 0
+
+    async def sleep(self):
+        await asyncio.sleep(self.next_delay())
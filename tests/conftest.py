@@ -0,0 +1,9 @@
+import os
+import tempfile
+
+# Keep the debug log written by app_logger() out of the working tree,
+# set before any runtime module reads its settings
+os.environ.setdefault(
+    "ROSTER_RUNTIME_LOG",
+    os.path.join(tempfile.gettempdir(), "roster-agent-runtime-tests.log"),
+)
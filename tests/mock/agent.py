@@ -0,0 +1,114 @@
+import asyncio
+from typing import AsyncIterator
+
+from roster_agent_runtime import errors
+from roster_agent_runtime.agents import AgentHandle
+from roster_agent_runtime.executors.events import (
+    EventType,
+    Resource,
+    ResourceStatusEvent,
+)
+from roster_agent_runtime.models.conversation import ConversationMessage
+from roster_agent_runtime.models.messaging import OutgoingMessage
+from roster_agent_runtime.models.records import AgentStatusRecord
+
+
+class MockAgentHandle(AgentHandle):
+    def __init__(self, name: str):
+        self.name = name
+        self.actions: list[dict] = []
+        self.tool_responses: list[dict] = []
+        self.outgoing: asyncio.Queue[OutgoingMessage] = asyncio.Queue()
+        self.chats: list[list[ConversationMessage]] = []
+        self.chat_reply = ""
+        self.chat_delay = 0.0
+
+    async def chat(
+        self,
+        identity: str,
+        team: str,
+        role: str,
+        chat_history: list[ConversationMessage],
+        execution_id: str = "",
+        execution_type: str = "",
+    ) -> str:
+        self.chats.append(chat_history)
+        if self.chat_delay:
+            await asyncio.sleep(self.chat_delay)
+        return self.chat_reply
+
+    async def trigger_action(
+        self,
+        step: str,
+        action: str,
+        inputs: dict[str, str],
+        role_context: str,
+        record_id: str,
+        workflow: str,
+    ) -> None:
+        self.actions.append(
+            {"step": step, "action": action, "inputs": inputs, "record_id": record_id}
+        )
+
+    async def handle_tool_response(
+        self, invocation_id: str, tool: str, data: dict
+    ) -> None:
+        self.tool_responses.append(
+            {"invocation_id": invocation_id, "tool": tool, "data": data}
+        )
+
+    async def outgoing_message_stream(self) -> AsyncIterator[OutgoingMessage]:
+        while True:
+            yield await self.outgoing.get()
+
+    async def activity_stream(self) -> AsyncIterator[dict]:
+        await asyncio.Event().wait()
+        yield {}
+
+
+class MockAgentPool:
+    def __init__(self, names: list[str]):
+        self.handles = {name: MockAgentHandle(name) for name in names}
+        self.statuses = {
+            name: AgentStatusRecord(name=name, executor="mock", status="running")
+            for name in names
+        }
+        self.status_listeners = []
+
+    def get_agent(self, name: str) -> AgentStatusRecord:
+        try:
+            return self.statuses[name]
+        except KeyError:
+            raise errors.AgentNotFoundError(agent=name)
+
+    def get_agent_handle(self, name: str) -> MockAgentHandle:
+        try:
+            return self.handles[name]
+        except KeyError:
+            raise errors.AgentNotFoundError(agent=name)
+
+    def add_status_listener(self, listener):
+        self.status_listeners.append(listener)
+
+    def remove_status_listener(self, listener):
+        self.status_listeners.remove(listener)
+
+    def put_agent(self, name: str, status: str = "running"):
+        if name not in self.handles:
+            self.handles[name] = MockAgentHandle(name)
+        self.statuses[name] = AgentStatusRecord(
+            name=name, executor="mock", status=status
+        )
+        self._notify(EventType.PUT, name, self.statuses[name])
+
+    def delete_agent(self, name: str):
+        self.statuses.pop(name, None)
+        self.handles.pop(name, None)
+        self._notify(EventType.DELETE, name)
+
+    def _notify(self, event_type: EventType, name: str, data=None):
+        event = ResourceStatusEvent(
+            resource_type=Resource.AGENT, event_type=event_type, name=name, data=data
+        )
+        for listener in self.status_listeners:
+            listener(event)
@@ -0,0 +1,294 @@
+import asyncio
+import itertools
+from collections import deque
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from typing import Optional
+
+# NOTE: A minimal in-process stand-in for the parts of aio-pika used by
+#   RabbitMQClient. Deliveries respect per-channel prefetch, and each delivery
+#   runs as its own task, as with aio-pika. Unacknowledged messages are
+#   redelivered when their channel closes. Named exchanges route by exact
+#   binding key only (topic wildcards are not supported), or to every bound
+#   queue if declared as fanout. Queues with a message TTL dead-letter each
+#   message once it expires, and are never consumed from.
+
+
+class MockIncomingMessage:
+    def __init__(
+        self,
+        queue: "MockQueue",
+        body: bytes,
+        properties: dict,
+        routing_key: str,
+        consumer_tag: str,
+    ):
+        self.queue = queue
+        self.body = body
+        self.properties = properties
+        self.headers = properties.get("headers") or {}
+        self.content_type = properties.get("content_type")
+        self.content_encoding = properties.get("content_encoding")
+        self.routing_key = routing_key
+        self.consumer_tag = consumer_tag
+
+    @asynccontextmanager
+    async def process(self, requeue: bool = False):
+        try:
+            yield self
+        except BaseException:
+            self.queue.nack(self, requeue=requeue)
+            raise
+        self.queue.ack(self)
+
+    async def ack(self):
+        self.queue.ack(self)
+
+    async def nack(self, requeue: bool = True):
+        self.queue.nack(self, requeue=requeue)
+
+
+class MockQueue:
+    def __init__(self, broker: "MockBroker", name: str, arguments: Optional[dict]):
+        self.broker = broker
+        self.name = name
+        self.arguments = arguments or {}
+        # Channel the queue was last declared on, consumers inherit its QoS
+        self._channel: Optional["MockChannel"] = None
+        self.messages: deque[tuple[bytes, dict, str]] = deque()
+        self.consumers: dict[str, tuple["MockChannel", callable]] = {}
+        self.unacked: dict[str, list[MockIncomingMessage]] = {}
+        self.tasks: set[asyncio.Task] = set()
+        self._tags = itertools.count(1)
+
+    @property
+    def declaration_result(self) -> SimpleNamespace:
+        return SimpleNamespace(message_count=len(self.messages))
+
+    async def consume(self, callback) -> str:
+        tag = f"ctag-{self.name}-{next(self._tags)}"
+        self.consumers[tag] = (self._channel, callback)
+        self.unacked[tag] = []
+        self.deliver()
+        return tag
+
+    async def cancel(self, consumer_tag: str):
+        self.consumers.pop(consumer_tag, None)
+
+    async def bind(self, exchange, routing_key: str = "", **kwargs):
+        name = getattr(exchange, "name", exchange)
+        self.broker.bindings.setdefault(name, {}).setdefault(routing_key, set()).add(
+            self.name
+        )
+
+    async def unbind(self, exchange, routing_key: str, **kwargs):
+        name = getattr(exchange, "name", exchange)
+        self.broker.bindings.get(name, {}).get(routing_key, set()).discard(self.name)
+
+    def put(
+        self, body: bytes, properties: Optional[dict] = None, routing_key: str = ""
+    ):
+        properties = properties or {}
+        routing_key = routing_key or self.name
+        ttl = self.arguments.get("x-message-ttl")
+        if ttl is not None:
+            asyncio.get_running_loop().call_later(
+                ttl / 1000,
+                self.broker.route,
+                self.arguments.get("x-dead-letter-exchange", ""),
+                routing_key,
+                body,
+                properties,
+            )
+            return
+        self.messages.append((body, properties, routing_key))
+        self.deliver()
+
+    async def get(self, no_ack: bool = False, fail: bool = True, **kwargs):
+        if not self.messages:
+            if fail:
+                raise LookupError(f"Queue {self.name} is empty")
+            return None
+        body, properties, routing_key = self.messages.popleft()
+        message = MockIncomingMessage(
+            self, body, properties, routing_key=routing_key, consumer_tag="get"
+        )
+        if not no_ack:
+            self.unacked.setdefault("get", []).append(message)
+        return message
+
+    def deliver(self):
+        for tag, (channel, callback) in list(self.consumers.items()):
+            while self.messages and (
+                not channel.prefetch_count
+                or len(self.unacked[tag]) < channel.prefetch_count
+            ):
+                body, properties, routing_key = self.messages.popleft()
+                message = MockIncomingMessage(
+                    self, body, properties, routing_key=routing_key, consumer_tag=tag
+                )
+                self.unacked[tag].append(message)
+                task = asyncio.create_task(callback(message))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+
+    def ack(self, message: MockIncomingMessage):
+        unacked = self.unacked.get(message.consumer_tag, [])
+        if message in unacked:
+            unacked.remove(message)
+        self.deliver()
+
+    def nack(self, message: MockIncomingMessage, requeue: bool = True):
+        unacked = self.unacked.get(message.consumer_tag, [])
+        if message in unacked:
+            unacked.remove(message)
+            if requeue:
+                self.messages.appendleft(
+                    (message.body, message.properties, message.routing_key)
+                )
+        self.deliver()
+
+    def close_channel(self, channel: "MockChannel"):
+        for tag, (consumer_channel, _) in list(self.consumers.items()):
+            if consumer_channel is not channel:
+                continue
+            del self.consumers[tag]
+            for message in reversed(self.unacked.pop(tag)):
+                self.messages.appendleft(
+                    (message.body, message.properties, message.routing_key)
+                )
+        self.deliver()
+
+
+class MockExchange:
+    def __init__(self, channel: "MockChannel", name: str = ""):
+        self.channel = channel
+        self.broker = channel.broker
+        self.name = name
+
+    async def publish(self, message, routing_key: str):
+        if self.channel.is_closed:
+            raise ConnectionError("Channel is closed")
+        self.broker.outstanding += 1
+        self.broker.peak_outstanding = max(
+            self.broker.peak_outstanding, self.broker.outstanding
+        )
+        try:
+            if self.broker.publish_latency:
+                # Round trip until the broker confirms the message
+                await asyncio.sleep(self.broker.publish_latency)
+            if routing_key in self.broker.reject_routing_keys:
+                raise ConnectionError(f"Publish to {routing_key} was nacked")
+        finally:
+            self.broker.outstanding -= 1
+        self.broker.published.append((routing_key, message.body))
+        properties = {
+            "headers": message.headers,
+            "content_type": message.content_type,
+            "content_encoding": message.content_encoding,
+        }
+        self.broker.route(self.name, routing_key, message.body, properties)
+
+
+class MockChannel:
+    def __init__(self, broker: "MockBroker"):
+        self.broker = broker
+        self.prefetch_count = 0
+        self.is_closed = False
+        self.default_exchange = MockExchange(self)
+
+    async def set_qos(self, prefetch_count: int = 0, **kwargs):
+        self.prefetch_count = prefetch_count
+
+    async def declare_exchange(
+        self, name: str, type="direct", *args, **kwargs
+    ) -> MockExchange:
+        self.broker.bindings.setdefault(name, {})
+        self.broker.exchange_types[name] = getattr(type, "value", type)
+        return MockExchange(self, name)
+
+    async def declare_queue(
+        self, name: str, arguments: Optional[dict] = None, **kwargs
+    ) -> MockQueue:
+        queue = self.broker.queues.get(name)
+        if queue is None:
+            queue = MockQueue(self.broker, name, arguments)
+            self.broker.queues[name] = queue
+        queue._channel = self
+        return queue
+
+    def _close(self):
+        if self.is_closed:
+            return
+        self.is_closed = True
+        for queue in self.broker.queues.values():
+            queue.close_channel(self)
+
+    async def close(self):
+        self._close()
+
+
+class MockConnection:
+    def __init__(self, broker: "MockBroker"):
+        self.broker = broker
+        self.is_closed = False
+        self.channels: list[MockChannel] = []
+        self.close_callbacks: set = set()
+
+    async def channel(self, **kwargs) -> MockChannel:
+        if self.is_closed:
+            raise ConnectionError("Connection is closed")
+        channel = MockChannel(self.broker)
+        self.channels.append(channel)
+        self.broker.channels.append(channel)
+        return channel
+
+    def _close(self, exc: Optional[Exception] = None):
+        if self.is_closed:
+            return
+        self.is_closed = True
+        for channel in self.channels:
+            channel._close()
+        for callback in list(self.close_callbacks):
+            callback(self, exc)
+
+    async def close(self):
+        self._close()
+
+
+class MockBroker:
+    def __init__(self, publish_latency: float = 0.0):
+        self.publish_latency = publish_latency
+        self.queues: dict[str, MockQueue] = {}
+        # Exchange name -> binding key -> bound queue names
+        self.bindings: dict[str, dict[str, set[str]]] = {}
+        self.exchange_types: dict[str, str] = {}
+        self.channels: list[MockChannel] = []
+        self.connections: list[MockConnection] = []
+        self.published: list[tuple[str, bytes]] = []
+        self.reject_routing_keys: set[str] = set()
+        self.refuse_connections = 0
+        self.outstanding = 0
+        self.peak_outstanding = 0
+
+    async def connect(self, *args, **kwargs) -> MockConnection:
+        if self.refuse_connections:
+            self.refuse_connections -= 1
+            raise ConnectionError("Connection refused")
+        connection = MockConnection(self)
+        self.connections.append(connection)
+        return connection
+
+    def route(self, exchange: str, routing_key: str, body: bytes, properties: dict):
+        if not exchange:
+            names = [routing_key] if routing_key in self.queues else []
+        elif self.exchange_types.get(exchange) == "fanout":
+            names = set().union(*self.bindings.get(exchange, {}).values())
+        else:
+            names = self.bindings.get(exchange, {}).get(routing_key, ())
+        for name in names:
+            self.queues[name].put(body, properties, routing_key)
+
+    def drop_connections(self):
+        for connection in self.connections:
+            connection._close(ConnectionError("Connection reset by peer"))
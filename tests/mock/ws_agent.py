@@ -0,0 +1,85 @@
+from collections import deque
+from typing import Optional
+
+from aiohttp import WSMsgType, web
+from roster_agent_runtime import codec
+
+
+class MockWebSocketAgent:
+    """
+    Agent server speaking the multiplexed WebSocket protocol, which only sends
+    stream events it holds credits for. Serves the plain HTTP endpoints too.
+    """
+
+    def __init__(self):
+        self.sockets: list[web.WebSocketResponse] = []
+        self.ws: Optional[web.WebSocketResponse] = None
+        self.credits: dict[str, int] = {}
+        self.backlog: dict[str, deque] = {}
+        self.http_requests = 0
+
+    def app(self, websocket: bool = True) -> web.Application:
+        app = web.Application()
+        if websocket:
+            app.router.add_get("/ws", self.handle_ws)
+        app.router.add_post("/chat", self.handle_chat)
+        return app
+
+    def reply(self, channel: str, data: dict) -> dict:
+        if channel == "chat":
+            return {"message": f"Hi {data['identity']}"}
+        return {}
+
+    async def handle_chat(self, request: web.Request) -> web.Response:
+        self.http_requests += 1
+        return web.json_response(self.reply("chat", await request.json()))
+
+    async def emit(self, channel: str, data: dict):
+        self.backlog.setdefault(channel, deque()).append(data)
+        await self._flush(channel)
+
+    async def _flush(self, channel: str):
+        backlog = self.backlog.get(channel)
+        while backlog and self.credits.get(channel, 0) > 0 and self.ws is not None:
+            self.credits[channel] -= 1
+            data = backlog.popleft()
+            await self.ws.send_bytes(
+                codec.dumps({"type": "event", "channel": channel, "data": data})
+            )
+
+    async def handle_ws(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.sockets.append(ws)
+        self.ws = ws
+        self.credits = {}
+        async for message in ws:
+            if message.type != WSMsgType.BINARY:
+                break
+            frame = codec.loads(message.data)
+            if frame["type"] == "request":
+                await ws.send_bytes(
+                    codec.dumps(
+                        {
+                            "type": "response",
+                            "id": frame["id"],
+                            "status": 200,
+                            "data": self.reply(frame["channel"], frame["data"]),
+                        }
+                    )
+                )
+            elif frame["type"] == "subscribe":
+                self.credits[frame["channel"]] = frame["credits"]
+                await self._flush(frame["channel"])
+            elif frame["type"] == "credit":
+                self.credits[frame["channel"]] += frame["credits"]
+                await self._flush(frame["channel"])
+            elif frame["type"] == "unsubscribe":
+                self.credits.pop(frame["channel"], None)
+        if self.ws is ws:
+            self.ws = None
+        return ws
+
+    async def drop_connections(self):
+        for ws in self.sockets:
+            await ws.close()
@@ -0,0 +1,126 @@
+import asyncio
+from typing import AsyncIterator
+
+import pytest
+from roster_agent_runtime import codec
+from roster_agent_runtime.activity.hub import ActivityEvent, ActivityHub
+from roster_agent_runtime.api.activity import format_sse
+
+
+class FakeAgentHandle:
+    def __init__(self, failures: int = 0):
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.readers = 0
+        self.failures = failures
+
+    async def activity_stream(self) -> AsyncIterator[dict]:
+        self.readers += 1
+        while True:
+            data = await self.queue.get()
+            if data is None:
+                # Ends the stream, as when the agent closes it
+                return
+            if self.failures:
+                self.failures -= 1
+                raise ConnectionError("Agent went away")
+            yield data
+
+
+async def drain(subscription, count: int) -> list:
+    return [await asyncio.wait_for(subscription.get(), timeout=1) for _ in range(count)]
+
+
+@pytest.mark.asyncio
+async def test_stream_is_read_once_and_fanned_out():
+    hub = ActivityHub()
+    consumed = []
+
+    async def consumer(agent_name: str, data: dict):
+        consumed.append((agent_name, data["index"]))
+
+    hub.add_consumer(consumer)
+    handle = FakeAgentHandle()
+    hub.register("Alice", handle)
+    first = hub.subscribe()
+    second = hub.subscribe(agent_name="Alice")
+    for i in range(3):
+        handle.queue.put_nowait({"index": i})
+
+    assert [event.data["index"] for event in await drain(first, 3)] == [0, 1, 2]
+    assert [event.data["index"] for event in await drain(second, 3)] == [0, 1, 2]
+    assert consumed == [("Alice", 0), ("Alice", 1), ("Alice", 2)]
+    assert handle.readers == 1
+    hub.teardown()
+
+
+@pytest.mark.asyncio
+async def test_late_subscribers_replay_recent_events():
+    hub = ActivityHub(replay_buffer_size=2)
+    alice, bob = FakeAgentHandle(), FakeAgentHandle()
+    hub.register("Alice", alice)
+    hub.register("Bob", bob)
+    watcher = hub.subscribe()
+    for i in range(3):
+        alice.queue.put_nowait({"index": i})
+        await watcher.get()
+        bob.queue.put_nowait({"index": i})
+        await watcher.get()
+
+    replayed = await drain(hub.subscribe(replay=True), 4)
+    assert [(event.agent, event.data["index"]) for event in replayed] == [
+        ("Alice", 1),
+        ("Bob", 1),
+        ("Alice", 2),
+        ("Bob", 2),
+    ]
+
+    resumed = hub.subscribe(agent_name="Bob", last_event_id=replayed[-2].seq)
+    assert [event.data["index"] for event in await drain(resumed, 1)] == [2]
+    assert resumed.queue.empty()
+    hub.teardown()
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_drops_oldest_without_blocking():
+    hub = ActivityHub(subscriber_queue_size=2)
+    handle = FakeAgentHandle()
+    hub.register("Alice", handle)
+    slow = hub.subscribe()
+    fast = hub.subscribe()
+    for i in range(5):
+        handle.queue.put_nowait({"index": i})
+        await fast.get()
+
+    assert [event.data["index"] for event in await drain(slow, 2)] == [3, 4]
+    assert slow.dropped == 3
+    hub.teardown()
+
+
+@pytest.mark.asyncio
+async def test_ended_or_failed_streams_are_read_again():
+    hub = ActivityHub(reader_backoff_max=0.01)
+    handle = FakeAgentHandle(failures=1)
+    hub.register("Alice", handle)
+    watcher = hub.subscribe()
+    handle.queue.put_nowait({"index": 0})
+    handle.queue.put_nowait({"index": 1})
+    handle.queue.put_nowait(None)
+    handle.queue.put_nowait({"index": 2})
+
+    assert [event.data["index"] for event in await drain(watcher, 2)] == [1, 2]
+    assert handle.readers == 3
+    assert not hub.reader_tasks["Alice"].done()
+    hub.unregister("Alice")
+    assert "Alice" not in hub.reader_tasks
+    hub.teardown()
+
+
+def test_format_sse():
+    event = ActivityEvent(seq=7, agent="Alice", data={"type": "thought"})
+    frame = format_sse(event)
+    assert frame.startswith(b"id: 7\nevent: activity\ndata: ")
+    assert frame.endswith(b"\n\n")
+    assert codec.loads(frame.split(b"data: ")[1]) == {
+        "agent": "Alice",
+        "data": {"type": "thought"},
+    }
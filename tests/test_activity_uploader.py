@@ -0,0 +1,170 @@
+import asyncio
+import json
+
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from roster_agent_runtime.activity.hub import ActivityHub
+from roster_agent_runtime.activity.uploader import ActivityUploader
+from roster_agent_runtime.http_client import HttpClient
+
+
+class FakeActivityAPI:
+    def __init__(
+        self,
+        batch_supported: bool = True,
+        failures: int = 0,
+        failing_single: frozenset = frozenset(),
+    ):
+        self.batch_supported = batch_supported
+        self.failures = failures
+        # Indices of single-event requests which fail
+        self.failing_single = failing_single
+        self.single_requests = 0
+        self.batches: list[list] = []
+        self.encodings: list = []
+        self.single: list = []
+
+    async def batch(self, request: web.Request) -> web.Response:
+        if not self.batch_supported:
+            return web.Response(status=404)
+        if self.failures:
+            self.failures -= 1
+            return web.Response(status=503)
+        # aiohttp decompresses the request body according to Content-Encoding
+        self.encodings.append(request.headers.get("Content-Encoding"))
+        self.batches.append(json.loads(await request.read()))
+        return web.json_response({})
+
+    async def activity(self, request: web.Request) -> web.Response:
+        self.single_requests += 1
+        if self.single_requests - 1 in self.failing_single:
+            return web.Response(status=503)
+        self.single.append(json.loads(await request.read()))
+        return web.json_response({})
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/activities/batch", self.batch)
+        app.router.add_post("/activities", self.activity)
+        return app
+
+
+@pytest_asyncio.fixture
+async def uploader_factory():
+    servers, clients, uploaders = [], [], []
+
+    async def factory(api: FakeActivityAPI, **kwargs) -> ActivityUploader:
+        server = TestServer(api.app())
+        await server.start_server()
+        client = HttpClient(name="test-activity")
+        uploader = ActivityUploader(
+            url=str(server.make_url("/activities")),
+            batch_url=str(server.make_url("/activities/batch")),
+            http_client=client,
+            **kwargs,
+        )
+        uploader.backoff.initial = uploader.backoff.maximum = 0.01
+        uploader.setup()
+        servers.append(server)
+        clients.append(client)
+        uploaders.append(uploader)
+        return uploader
+
+    yield factory
+
+    for uploader in uploaders:
+        uploader.teardown()
+    for client in clients:
+        await client.teardown()
+    for server in servers:
+        await server.close()
+
+
+async def wait_for(condition, timeout: float = 2.0):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("Condition not met in time")
+
+
+@pytest.mark.asyncio
+async def test_events_are_uploaded_in_compressed_batches(uploader_factory):
+    api = FakeActivityAPI()
+    uploader = await uploader_factory(api, batch_size=100, flush_interval=0.05)
+    for i in range(250):
+        await uploader.push(f"agent-{i % 5}", {"type": "thought", "index": i})
+    await wait_for(lambda: sum(len(batch) for batch in api.batches) == 250)
+
+    assert len(api.batches) <= 4
+    assert "gzip" in api.encodings
+    # Per-agent order is preserved
+    for agent in range(5):
+        indices = [
+            event["index"]
+            for batch in api.batches
+            for event in batch
+            if event["index"] % 5 == agent
+        ]
+        assert indices == sorted(indices)
+
+
+@pytest.mark.asyncio
+async def test_full_agent_buffer_blocks_only_that_agent(uploader_factory):
+    api = FakeActivityAPI(failures=1000)
+    uploader = await uploader_factory(
+        api, batch_size=2, flush_interval=0.01, max_pending_per_agent=2
+    )
+    for i in range(4):
+        await uploader.push("chatty", {"index": i})
+    blocked = asyncio.create_task(uploader.push("chatty", {"index": 4}))
+    await asyncio.sleep(0.05)
+    assert not blocked.done()
+    await asyncio.wait_for(uploader.push("quiet", {"index": 0}), timeout=0.5)
+
+    api.failures = 0
+    await asyncio.wait_for(blocked, timeout=1)
+    await wait_for(lambda: sum(len(batch) for batch in api.batches) == 6)
+    assert uploader.upload_failures.value > 0
+
+
+@pytest.mark.asyncio
+async def test_falls_back_to_single_events(uploader_factory):
+    api = FakeActivityAPI(batch_supported=False)
+    uploader = await uploader_factory(api, flush_interval=0.01)
+    await uploader.push("Alice", {"index": 0})
+    await uploader.push("Alice", {"index": 1})
+    await wait_for(lambda: len(api.single) == 2)
+    assert uploader.batch_url is None
+    assert [event["index"] for event in api.single] == [0, 1]
+
+
+@pytest.mark.asyncio
+async def test_single_event_fallback_resends_only_failed_events(uploader_factory):
+    api = FakeActivityAPI(batch_supported=False, failing_single=frozenset({2}))
+    uploader = await uploader_factory(api, flush_interval=0.05)
+    for i in range(4):
+        await uploader.push("Alice", {"index": i})
+    await wait_for(lambda: len(api.single) == 4)
+    await asyncio.sleep(0.05)
+    assert [event["index"] for event in api.single] == [0, 1, 2, 3]
+    assert uploader.upload_failures.value > 0
+
+
+@pytest.mark.asyncio
+async def test_drained_queue_of_unregistered_agent_is_removed(uploader_factory):
+    api = FakeActivityAPI()
+    hub = ActivityHub()
+    uploader = await uploader_factory(api, flush_interval=0.01, activity_hub=hub)
+    # Stands in for a registered Agent's stream reader
+    hub.reader_tasks["Alice"] = asyncio.create_task(asyncio.sleep(10))
+    try:
+        await uploader.push("Alice", {"index": 0})
+        await uploader.push("Bob", {"index": 0})
+        await wait_for(lambda: sum(len(batch) for batch in api.batches) == 2)
+        await wait_for(lambda: "Bob" not in uploader._queues)
+        assert "Alice" in uploader._queues
+    finally:
+        hub.reader_tasks.pop("Alice").cancel()
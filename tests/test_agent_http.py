@@ -0,0 +1,346 @@
+import asyncio
+from unittest import mock
+
+import aiohttp
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from roster_agent_runtime import codec, errors, metrics, settings
+from roster_agent_runtime.agents.http import (
+    HttpAgentHandle,
+    create_agent_http_client,
+    iter_lines,
+)
+from roster_agent_runtime.agents.ws import AgentConnectionPool
+from roster_agent_runtime.http_client import HttpClient
+from roster_agent_runtime.models.conversation import ConversationMessage
+
+from .mock.ws_agent import MockWebSocketAgent
+
+# Well beyond aiohttp's default line limit (64KiB)
+LARGE_DATA = "x" * (1 << 20)
+
+
+async def chat(request: web.Request) -> web.Response:
+    payload = await request.json()
+    return web.json_response({"message": f"Hi {payload['identity']}"})
+
+
+async def slow_chat(request: web.Request) -> web.Response:
+    await asyncio.sleep(1)
+    return web.json_response({"message": "Too late"})
+
+
+async def failing_action(request: web.Request) -> web.Response:
+    return web.json_response({"detail": "Unknown action"}, status=400)
+
+
+async def message_stream(request: web.Request) -> web.StreamResponse:
+    resp = web.StreamResponse()
+    await resp.prepare(request)
+    message = {
+        "recipient": {"kind": "agent", "name": "Bob", "namespace": "default"},
+        "payload": {"value": LARGE_DATA},
+    }
+    body = codec.dumps(message) + b"\n\n" + b"not json\n" + codec.dumps(message)
+    # Uneven writes, so lines are split across chunks
+    for i in range(0, len(body), 4099):
+        await resp.write(body[i : i + 4099])
+    await resp.write_eof()
+    return resp
+
+
+@pytest_asyncio.fixture
+async def server():
+    app = web.Application()
+    app.router.add_post("/chat", chat)
+    app.router.add_post("/slow/chat", slow_chat)
+    app.router.add_post("/trigger-action", failing_action)
+    app.router.add_get("/message-stream", message_stream)
+    server = TestServer(app)
+    await server.start_server()
+    yield server
+    await server.close()
+
+
+@pytest_asyncio.fixture
+async def http_client():
+    client = HttpClient(
+        name="test-agents",
+        timeout=aiohttp.ClientTimeout(total=None, sock_read=0.2),
+    )
+    yield client
+    await client.teardown()
+
+
+def build_handle(server, http_client, path: str = "") -> HttpAgentHandle:
+    url = str(server.make_url(path)).rstrip("/")
+    return HttpAgentHandle.build("Alice", url, http_client=http_client)
+
+
+def chat_history() -> list[ConversationMessage]:
+    return [ConversationMessage(sender="user", message="Hello")]
+
+
+@pytest.mark.asyncio
+async def test_requests_share_pooled_connections(server, http_client):
+    latency = metrics.histogram(
+        "agent_http_request_seconds", labels={"call": "chat", "transport": "http"}
+    )
+    observed = latency.count
+
+    # Handles are rebuilt for every lookup, the executor's pool outlives them
+    for _ in range(3):
+        handle = build_handle(server, http_client)
+        reply = await handle.chat(
+            identity="Bob", team="Team", role="Role", chat_history=chat_history()
+        )
+        assert reply == "Hi Bob"
+
+    assert http_client.connections_created.value == 1
+    assert latency.count == observed + 3
+
+
+@pytest.mark.asyncio
+async def test_request_failures_are_classified(server, http_client):
+    handle = build_handle(server, http_client)
+    with pytest.raises(errors.AgentResponseError) as exc_info:
+        await handle.trigger_action(
+            step="step",
+            action="action",
+            inputs={},
+            role_context="",
+            record_id="record",
+            workflow="Workflow",
+        )
+    assert exc_info.value.status == 400
+
+    with pytest.raises(errors.AgentTimeoutError):
+        await build_handle(server, http_client, "/slow").chat(
+            identity="Bob", team="Team", role="Role", chat_history=chat_history()
+        )
+
+    await server.close()
+    with pytest.raises(errors.AgentConnectionError):
+        await handle.chat(
+            identity="Bob", team="Team", role="Role", chat_history=chat_history()
+        )
+
+
+@pytest.mark.asyncio
+async def test_message_stream_reads_large_lines(server, http_client):
+    handle = build_handle(server, http_client)
+
+    messages = [message async for message in handle.outgoing_message_stream()]
+
+    assert len(messages) == 2
+    assert all(message.payload["value"] == LARGE_DATA for message in messages)
+
+
+@pytest.mark.asyncio
+async def test_iter_lines_without_trailing_newline():
+    content = aiohttp.StreamReader(
+        protocol=mock.Mock(), limit=2**16, loop=asyncio.get_running_loop()
+    )
+    for chunk in (b"first\r\nsec", b"ond\n", b"\n  \n", b"last"):
+        content.feed_data(chunk)
+    content.feed_eof()
+
+    assert [line async for line in iter_lines(content)] == [
+        b"first",
+        b"second",
+        b"last",
+    ]
+
+
+@pytest_asyncio.fixture
+async def ws_agent():
+    agent = MockWebSocketAgent()
+    server = TestServer(agent.app())
+    await server.start_server()
+    agent.server = server
+    yield agent
+    await server.close()
+
+
+@pytest_asyncio.fixture
+async def connections(http_client):
+    pool = AgentConnectionPool(http_client, window=4)
+    yield pool
+    await pool.teardown()
+
+
+@pytest.mark.asyncio
+async def test_websocket_carries_requests_and_streams(
+    ws_agent, http_client, connections
+):
+    handle = HttpAgentHandle.build(
+        "Alice",
+        str(ws_agent.server.make_url("")).rstrip("/"),
+        http_client=http_client,
+        connections=connections,
+    )
+    activity = handle.activity_stream()
+    first = asyncio.create_task(activity.__anext__())
+    for i in range(20):
+        await ws_agent.emit("activity-stream", {"index": i})
+    events = [await first]
+
+    replies = await asyncio.gather(
+        *(
+            handle.chat(identity=f"Bob{i}", team="Team", role="Role", chat_history=[])
+            for i in range(10)
+        )
+    )
+    # The Agent holds back what the runtime has no room (credits) for
+    assert len(ws_agent.backlog["activity-stream"]) >= 20 - 1 - 4
+
+    events += [await activity.__anext__() for _ in range(19)]
+    await activity.aclose()
+
+    assert replies == [f"Hi Bob{i}" for i in range(10)]
+    assert [event["index"] for event in events] == list(range(20))
+    assert len(ws_agent.sockets) == 1
+    assert ws_agent.http_requests == 0
+
+
+@pytest.mark.asyncio
+async def test_websocket_reconnects(ws_agent, http_client, connections):
+    handle = HttpAgentHandle.build(
+        "Alice",
+        str(ws_agent.server.make_url("")).rstrip("/"),
+        http_client=http_client,
+        connections=connections,
+    )
+    connection = connections.get("Alice", handle.url)
+    connection.backoff.initial = 0.01
+    activity = handle.activity_stream()
+    await ws_agent.emit("activity-stream", {"index": 0})
+    assert (await activity.__anext__())["index"] == 0
+
+    await ws_agent.drop_connections()
+    await ws_agent.emit("activity-stream", {"index": 1})
+
+    # Subscribed again once reconnected, so the stream picks up where it was
+    assert (await asyncio.wait_for(activity.__anext__(), timeout=1))["index"] == 1
+    reply = await handle.chat(identity="Bob", team="Team", role="Role", chat_history=[])
+    await activity.aclose()
+
+    assert reply == "Hi Bob"
+    assert len(ws_agent.sockets) == 2
+
+
+@pytest.mark.asyncio
+async def test_agents_without_websocket_use_http(http_client, connections):
+    agent = MockWebSocketAgent()
+    server = TestServer(agent.app(websocket=False))
+    await server.start_server()
+    try:
+        handle = HttpAgentHandle.build(
+            "Alice",
+            str(server.make_url("")).rstrip("/"),
+            http_client=http_client,
+            connections=connections,
+        )
+        for _ in range(2):
+            reply = await handle.chat(
+                identity="Bob", team="Team", role="Role", chat_history=[]
+            )
+            assert reply == "Hi Bob"
+    finally:
+        await server.close()
+
+    assert agent.http_requests == 2
+    assert connections.get("Alice", handle.url).unsupported
+
+
+@pytest.mark.asyncio
+async def test_requests_dropped_before_sending_retry_over_http(
+    ws_agent, http_client, connections
+):
+    handle = HttpAgentHandle.build(
+        "Alice",
+        str(ws_agent.server.make_url("")).rstrip("/"),
+        http_client=http_client,
+        connections=connections,
+    )
+    connection = connections.get("Alice", handle.url)
+    wait_ready = connection.wait_ready
+
+    async def wait_ready_then_drop(timeout=None):
+        ready = await wait_ready(timeout=timeout)
+        # Closed after the readiness check, before the request goes out
+        await connection.ws.close()
+        return ready
+
+    connection.wait_ready = wait_ready_then_drop
+    reply = await handle.chat(identity="Bob", team="Team", role="Role", chat_history=[])
+
+    assert reply == "Hi Bob"
+    assert ws_agent.http_requests == 1
+
+
+class StalledWebSocketAgent(MockWebSocketAgent):
+    # Accepts the TCP connection, but never completes the WebSocket handshake
+    def __init__(self):
+        super().__init__()
+        self.release = asyncio.Event()
+
+    async def handle_ws(self, request: web.Request) -> web.WebSocketResponse:
+        await self.release.wait()
+        return await super().handle_ws(request)
+
+
+@pytest.mark.asyncio
+async def test_requests_use_http_until_websocket_connects(
+    http_client, connections, monkeypatch
+):
+    monkeypatch.setattr(settings, "AGENT_HTTP_CONNECT_TIMEOUT", 0.05)
+    agent = StalledWebSocketAgent()
+    server = TestServer(agent.app())
+    await server.start_server()
+    try:
+        handle = HttpAgentHandle.build(
+            "Alice",
+            str(server.make_url("")).rstrip("/"),
+            http_client=http_client,
+            connections=connections,
+        )
+        reply = await handle.chat(
+            identity="Bob", team="Team", role="Role", chat_history=[]
+        )
+        assert reply == "Hi Bob"
+        assert agent.http_requests == 1
+    finally:
+        await connections.teardown()
+        agent.release.set()
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_unix_socket_transport(tmp_path):
+    agent = MockWebSocketAgent()
+    runner = web.AppRunner(agent.app())
+    await runner.setup()
+    socket_path = str(tmp_path / "agent.sock")
+    await web.UnixSite(runner, socket_path).start()
+    client = create_agent_http_client("test-socket", socket_path=socket_path)
+    connections = AgentConnectionPool(client)
+    try:
+        for pool in (None, connections):
+            handle = HttpAgentHandle.build(
+                "Alice", "http://agent", http_client=client, connections=pool
+            )
+            reply = await handle.chat(
+                identity="Bob", team="Team", role="Role", chat_history=[]
+            )
+            assert reply == "Hi Bob"
+    finally:
+        await connections.teardown()
+        await client.teardown()
+        await runner.cleanup()
+
+    # One request over HTTP, then one over a WebSocket, both through the socket
+    assert agent.http_requests == 1
+    assert len(agent.sockets) == 1
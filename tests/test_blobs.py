@@ -0,0 +1,61 @@
+import os
+import time
+
+import pytest
+from roster_agent_runtime.blobs import BlobNotFoundError, LocalBlobStore
+from roster_agent_runtime.models.messaging import BlobReference
+
+
+@pytest.mark.asyncio
+async def test_blobs_round_trip_and_are_deduplicated(tmp_path):
+    store = LocalBlobStore(str(tmp_path), store_id="test")
+    reference = await store.put(b"contents")
+    assert reference == BlobReference(
+        store="test", key=LocalBlobStore.key_for(b"contents"), size=8
+    )
+    assert await store.put(b"contents") == reference
+    assert await store.get(reference) == b"contents"
+    assert sum(len(files) for _, _, files in os.walk(tmp_path)) == 1
+
+
+@pytest.mark.asyncio
+async def test_unused_blobs_are_swept(tmp_path):
+    store = LocalBlobStore(str(tmp_path), store_id="test")
+    old = await store.put(b"old")
+    recent = await store.put(b"recent")
+    an_hour_ago = time.time() - 3600
+    os.utime(store._path(old.key), (an_hour_ago, an_hour_ago))
+
+    assert await store.sweep(max_age=60) == 1
+    with pytest.raises(BlobNotFoundError):
+        await store.get(old)
+    assert await store.get(recent) == b"recent"
+
+
+@pytest.mark.asyncio
+async def test_pinned_blobs_are_not_swept(tmp_path):
+    store = LocalBlobStore(str(tmp_path), store_id="test")
+    reference = await store.put(b"pinned")
+    await store.pin(reference, "first")
+    await store.pin(reference, "second")
+    an_hour_ago = time.time() - 3600
+    os.utime(store._path(reference.key), (an_hour_ago, an_hour_ago))
+
+    assert await store.sweep(max_age=60) == 0
+    await store.unpin(reference, "first")
+    os.utime(store._path(reference.key), (an_hour_ago, an_hour_ago))
+    assert await store.sweep(max_age=60) == 0
+
+    # Kept for another TTL once the last pin is gone
+    await store.unpin(reference, "second")
+    assert await store.sweep(max_age=60) == 0
+    assert await store.get(reference) == b"pinned"
+    assert await store.sweep(max_age=0) == 1
+
+
+@pytest.mark.asyncio
+async def test_references_to_other_stores_are_not_found(tmp_path):
+    store = LocalBlobStore(str(tmp_path), store_id="test")
+    reference = await store.put(b"contents")
+    with pytest.raises(BlobNotFoundError):
+        await store.get(reference.copy(update={"store": "other"}))
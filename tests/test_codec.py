@@ -0,0 +1,53 @@
+import json
+
+import pytest
+from roster_agent_runtime import codec
+
+
+def test_round_trip_is_bytes():
+    message = {"kind": "tool_response", "data": {"files": ["a", "b"]}}
+    encoded = codec.dumps(message)
+    assert isinstance(encoded, bytes)
+    assert codec.loads(encoded) == message
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        json.dumps(json.dumps({"event_type": "PUT"})).encode(),
+        json.dumps({"event_type": "PUT"}).encode(),
+    ],
+)
+def test_loads_nested_accepts_single_and_double_encoding(line):
+    assert codec.loads_nested(line) == {"event_type": "PUT"}
+
+
+def test_decode_error_is_backend_agnostic():
+    with pytest.raises(codec.DecodeError):
+        codec.loads(b"{not json")
+    with pytest.raises(ValueError):
+        codec.loads_nested(json.dumps("{not json").encode())
+
+
+@pytest.mark.parametrize(
+    "backend",
+    [
+        pytest.param(
+            name,
+            marks=pytest.mark.skipif(module is None, reason=f"{name} is not installed"),
+        )
+        for name, module in (
+            ("orjson", codec.orjson),
+            ("msgspec", codec.msgspec),
+            ("json", json),
+        )
+    ],
+)
+@pytest.mark.parametrize("buffer", [bytes, bytearray, memoryview])
+def test_every_backend_decodes_buffers(backend, buffer):
+    dumps, loads = codec._make_codec(backend)
+    assert loads(buffer(dumps({"index": 0}))) == {"index": 0}
+    with pytest.raises(codec.DecodeError):
+        loads(buffer(b"{not json"))
+    with pytest.raises(codec.DecodeError):
+        loads(buffer(b'"\xff"'))
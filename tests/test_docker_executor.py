@@ -0,0 +1,64 @@
+import pytest
+from roster_agent_runtime import metrics
+from roster_agent_runtime.executors import docker as docker_executor
+from roster_agent_runtime.http_client import HttpClient
+from roster_agent_runtime.models.records import (
+    AgentContainerRecord,
+    AgentStatusRecord,
+)
+
+
+class FakeContainer:
+    def stop(self):
+        pass
+
+    def remove(self):
+        pass
+
+
+class FakeContainers:
+    def get(self, container_id: str):
+        return FakeContainer()
+
+
+class FakeDockerClient:
+    containers = FakeContainers()
+
+
+class FakeActivityHub:
+    def unregister(self, name: str):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_deleted_agent_socket_client_leaves_the_registry(monkeypatch, tmp_path):
+    monkeypatch.setattr(docker_executor.docker, "from_env", FakeDockerClient)
+    monkeypatch.setattr(
+        docker_executor.settings, "DOCKER_AGENT_SOCKET_DIR", str(tmp_path)
+    )
+    executor = docker_executor.DockerAgentExecutor(
+        http_client=HttpClient(name="test-docker"),
+        activity_hub=FakeActivityHub(),
+        agent_http_client=HttpClient(name="test-docker-agents"),
+    )
+    executor.store.put_agent(
+        AgentStatusRecord(
+            name="Alice",
+            executor="docker",
+            status="running",
+            container=AgentContainerRecord(
+                id="abc",
+                name="alice",
+                image="alice:latest",
+                status="running",
+                labels=((executor.ROSTER_SOCKET_LABEL, str(tmp_path / "agent.sock")),),
+            ),
+        )
+    )
+
+    _, client = executor._get_agent_endpoint("Alice")
+    assert any(client.name in key for key in metrics.REGISTRY.metrics)
+
+    await executor.delete_agent("Alice")
+    assert executor.agent_socket_clients == {}
+    assert not any(client.name in key for key in metrics.REGISTRY.metrics)
@@ -0,0 +1,28 @@
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from roster_agent_runtime.http_client import HttpClient
+
+
+@pytest.mark.asyncio
+async def test_http_client_reuses_connections():
+    async def ok(request: web.Request) -> web.Response:
+        return web.json_response({"ok": True})
+
+    app = web.Application()
+    app.router.add_get("/ok", ok)
+    server = TestServer(app)
+    await server.start_server()
+    client = HttpClient(name="test-reuse")
+    try:
+        for _ in range(3):
+            async with client.get(str(server.make_url("/ok"))) as resp:
+                assert await resp.json() == {"ok": True}
+        assert client.requests.value == 3
+        assert client.connections_created.value == 1
+        assert client.connections_reused.value == 2
+        assert client.stats()["idle"] == 1
+    finally:
+        await client.teardown()
+        await server.close()
+    assert client.stats()["idle"] == 0
@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+from roster_agent_runtime.messaging.idempotency import IdempotencyCache
+
+
+class Handler:
+    def __init__(self, fail: bool = False):
+        self.calls = 0
+        self.fail = fail
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if self.fail:
+            # Only the first call fails
+            self.fail = False
+            raise RuntimeError("failed")
+
+
+@pytest.mark.asyncio
+async def test_handled_keys_are_suppressed_until_they_expire():
+    cache = IdempotencyCache(max_size=10, ttl=0.05)
+    handler = Handler()
+    assert await cache.run_once("a", handler)
+    assert not await cache.run_once("a", handler)
+    assert handler.calls == 1
+
+    await asyncio.sleep(0.06)
+    assert await cache.run_once("a", handler)
+    assert handler.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_duplicates_wait_for_the_original():
+    cache = IdempotencyCache(max_size=10, ttl=60)
+    handler = Handler(fail=True)
+    handler.release.clear()
+    original = asyncio.create_task(cache.run_once("a", handler))
+    duplicate = asyncio.create_task(cache.run_once("a", handler))
+    await asyncio.sleep(0.01)
+    assert handler.calls == 1
+
+    # The original failed, so the duplicate is handled instead
+    handler.release.set()
+    with pytest.raises(RuntimeError):
+        await original
+    assert await duplicate
+    assert handler.calls == 2
+    assert not await cache.run_once("a", handler)
+
+
+@pytest.mark.asyncio
+async def test_least_recently_handled_keys_are_evicted():
+    cache = IdempotencyCache(max_size=2, ttl=60)
+    handler = Handler()
+    for key in ("a", "b", "c"):
+        await cache.run_once(key, handler)
+    assert list(cache.handled) == ["b", "c"]
+
+
+@pytest.mark.asyncio
+async def test_handled_keys_survive_reopen(tmp_path):
+    path = str(tmp_path / "idempotency.log")
+    cache = IdempotencyCache(max_size=10, ttl=60, path=path)
+    cache.open()
+    await cache.run_once(IdempotencyCache.key("queue", "id"), Handler())
+    cache.close()
+
+    cache = IdempotencyCache(max_size=10, ttl=60, path=path)
+    cache.open()
+    handler = Handler()
+    assert not await cache.run_once(IdempotencyCache.key("queue", "id"), handler)
+    assert handler.calls == 0
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_log_is_compacted_while_running(tmp_path):
+    path = str(tmp_path / "idempotency.log")
+    cache = IdempotencyCache(max_size=2, ttl=60, path=path, compact_ratio=2)
+    cache.open()
+    for i in range(20):
+        await cache.run_once(IdempotencyCache.key("queue", str(i)), Handler())
+        with open(path, "rb") as f:
+            assert len(f.readlines()) <= 4
+    cache.close()
+
+    cache = IdempotencyCache(max_size=2, ttl=60, path=path)
+    cache.open()
+    assert list(cache.handled) == [
+        IdempotencyCache.key("queue", "18"),
+        IdempotencyCache.key("queue", "19"),
+    ]
+    cache.close()
@@ -0,0 +1,137 @@
+import asyncio
+import json
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from roster_agent_runtime.http_client import HttpClient
+from roster_agent_runtime.informers.events.spec import PutResourceEvent, Resource
+from roster_agent_runtime.informers.roster import RosterAPIURLConfig, RosterInformer
+from roster_agent_runtime.util.backoff import Backoff
+
+
+def agent_spec(name: str) -> dict:
+    return {"name": name, "executor": "local", "image": "web_developer"}
+
+
+def agent_resource(name: str) -> dict:
+    return {
+        "spec": agent_spec(name),
+        "status": {"name": name, "executor": "local", "status": "running"},
+    }
+
+
+def encode_event(event: dict) -> bytes:
+    # The Roster API double-encodes events on the stream
+    return (json.dumps(json.dumps(event)) + "\n").encode()
+
+
+class FakeRosterAPI:
+    def __init__(self):
+        self.agents = {"Alice": agent_resource("Alice")}
+        self.watch_requests: list[dict] = []
+        self.listed = asyncio.Event()
+
+    async def list_agents(self, request: web.Request) -> web.Response:
+        self.listed.set()
+        return web.json_response(list(self.agents.values()))
+
+    async def stream_events(self, request: web.Request) -> web.StreamResponse:
+        self.watch_requests.append(dict(request.query))
+        if "resource_version" in request.query:
+            # Resume point is too old, client must relist
+            return web.Response(status=410)
+
+        response = web.StreamResponse()
+        await response.prepare(request)
+        if len(self.watch_requests) == 1:
+            await self.listed.wait()
+            # Bob is created, then the stream drops. While disconnected,
+            # Alice is deleted without the informer seeing the event.
+            self.agents["Bob"] = agent_resource("Bob")
+            await response.write(
+                encode_event(
+                    {
+                        "event_type": "PUT",
+                        "resource_type": "AGENT",
+                        "name": "Bob",
+                        "resource": {"spec": agent_spec("Bob")},
+                        "resource_version": "2",
+                    }
+                )
+            )
+            self.agents.pop("Alice")
+            return response
+        await asyncio.sleep(3600)
+        return response
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/agents", self.list_agents)
+        app.router.add_get("/resource-events", self.stream_events)
+        return app
+
+
+@pytest.mark.asyncio
+async def test_informer_relists_after_expired_resume():
+    api = FakeRosterAPI()
+    server = TestServer(api.app())
+    await server.start_server()
+    http_client = HttpClient(name="test")
+    informer = RosterInformer(
+        url_config=RosterAPIURLConfig(
+            agents_url=str(server.make_url("/agents")),
+            events_url=str(server.make_url("/resource-events")),
+        ),
+        http_client=http_client,
+    )
+    informer.roster_listener.backoff = Backoff(initial=0.01, maximum=0.01)
+    received = []
+    informer.add_event_listener(received.append)
+    try:
+        await informer.setup()
+        for _ in range(100):
+            if len(api.watch_requests) >= 3 and "Alice" not in informer.agents:
+                break
+            await asyncio.sleep(0.02)
+    finally:
+        await informer.teardown()
+        await http_client.teardown()
+        await server.close()
+
+    assert api.watch_requests[1] == {
+        **api.watch_requests[0],
+        "resource_version": "2",
+    }
+    assert "resource_version" not in api.watch_requests[2]
+    assert set(informer.agents) == {"Bob"}
+    # Initial sync, watched event, then the deletion missed while disconnected
+    assert [(event.event_type, event.name) for event in received] == [
+        ("PUT", "Alice"),
+        ("PUT", "Bob"),
+        ("DELETE", "Alice"),
+    ]
+
+
+def test_events_older_than_the_snapshot_are_dropped():
+    informer = RosterInformer(
+        url_config=RosterAPIURLConfig(agents_url="", events_url=""),
+        http_client=HttpClient(name="test-stale"),
+    )
+    received = []
+    informer.add_event_listener(received.append)
+    informer.resource_version = "5"
+
+    for version in ("3", "5", "6"):
+        informer._handle_spec_event(
+            PutResourceEvent(
+                resource_type="AGENT",
+                name=f"Agent{version}",
+                resource=Resource(spec=agent_spec(f"Agent{version}")),
+                resource_version=version,
+            )
+        )
+
+    assert informer.resource_version == "6"
+    assert [event.name for event in received] == ["Agent6"]
+    assert set(informer.agents) == {"Agent6"}
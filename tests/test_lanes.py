@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+from roster_agent_runtime.messaging.lanes import (
+    Lane,
+    LaneQueue,
+    LaneScheduler,
+    WeightedRoundRobin,
+    lane_for,
+)
+
+WEIGHTS = {Lane.RESPONSE: 3, Lane.DEFAULT: 1}
+
+
+def test_messages_are_assigned_lanes_by_kind():
+    assert lane_for({"kind": "tool_response"}) == Lane.RESPONSE
+    assert lane_for({"kind": "trigger_action"}) == Lane.DEFAULT
+    assert lane_for("not a message") == Lane.DEFAULT
+
+
+def test_lanes_are_picked_in_proportion_to_weight():
+    round_robin = WeightedRoundRobin(WEIGHTS)
+    picks = [round_robin.pick([Lane.RESPONSE, Lane.DEFAULT]) for _ in range(8)]
+    assert picks.count(Lane.RESPONSE) == 6
+    assert picks.count(Lane.DEFAULT) == 2
+    # Only lanes with work are picked
+    assert round_robin.pick([Lane.DEFAULT]) == Lane.DEFAULT
+
+
+@pytest.mark.asyncio
+async def test_waiting_responses_are_admitted_before_triggers():
+    scheduler = LaneScheduler(max_in_flight=1, weights=WEIGHTS)
+    admitted = []
+
+    async def handle(name: str, lane: str):
+        async with scheduler.slot(lane):
+            admitted.append(name)
+            await asyncio.sleep(0)
+
+    await scheduler.acquire(Lane.DEFAULT)
+    tasks = [
+        asyncio.create_task(handle(f"trigger-{i}", Lane.DEFAULT)) for i in range(3)
+    ] + [asyncio.create_task(handle(f"response-{i}", Lane.RESPONSE)) for i in range(3)]
+    await asyncio.sleep(0)
+    scheduler.release()
+    await asyncio.gather(*tasks)
+    assert admitted == [
+        "response-0",
+        "response-1",
+        "trigger-0",
+        "response-2",
+        "trigger-1",
+        "trigger-2",
+    ]
+    assert scheduler.available == 1
+
+
+@pytest.mark.asyncio
+async def test_lane_queue_reads_by_weight():
+    queue = LaneQueue(max_size=10, weights=WEIGHTS)
+    for i in range(2):
+        await queue.put(Lane.DEFAULT, f"trigger-{i}")
+    for i in range(2):
+        await queue.put(Lane.RESPONSE, f"response-{i}")
+    assert [await queue.get() for _ in range(4)] == [
+        "response-0",
+        "response-1",
+        "trigger-0",
+        "trigger-1",
+    ]
+    assert queue.empty()
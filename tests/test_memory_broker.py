@@ -0,0 +1,153 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+from roster_agent_runtime.messaging.base import MessageRejected, PublishError
+from roster_agent_runtime.messaging.memory import InMemoryBroker
+
+
+@pytest_asyncio.fixture
+async def broker():
+    broker = InMemoryBroker(max_queue_size=4, max_in_flight=2, retry_delays=[0.01])
+    await broker.setup()
+    yield broker
+    await broker.teardown()
+
+
+async def wait_for(condition, timeout: float = 2.0):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("Condition not met in time")
+
+
+@pytest.mark.asyncio
+async def test_messages_are_delivered_as_copies(broker):
+    received = []
+
+    async def callback(payload: dict):
+        received.append(payload)
+
+    await broker.register_callback("queue", callback)
+    message = {"kind": "tool_response", "data": {"index": 0}}
+    await broker.publish_json("queue", message)
+    await wait_for(lambda: received == [message])
+    assert received[0] is not message
+
+
+@pytest.mark.asyncio
+async def test_in_flight_deliveries_are_bounded(broker):
+    in_flight, peak, handled = 0, 0, 0
+
+    async def slow_callback(payload: dict):
+        nonlocal in_flight, peak, handled
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        handled += 1
+
+    await broker.register_callback("queue", slow_callback)
+    for i in range(4):
+        await broker.publish_json("queue", {"index": i})
+    await wait_for(lambda: handled == 4)
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_messages_wait_for_a_consumer(broker):
+    received = []
+
+    async def callback(payload: dict):
+        received.append(payload["index"])
+
+    await broker.register_callback("queue", callback)
+    await broker.deregister_callback("queue", callback)
+    for i in range(4):
+        await broker.publish_json("queue", {"index": i})
+    # The queue is bounded, further publishes are rejected
+    with pytest.raises(PublishError):
+        await broker.publish_json("queue", {"index": 4})
+
+    await broker.register_callback("queue", callback)
+    await wait_for(lambda: sorted(received) == [0, 1, 2, 3])
+
+
+@pytest.mark.asyncio
+async def test_failed_messages_are_retried_then_dead_lettered(broker):
+    attempts = []
+
+    async def callback(payload: dict):
+        attempts.append(payload["index"])
+        if payload["index"] == 0:
+            raise ConnectionError("Agent is unavailable")
+        raise MessageRejected("Malformed")
+
+    await broker.register_callback("queue", callback)
+    await broker.publish_json("queue", {"index": 0})
+    await broker.publish_json("queue", {"index": 1})
+    await wait_for(lambda: len(broker.dead_letters) == 2)
+    assert sorted(attempts) == [0, 0, 1]
+
+    dead_letters = await broker.list_dead_letters()
+    assert sorted(d.attempts for d in dead_letters) == [1, 2]
+    assert await broker.replay_dead_letters() == 2
+    await wait_for(lambda: len(attempts) == 5)
+
+
+@pytest.mark.asyncio
+async def test_a_failed_callback_retries_the_message_for_every_callback(broker):
+    # Callbacks sharing a queue must therefore be idempotent
+    first, second = [], []
+
+    async def flaky(payload: dict):
+        first.append(payload["index"])
+        if len(first) == 1:
+            raise ConnectionError("Agent is unavailable")
+
+    async def steady(payload: dict):
+        second.append(payload["index"])
+
+    await broker.register_callback("queue", flaky)
+    await broker.register_callback("queue", steady)
+    await broker.publish_json("queue", {"index": 0})
+    await wait_for(lambda: len(first) == 2)
+    await wait_for(lambda: len(second) == 2)
+    assert second == [0, 0]
+    assert not broker.dead_letters
+
+
+@pytest.mark.asyncio
+async def test_dead_letters_are_replayed_a_page_at_a_time(broker):
+    async def reject(payload: dict):
+        raise MessageRejected("Malformed")
+
+    await broker.register_callback("queue", reject)
+    for i in range(3):
+        await broker.publish_json("queue", {"index": i})
+    await wait_for(lambda: len(broker.dead_letters) == 3)
+    await broker.deregister_callback("queue", reject)
+
+    assert await broker.replay_dead_letters(limit=2) == 2
+    assert [d.payload["index"] for d in await broker.list_dead_letters()] == [2]
+    assert await broker.replay_dead_letters(limit=2) == 1
+    assert not broker.dead_letters
+
+
+@pytest.mark.asyncio
+async def test_dead_letters_past_the_first_page_are_replayed_by_id(broker):
+    async def reject(payload: dict):
+        raise MessageRejected("Malformed")
+
+    await broker.register_callback("queue", reject)
+    for i in range(3):
+        await broker.publish_json("queue", {"index": i})
+    await wait_for(lambda: len(broker.dead_letters) == 3)
+    await broker.deregister_callback("queue", reject)
+
+    [last] = await broker.list_dead_letters(limit=1, offset=2)
+    assert last.payload["index"] == 2
+    assert await broker.replay_dead_letters(ids=[last.id]) == 1
+    assert await broker.replay_dead_letters(limit=1, offset=1) == 1
+    assert [d.payload["index"] for d in await broker.list_dead_letters()] == [0]
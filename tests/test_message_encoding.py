@@ -0,0 +1,50 @@
+import gzip
+
+import pytest
+from roster_agent_runtime import codec
+from roster_agent_runtime.messaging import encoding
+
+MESSAGE = {"kind": "tool_response", "data": {"files": ["print('hello')\n" * 100]}}
+
+
+def test_json_peers_get_uncompressed_json():
+    body, content_type, content_encoding = encoding.encode(
+        MESSAGE, accept=frozenset(), compression_min_bytes=0
+    )
+    assert content_encoding is None
+    assert codec.loads(body) == MESSAGE
+    # Messages without content properties (older peers) are JSON
+    assert encoding.decode(body, None, None) == MESSAGE
+
+
+def test_large_messages_are_compressed_for_peers_which_accept_it():
+    body, content_type, content_encoding = encoding.encode(
+        MESSAGE, accept=frozenset({"gzip"}), compression_min_bytes=1024
+    )
+    assert content_encoding == "gzip"
+    assert len(body) < len(codec.dumps(MESSAGE)) / 10
+    assert encoding.decode(body, content_type, content_encoding) == MESSAGE
+
+    small = {"kind": "tool_response"}
+    _, _, content_encoding = encoding.encode(
+        small, accept=frozenset({"gzip"}), compression_min_bytes=1024
+    )
+    assert content_encoding is None
+
+
+def test_unsupported_encodings_fail_to_decode():
+    with pytest.raises(codec.DecodeError):
+        encoding.decode(gzip.compress(b"{}"), None, "br")
+    with pytest.raises(codec.DecodeError):
+        encoding.decode(b"not gzip", None, "gzip")
+
+
+def test_peer_capabilities_expire():
+    peers = encoding.PeerCapabilities(ttl=0, max_size=10)
+    peers.learn("queue", b"msgpack,gzip")
+    assert peers.get("queue") == frozenset()
+    peers = encoding.PeerCapabilities(ttl=60, max_size=1)
+    peers.learn("queue-a", "gzip")
+    peers.learn("queue-b", "zstd, gzip")
+    assert peers.get("queue-a") == frozenset()
+    assert peers.get("queue-b") == frozenset({"zstd", "gzip"})
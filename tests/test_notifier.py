@@ -0,0 +1,176 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from roster_agent_runtime import codec
+from roster_agent_runtime.controllers.events.status import (
+    ControllerStatusEvent,
+    EventType,
+    Resource,
+)
+from roster_agent_runtime.http_client import HttpClient
+from roster_agent_runtime.models.records import AgentStatusRecord
+from roster_agent_runtime.notifier import RosterNotifier
+from roster_agent_runtime.outbox import Outbox
+
+
+def status_event(name: str, status: str) -> ControllerStatusEvent:
+    return ControllerStatusEvent(
+        resource_type=Resource.AGENT,
+        event_type=EventType.PUT,
+        name=name,
+        status=AgentStatusRecord(name=name, executor="docker", status=status),
+    )
+
+
+class FakeStatusAPI:
+    def __init__(self, batch_supported: bool = True, failures: int = 0):
+        self.batch_supported = batch_supported
+        self.failures = failures
+        self.requests: list = []
+
+    async def batch(self, request: web.Request) -> web.Response:
+        if not self.batch_supported:
+            return web.Response(status=404)
+        if self.failures:
+            self.failures -= 1
+            return web.Response(status=503)
+        self.requests.append(await request.json())
+        return web.json_response({})
+
+    async def single(self, request: web.Request) -> web.Response:
+        self.requests.append(await request.json())
+        return web.json_response({})
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/status-updates", self.batch)
+        app.router.add_post("/status-update", self.single)
+        return app
+
+
+@pytest_asyncio.fixture
+async def notifier_factory():
+    servers, clients, notifiers = [], [], []
+
+    async def factory(api: FakeStatusAPI, **kwargs) -> RosterNotifier:
+        server = TestServer(api.app())
+        await server.start_server()
+        client = HttpClient(name="test-notifier")
+        notifier = RosterNotifier(
+            url=str(server.make_url("/status-update")),
+            batch_url=str(server.make_url("/status-updates")),
+            http_client=client,
+            **kwargs,
+        )
+        notifier.backoff.initial = notifier.backoff.maximum = 0.01
+        notifier.setup()
+        servers.append(server)
+        clients.append(client)
+        notifiers.append(notifier)
+        return notifier
+
+    yield factory
+
+    for notifier in notifiers:
+        notifier.teardown()
+    for client in clients:
+        await client.teardown()
+    for server in servers:
+        await server.close()
+
+
+async def wait_until_drained(notifier: RosterNotifier):
+    for _ in range(200):
+        if not notifier._pending:
+            break
+        await asyncio.sleep(0.01)
+    # Let the in-flight request complete
+    await asyncio.sleep(0.05)
+
+
+@pytest.mark.asyncio
+async def test_flapping_agents_are_coalesced(notifier_factory):
+    api = FakeStatusAPI()
+    notifier = await notifier_factory(api, batch_size=500, flush_interval=0.05)
+    for status in ["created", "running", "exited", "restarting", "running"]:
+        for i in range(1000):
+            notifier.push_event(status_event(f"agent-{i}", status))
+    await wait_until_drained(notifier)
+
+    assert len(api.requests) <= 4
+    delivered = {event["name"]: event for batch in api.requests for event in batch}
+    assert len(delivered) == 1000
+    assert all(event["status"]["status"] == "running" for event in delivered.values())
+
+
+@pytest.mark.asyncio
+async def test_failed_batches_are_retried(notifier_factory):
+    api = FakeStatusAPI(failures=2)
+    notifier = await notifier_factory(api, flush_interval=0.01)
+    notifier.push_event(status_event("Alice", "running"))
+    await wait_until_drained(notifier)
+    assert [event["name"] for batch in api.requests for event in batch] == ["Alice"]
+    assert notifier.send_failures.value >= 2
+
+
+@pytest.mark.asyncio
+async def test_falls_back_to_single_events(notifier_factory):
+    api = FakeStatusAPI(batch_supported=False)
+    notifier = await notifier_factory(api, flush_interval=0.01)
+    notifier.push_event(status_event("Alice", "running"))
+    notifier.push_event(status_event("Bob", "running"))
+    await wait_until_drained(notifier)
+    assert notifier.batch_url is None
+    assert sorted(event["name"] for event in api.requests) == ["Alice", "Bob"]
+
+
+@pytest.mark.asyncio
+async def test_overflow_drops_oldest(notifier_factory):
+    api = FakeStatusAPI()
+    notifier = await notifier_factory(api, max_pending=2, flush_interval=10)
+    for name in ["Alice", "Bob", "Carol"]:
+        notifier.push_event(status_event(name, "running"))
+    assert [name for _, name in notifier._pending] == ["Bob", "Carol"]
+
+
+@pytest.mark.asyncio
+async def test_outbox_delivers_events_after_outage(notifier_factory, tmp_path):
+    api = FakeStatusAPI(failures=3)
+    notifier = await notifier_factory(
+        api, flush_interval=0.01, outbox=Outbox(str(tmp_path), name="test-notifier")
+    )
+    notifier.outbox_relay.backoff.initial = notifier.outbox_relay.backoff.maximum = 0.01
+    notifier.push_event(status_event("Alice", "running"))
+    notifier.push_event(status_event("Bob", "running"))
+    for _ in range(200):
+        if api.requests:
+            break
+        await asyncio.sleep(0.01)
+    assert [event["name"] for batch in api.requests for event in batch] == [
+        "Alice",
+        "Bob",
+    ]
+    assert notifier.outbox_relay.failures.value == 3
+
+
+@pytest.mark.asyncio
+async def test_pending_events_are_persisted_on_teardown(notifier_factory, tmp_path):
+    api = FakeStatusAPI()
+    notifier = await notifier_factory(
+        api,
+        flush_interval=10,
+        outbox=Outbox(str(tmp_path), name="test-notifier-teardown"),
+    )
+    notifier.push_event(status_event("Alice", "running"))
+    notifier.push_event(status_event("Bob", "running"))
+    notifier.teardown()
+
+    outbox = Outbox(str(tmp_path), name="test-notifier-teardown")
+    outbox.open()
+    records, _ = outbox.read_batch(10)
+    outbox.close()
+    assert [codec.loads(record)["name"] for record in records] == ["Alice", "Bob"]
+    assert not api.requests
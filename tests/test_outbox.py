@@ -0,0 +1,226 @@
+import asyncio
+import os
+import threading
+
+import pytest
+from roster_agent_runtime.outbox import (
+    Outbox,
+    OutboxRelay,
+    PartialDeliveryError,
+    Position,
+)
+
+
+def open_outbox(path, **kwargs) -> Outbox:
+    outbox = Outbox(str(path), **kwargs)
+    outbox.open()
+    return outbox
+
+
+def test_committed_position_survives_reopen(tmp_path):
+    outbox = open_outbox(tmp_path)
+    for i in range(5):
+        outbox.append(f"event-{i}".encode())
+    records, position = outbox.read_batch(3)
+    assert records == [b"event-0", b"event-1", b"event-2"]
+    outbox.commit(position)
+    outbox.close()
+
+    outbox = open_outbox(tmp_path)
+    records, _ = outbox.read_batch(10)
+    assert records == [b"event-3", b"event-4"]
+    outbox.close()
+
+
+def test_rewind_rereads_uncommitted_records(tmp_path):
+    outbox = open_outbox(tmp_path)
+    outbox.append(b"a")
+    outbox.append(b"b")
+    assert outbox.read_batch(10)[0] == [b"a", b"b"]
+    outbox.rewind()
+    assert outbox.read_batch(10)[0] == [b"a", b"b"]
+    outbox.close()
+
+
+def test_segments_rotate_and_are_deleted_once_delivered(tmp_path):
+    outbox = open_outbox(tmp_path, segment_bytes=64)
+    for i in range(20):
+        outbox.append(f"event-{i:02d}".encode())
+    assert len(outbox.segments) > 1
+
+    records, position = outbox.read_batch(100)
+    assert records == [f"event-{i:02d}".encode() for i in range(20)]
+    outbox.commit(position)
+    assert outbox.segments == [position.segment]
+    assert len(os.listdir(tmp_path)) == 2  # active segment + committed position
+    outbox.close()
+
+
+def test_torn_tail_is_truncated(tmp_path):
+    outbox = open_outbox(tmp_path)
+    outbox.append(b"complete")
+    outbox.close()
+    segment_path = outbox._segment_path(0)
+    with open(segment_path, "ab") as f:
+        # Header claims more bytes than were written before the "crash"
+        f.write(b"\x00\x00\x00\x10part")
+
+    outbox = open_outbox(tmp_path)
+    outbox.append(b"after")
+    assert outbox.read_batch(10)[0] == [b"complete", b"after"]
+    outbox.close()
+
+
+def test_oldest_segment_dropped_over_max_bytes(tmp_path):
+    outbox = open_outbox(tmp_path, segment_bytes=64, max_bytes=128)
+    for i in range(30):
+        outbox.append(f"event-{i:02d}".encode())
+    assert outbox.size_bytes() <= 128 + 64
+    assert outbox.dropped.value > 0
+    records, _ = outbox.read_batch(100)
+    assert records[-1] == b"event-29"
+    assert len(records) + outbox.dropped.value == 30
+    assert outbox.committed == Position(outbox.segments[0], 0)
+    outbox.close()
+
+
+@pytest.mark.asyncio
+async def test_relay_retries_until_delivered(tmp_path):
+    delivered: list[bytes] = []
+    failures = 2
+
+    async def deliver(records: list[bytes]):
+        nonlocal failures
+        if failures:
+            failures -= 1
+            raise ConnectionError("Roster API unavailable")
+        delivered.extend(records)
+
+    relay = OutboxRelay(Outbox(str(tmp_path)), deliver=deliver, poll_interval=0.01)
+    relay.backoff.initial = relay.backoff.maximum = 0.01
+    relay.start()
+    await relay.persist([f"event-{i}".encode() for i in range(3)])
+    for _ in range(100):
+        if len(delivered) == 3:
+            break
+        await asyncio.sleep(0.01)
+    relay.stop()
+
+    assert delivered == [b"event-0", b"event-1", b"event-2"]
+    assert relay.failures.value == 2
+    outbox = open_outbox(tmp_path)
+    assert outbox.read_batch(10)[0] == []
+    outbox.close()
+
+
+@pytest.mark.asyncio
+async def test_relay_commits_partial_delivery(tmp_path):
+    delivered: list[bytes] = []
+    failures = 1
+
+    async def deliver(records: list[bytes]):
+        nonlocal failures
+        for i, record in enumerate(records):
+            if failures and i == 2:
+                failures -= 1
+                raise PartialDeliveryError(i)
+            delivered.append(record)
+
+    outbox = Outbox(str(tmp_path), name="partial")
+    relay = OutboxRelay(outbox, deliver=deliver, poll_interval=0.01)
+    relay.backoff.initial = relay.backoff.maximum = 0.01
+    relay.start()
+    await relay.persist([f"event-{i}".encode() for i in range(4)])
+    for _ in range(100):
+        if len(delivered) >= 4:
+            break
+        await asyncio.sleep(0.01)
+    relay.stop()
+
+    assert delivered == [f"event-{i}".encode() for i in range(4)]
+    assert relay.delivered.value == 4
+
+
+@pytest.mark.asyncio
+async def test_relay_survives_segments_dropped_during_delivery(tmp_path):
+    delivered: list[bytes] = []
+    blocked = asyncio.Event()
+    release = asyncio.Event()
+
+    failures = 1
+
+    async def deliver(records: list[bytes]):
+        nonlocal failures
+        if not release.is_set():
+            blocked.set()
+            await release.wait()
+        elif failures:
+            # Rewinds to the position committed in the dropped segment
+            failures -= 1
+            raise ConnectionError("Roster API unavailable")
+        delivered.extend(records)
+
+    outbox = Outbox(str(tmp_path), segment_bytes=64, max_bytes=128, name="dropped")
+    relay = OutboxRelay(outbox, deliver=deliver, batch_size=2, poll_interval=0.01)
+    relay.backoff.initial = relay.backoff.maximum = 0.01
+    relay.start()
+    await relay.persist([b"event-00"])
+    await asyncio.wait_for(blocked.wait(), timeout=1)
+
+    # Drops the segment being delivered, the relay must carry on after it
+    await relay.persist([f"event-{i:02d}".encode() for i in range(1, 30)])
+    assert outbox.segments[0] > 0
+    release.set()
+    for _ in range(100):
+        if delivered and delivered[-1] == b"event-29":
+            break
+        await asyncio.sleep(0.01)
+    relay.stop()
+
+    assert delivered[-1] == b"event-29"
+    assert relay.failures.value == 1
+    assert outbox.size_bytes() <= 128
+
+
+class ThreadRecordingOutbox(Outbox):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.threads: set[threading.Thread] = set()
+
+    def append(self, record: bytes):
+        self.threads.add(threading.current_thread())
+        super().append(record)
+
+
+@pytest.mark.asyncio
+async def test_relay_writes_off_the_event_loop(tmp_path):
+    delivered: list[bytes] = []
+
+    async def deliver(records: list[bytes]):
+        delivered.extend(records)
+
+    outbox = ThreadRecordingOutbox(str(tmp_path), fsync=True, name="threaded")
+    relay = OutboxRelay(outbox, deliver=deliver, poll_interval=0.01)
+    relay.start()
+    await relay.persist([b"event-0", b"event-1"])
+    for _ in range(100):
+        if len(delivered) == 2:
+            break
+        await asyncio.sleep(0.01)
+    relay.stop(records=[b"event-2"])
+
+    assert delivered == [b"event-0", b"event-1"]
+    assert outbox.threads and threading.current_thread() not in outbox.threads
+    # Appended while stopping, for the next run to deliver
+    outbox = open_outbox(tmp_path)
+    assert outbox.read_batch(10)[0] == [b"event-2"]
+    outbox.close()
+
+
+def test_oversized_active_segment_is_bounded(tmp_path):
+    outbox = open_outbox(tmp_path, segment_bytes=1024, max_bytes=64)
+    for i in range(20):
+        outbox.append(f"event-{i:02d}".encode())
+    assert outbox.size_bytes() <= 64
+    assert outbox.read_batch(100)[0][-1] == b"event-19"
+    outbox.close()
@@ -0,0 +1,481 @@
+import asyncio
+import os
+import time
+
+import pytest
+import pytest_asyncio
+from roster_agent_runtime import codec
+from roster_agent_runtime.blobs import LocalBlobStore
+from roster_agent_runtime.messaging import rabbitmq
+from roster_agent_runtime.messaging.base import MessageRejected
+from roster_agent_runtime.messaging.rabbitmq import PublishError, RabbitMQClient
+from roster_agent_runtime.models.messaging import BlobReference
+
+from .mock.rabbitmq import MockBroker
+
+
+@pytest.fixture
+def broker(monkeypatch) -> MockBroker:
+    broker = MockBroker()
+    monkeypatch.setattr(rabbitmq, "connect", broker.connect)
+    return broker
+
+
+@pytest_asyncio.fixture
+async def rmq_client(broker):
+    client = RabbitMQClient(prefetch_count=4, max_in_flight=2)
+    await client.setup()
+    yield client
+    await client.teardown()
+
+
+async def wait_for(condition, timeout: float = 2.0):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("Condition not met in time")
+
+
+@pytest.mark.asyncio
+async def test_consumers_use_own_channel_with_prefetch(rmq_client, broker):
+    await rmq_client.register_callback("queue-a", lambda payload: None)
+    await rmq_client.register_callback(
+        "queue-b", lambda payload: None, prefetch_count=1
+    )
+    channels = {
+        name: consumer.channel for name, consumer in rmq_client.active_queues.items()
+    }
+    assert channels["queue-a"] is not channels["queue-b"]
+    assert channels["queue-a"].prefetch_count == 4
+    assert channels["queue-b"].prefetch_count == 1
+
+
+@pytest.mark.asyncio
+async def test_in_flight_handlers_are_bounded(rmq_client, broker):
+    in_flight, peak, handled = 0, 0, 0
+
+    async def slow_callback(payload: dict):
+        nonlocal in_flight, peak, handled
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        handled += 1
+
+    await rmq_client.register_callback("queue", slow_callback)
+    for i in range(10):
+        await rmq_client.publish_json("queue", {"index": i})
+    await wait_for(lambda: handled == 10)
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_slow_message_does_not_starve_others(rmq_client, broker):
+    release = asyncio.Event()
+    handled = []
+
+    async def callback(payload: dict):
+        if payload["kind"] == "trigger_action":
+            await release.wait()
+        handled.append(payload["kind"])
+
+    await rmq_client.register_callback("queue", callback)
+    await rmq_client.publish_json("queue", {"kind": "trigger_action"})
+    await rmq_client.publish_json("queue", {"kind": "tool_response"})
+    await wait_for(lambda: handled == ["tool_response"])
+    release.set()
+    await wait_for(lambda: handled == ["tool_response", "trigger_action"])
+
+
+@pytest.mark.asyncio
+async def test_deregistering_last_callback_closes_consumer(rmq_client, broker):
+    async def callback(payload: dict):
+        pass
+
+    await rmq_client.register_callback("queue", callback)
+    consumer = rmq_client.active_queues["queue"]
+    await rmq_client.deregister_callback("queue", callback)
+    assert "queue" not in rmq_client.active_queues
+    assert consumer.channel.is_closed
+    assert not broker.queues["queue"].consumers
+
+
+@pytest.mark.asyncio
+async def test_publishes_are_pipelined_within_window(broker):
+    broker.publish_latency = 0.05
+    client = RabbitMQClient(channel_pool_size=1, publish_window=8)
+    await client.setup()
+    start = asyncio.get_running_loop().time()
+    await client.publish_json_batch([("queue", {"index": i}) for i in range(32)])
+    elapsed = asyncio.get_running_loop().time() - start
+    await client.teardown()
+
+    assert broker.peak_outstanding == 8
+    # 4 windows of round trips, rather than 32 sequential ones
+    assert elapsed < 0.05 * 16
+    assert [codec.loads(body)["index"] for _, body in broker.published] == list(
+        range(32)
+    )
+
+
+@pytest.mark.asyncio
+async def test_unconfirmed_publishes_are_reported(rmq_client, broker):
+    broker.reject_routing_keys.add("missing")
+    failures = rmq_client.publisher.failures.value
+    with pytest.raises(PublishError):
+        await rmq_client.publish_json("missing", {"kind": "tool_response"})
+    with pytest.raises(PublishError):
+        await rmq_client.publish_json_batch(
+            [("queue", {"index": 0}), ("missing", {"index": 1})]
+        )
+
+    await rmq_client.publish_json("missing", {}, wait_for_confirm=False)
+    await rmq_client.publisher.wait_for_confirms()
+    assert rmq_client.publisher.failures.value == failures + 3
+
+
+@pytest_asyncio.fixture
+async def reconnecting_client(broker):
+    client = RabbitMQClient(disconnected_timeout=1)
+    client.backoff.initial = client.backoff.maximum = 0.01
+    await client.setup()
+    yield client
+    await client.teardown()
+
+
+@pytest.mark.asyncio
+async def test_consumers_are_restored_after_reconnect(reconnecting_client, broker):
+    started, release = asyncio.Event(), asyncio.Event()
+    handled = []
+
+    async def callback(payload: dict):
+        if payload["index"] == 0 and not release.is_set():
+            started.set()
+            await release.wait()
+            return
+        handled.append(payload["index"])
+
+    await reconnecting_client.register_callback("queue", callback)
+    await reconnecting_client.publish_json("queue", {"index": 0})
+    await asyncio.wait_for(started.wait(), timeout=1)
+    interrupted = reconnecting_client.interrupted_deliveries.value
+
+    broker.refuse_connections = 2
+    broker.drop_connections()
+    release.set()
+    await wait_for(lambda: "queue" in reconnecting_client.active_queues)
+    await reconnecting_client.publish_json("queue", {"index": 1})
+
+    # The unacknowledged message is redelivered to the restored consumer
+    await wait_for(lambda: sorted(handled) == [0, 1])
+    assert reconnecting_client.interrupted_deliveries.value == interrupted + 1
+    assert reconnecting_client.reconnect_seconds.value > 0
+
+
+@pytest.mark.asyncio
+async def test_publishes_wait_for_reconnect(reconnecting_client, broker):
+    broker.refuse_connections = 3
+    broker.drop_connections()
+    publish = asyncio.create_task(
+        reconnecting_client.publish_json("queue", {"index": 0})
+    )
+    await asyncio.wait_for(publish, timeout=1)
+    assert broker.published[-1] == ("queue", codec.dumps({"index": 0}))
+
+
+@pytest.mark.asyncio
+async def test_publishes_fail_fast_while_disconnected(broker):
+    client = RabbitMQClient(disconnected_policy="fail")
+    client.backoff.initial = client.backoff.maximum = 10
+    await client.setup()
+    broker.drop_connections()
+    with pytest.raises(PublishError):
+        await client.publish_json("queue", {"index": 0})
+    await client.teardown()
+
+
+@pytest_asyncio.fixture
+async def topic_client(broker):
+    client = RabbitMQClient(routing_mode="topic", runtime_id="test", shared_queues=2)
+    client.backoff.initial = client.backoff.maximum = 0.01
+    await client.setup()
+    yield client
+    await client.teardown()
+
+
+@pytest.mark.asyncio
+async def test_topic_mode_dispatches_from_shared_queues(topic_client, broker):
+    received = {f"default:actor:agent:{i}": [] for i in range(10)}
+    for queue_name, messages in received.items():
+        await topic_client.register_callback(queue_name, messages.append)
+    for queue_name in received:
+        await topic_client.publish_json(queue_name, {"to": queue_name})
+
+    await wait_for(lambda: all(received.values()))
+    assert all(
+        messages == [{"to": queue_name}] for queue_name, messages in received.items()
+    )
+    # Agents are bindings, not queues or consumers
+    assert set(topic_client.active_queues) == set(topic_client.shared_queue_names)
+    assert not any(name.startswith("default:") for name in broker.queues)
+
+
+@pytest.mark.asyncio
+async def test_topic_mode_bindings_follow_callbacks(topic_client, broker):
+    received = []
+
+    async def callback(payload: dict):
+        received.append(payload)
+
+    await topic_client.register_callback("default:actor:agent:a", callback)
+    await topic_client.deregister_callback("default:actor:agent:a", callback)
+    await topic_client.publish_json("default:actor:agent:a", {"index": 0})
+    assert not any(broker.bindings["roster.actors"].values())
+
+    await topic_client.register_callback("default:actor:agent:a", callback)
+    broker.drop_connections()
+    await wait_for(lambda: topic_client._connected.is_set())
+    # The binding is restored along with the shared consumers
+    await topic_client.publish_json("default:actor:agent:a", {"index": 1})
+    await wait_for(lambda: received == [{"index": 1}])
+
+
+@pytest.mark.asyncio
+async def test_topic_mode_retries_messages_without_a_local_recipient(broker):
+    client = RabbitMQClient(
+        routing_mode="topic", runtime_id="test", shared_queues=1, retry_delays=[0.05]
+    )
+    await client.setup()
+    received = []
+
+    async def callback(payload: dict):
+        received.append(payload)
+
+    # Routed here while the agent was bound, then the agent left
+    broker.queues[client.shared_queue_names[0]].put(
+        codec.dumps({"index": 0}),
+        {"content_type": "application/json", "headers": {}},
+        routing_key="default:actor:agent:a",
+    )
+    # Sent on for a retry, not dropped
+    await wait_for(
+        lambda: [key for key, _ in broker.published] == ["default:actor:agent:a"]
+    )
+    # The agent arrives again before the retry is due
+    await client.register_callback("default:actor:agent:a", callback)
+    await wait_for(lambda: received == [{"index": 0}])
+    await client.teardown()
+
+
+@pytest.mark.asyncio
+async def test_failed_messages_are_retried_then_dead_lettered(broker):
+    client = RabbitMQClient(retry_delays=[0.01, 0.02])
+    await client.setup()
+    attempts = []
+
+    async def callback(payload: dict):
+        attempts.append(payload["index"])
+        if payload["index"] == 0:
+            raise ConnectionError("Agent is unavailable")
+        raise MessageRejected("Malformed")
+
+    await client.register_callback("queue", callback)
+    await client.publish_json("queue", {"index": 0})
+    await client.publish_json("queue", {"index": 1})
+    await wait_for(lambda: len(broker.queues["roster.dead-letter"].messages) == 2)
+    # Rejected messages are not retried
+    assert sorted(attempts) == [0, 0, 0, 1]
+
+    dead_letters = await client.list_dead_letters()
+    assert [(d.queue, d.attempts, d.payload) for d in dead_letters] == [
+        ("queue", 1, {"index": 1}),
+        ("queue", 3, {"index": 0}),
+    ]
+    assert dead_letters[1].reason == "ConnectionError: Agent is unavailable"
+    # Listing leaves the dead letters in place
+    assert len(broker.queues["roster.dead-letter"].messages) == 2
+
+    await client.deregister_callback("queue", callback)
+    assert await client.replay_dead_letters(ids=[dead_letters[0].id]) == 1
+    assert [d.id for d in await client.list_dead_letters()] == [dead_letters[1].id]
+    assert len(broker.queues["queue"].messages) == 1
+    await client.teardown()
+
+
+@pytest.mark.asyncio
+async def test_dead_letters_are_replayed_a_page_at_a_time(broker):
+    client = RabbitMQClient(retry_delays=[])
+    await client.setup()
+
+    async def reject(payload: dict):
+        raise MessageRejected("Malformed")
+
+    await client.register_callback("queue", reject)
+    for i in range(3):
+        await client.publish_json("queue", {"index": i})
+    dead_letter_queue = broker.queues["roster.dead-letter"]
+    await wait_for(lambda: len(dead_letter_queue.messages) == 3)
+    await client.deregister_callback("queue", reject)
+
+    assert await client.replay_dead_letters(limit=2) == 2
+    # Only the page was taken from the queue
+    assert [d.payload for d in await client.list_dead_letters()] == [{"index": 2}]
+    assert len(broker.queues["queue"].messages) == 2
+    assert await client.replay_dead_letters(limit=2) == 1
+    assert not dead_letter_queue.messages
+    await client.teardown()
+
+
+@pytest.mark.asyncio
+async def test_dead_letters_past_the_first_page_are_replayed_by_id(broker):
+    client = RabbitMQClient(retry_delays=[])
+    await client.setup()
+
+    async def reject(payload: dict):
+        raise MessageRejected("Malformed")
+
+    await client.register_callback("queue", reject)
+    for i in range(3):
+        await client.publish_json("queue", {"index": i})
+    dead_letter_queue = broker.queues["roster.dead-letter"]
+    await wait_for(lambda: len(dead_letter_queue.messages) == 3)
+    await client.deregister_callback("queue", reject)
+
+    [last] = await client.list_dead_letters(limit=1, offset=2)
+    assert last.payload == {"index": 2}
+    assert await client.replay_dead_letters(ids=[last.id]) == 1
+    assert len(broker.queues["queue"].messages) == 1
+    # The others went round the queue, back into their order
+    assert [d.payload for d in await client.list_dead_letters()] == [
+        {"index": 0},
+        {"index": 1},
+    ]
+    assert await client.replay_dead_letters(limit=1, offset=1) == 1
+    assert [d.payload for d in await client.list_dead_letters()] == [{"index": 0}]
+    await client.teardown()
+
+
+@pytest.mark.asyncio
+async def test_encoding_is_negotiated_with_peers(rmq_client, broker):
+    rmq_client.compression_min_bytes = 1024
+    received = []
+
+    async def callback(payload: dict):
+        received.append(payload)
+
+    large = {"kind": "tool_response", "data": {"content": "x" * 4096}}
+    await rmq_client.register_callback("queue-a", callback)
+    await rmq_client.register_callback("queue-b", callback)
+
+    # Nothing is known about queue-b yet, so it gets plain JSON
+    await rmq_client.publish_json("queue-b", large, sender_queue="queue-a")
+    await wait_for(lambda: len(received) == 1)
+    assert broker.published[-1][1] == codec.dumps(large)
+
+    # queue-b's consumer learned what queue-a accepts from that message
+    await rmq_client.publish_json("queue-a", large, sender_queue="queue-b")
+    await wait_for(lambda: len(received) == 2)
+    assert len(broker.published[-1][1]) < 1024
+    assert received == [large, large]
+
+
+@pytest.mark.asyncio
+async def test_large_data_is_sent_as_claim_check(broker, tmp_path):
+    store = LocalBlobStore(str(tmp_path), store_id="shared")
+    client = RabbitMQClient(blob_store=store, claim_check_min_bytes=1024)
+    await client.setup()
+    received = []
+
+    async def callback(payload: dict):
+        received.append(payload)
+
+    large = {"kind": "tool_response", "data": {"content": "x" * 4096}}
+    await client.register_callback("queue-a", callback)
+    await client.register_callback("queue-b", callback)
+
+    # queue-b is not known to share the store yet, so the data is inline
+    await client.publish_json("queue-b", large, sender_queue="queue-a")
+    await wait_for(lambda: len(received) == 1)
+    assert received[0] == large
+
+    await client.publish_json("queue-a", large, sender_queue="queue-b")
+    await wait_for(lambda: len(received) == 2)
+    assert received[1]["data"] == {}
+    reference = BlobReference(**received[1]["data_ref"])
+    assert codec.loads(await store.get(reference)) == large["data"]
+    await client.teardown()
+
+
+@pytest.mark.asyncio
+async def test_dead_letters_keep_their_blobs_until_replayed(broker, tmp_path):
+    store = LocalBlobStore(str(tmp_path), store_id="shared")
+    client = RabbitMQClient(
+        blob_store=store, claim_check_min_bytes=1024, retry_delays=[]
+    )
+    await client.setup()
+    received = []
+
+    async def callback(payload: dict):
+        received.append(payload)
+
+    async def reject(payload: dict):
+        raise MessageRejected("Malformed")
+
+    await client.register_callback("queue-a", reject)
+    await client.register_callback("queue-b", callback)
+    # queue-b's consumer learns that queue-a shares the store
+    await client.publish_json("queue-b", {"kind": "ping"}, sender_queue="queue-a")
+    await wait_for(lambda: len(received) == 1)
+
+    large = {"kind": "tool_response", "data": {"content": "x" * 4096}}
+    await client.publish_json("queue-a", large, sender_queue="queue-b")
+    dead_letter_queue = broker.queues["roster.dead-letter"]
+    await wait_for(lambda: len(dead_letter_queue.messages) == 1)
+    [blob_path] = [
+        os.path.join(dirpath, filename)
+        for dirpath, _, filenames in os.walk(tmp_path)
+        for filename in filenames
+        if not filename.endswith(LocalBlobStore.PIN_SUFFIX)
+    ]
+    an_hour_ago = time.time() - 3600
+    os.utime(blob_path, (an_hour_ago, an_hour_ago))
+    assert await store.sweep(max_age=60) == 0
+
+    await client.deregister_callback("queue-a", reject)
+    await client.register_callback("queue-a", callback)
+    assert await client.replay_dead_letters() == 1
+    await wait_for(lambda: len(received) == 2)
+    reference = BlobReference(**received[1]["data_ref"])
+    assert codec.loads(await store.get(reference)) == large["data"]
+    # Unpinned once replayed, and swept after the TTL as usual
+    assert await store.sweep(max_age=0) == 1
+    await client.teardown()
+
+
+@pytest.mark.asyncio
+async def test_tool_responses_skip_ahead_of_waiting_triggers(broker):
+    client = RabbitMQClient(prefetch_count=16, max_in_flight=1)
+    await client.setup()
+    release = asyncio.Event()
+    handled = []
+
+    async def callback(payload: dict):
+        handled.append(payload["id"])
+        if payload["id"] == "blocking":
+            await release.wait()
+
+    await client.register_callback("queue", callback)
+    await client.publish_json("queue", {"id": "blocking", "kind": "trigger_action"})
+    await wait_for(lambda: handled == ["blocking"])
+    for i in range(2):
+        await client.publish_json(
+            "queue", {"id": f"trigger-{i}", "kind": "trigger_action"}
+        )
+    await client.publish_json("queue", {"id": "response", "kind": "tool_response"})
+    await asyncio.sleep(0.05)
+
+    release.set()
+    await wait_for(lambda: len(handled) == 4)
+    assert handled == ["blocking", "response", "trigger-0", "trigger-1"]
+    await client.teardown()
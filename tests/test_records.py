@@ -0,0 +1,68 @@
+import dataclasses
+
+import pytest
+from roster_agent_runtime.controllers.events.status import (
+    ControllerStatusEvent,
+    EventType,
+    Resource,
+)
+from roster_agent_runtime.models.agent import AgentContainer, AgentStatus
+from roster_agent_runtime.models.records import AgentContainerRecord, AgentStatusRecord
+
+
+@pytest.fixture
+def agent_status():
+    yield AgentStatus(
+        name="Alice",
+        executor="docker",
+        status="running",
+        container=AgentContainer(
+            id="container-id",
+            name="container-name",
+            image="roster-agent:latest",
+            status="running",
+            labels={"roster-agent": "Alice"},
+        ),
+    )
+
+
+def test_record_round_trip(agent_status):
+    record = AgentStatusRecord.from_model(agent_status)
+    assert isinstance(record.container, AgentContainerRecord)
+    assert record.to_model() == agent_status
+    assert record.to_dict() == agent_status.dict()
+
+
+def test_record_is_immutable(agent_status):
+    record = AgentStatusRecord.from_model(agent_status)
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        record.status = "exited"
+
+
+def test_record_is_hashable_with_frozen_labels(agent_status):
+    record = AgentStatusRecord.from_model(agent_status)
+    assert record.container.labels == (("roster-agent", "Alice"),)
+    assert record.container.label("roster-agent") == "Alice"
+    assert hash(record) == hash(AgentStatusRecord.from_model(agent_status))
+
+
+def test_coerce_passes_records_through(agent_status):
+    record = AgentStatusRecord.from_model(agent_status)
+    assert AgentStatusRecord.coerce(record) is record
+    assert AgentStatusRecord.coerce(agent_status) == record
+
+
+def test_controller_event_serializes_like_model(agent_status):
+    event = ControllerStatusEvent(
+        resource_type=Resource.AGENT,
+        event_type=EventType.PUT,
+        name="Alice",
+        status=AgentStatusRecord.from_model(agent_status),
+    )
+    assert event.dict() == {
+        "resource_type": "AGENT",
+        "event_type": "PUT",
+        "name": "Alice",
+        "status": agent_status.dict(),
+    }
+    assert event.get_agent_status() == agent_status
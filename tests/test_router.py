@@ -0,0 +1,343 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+from roster_agent_runtime import codec, errors
+from roster_agent_runtime.blobs import LocalBlobStore
+from roster_agent_runtime.messaging.base import MessageRejected, PublishError
+from roster_agent_runtime.messaging.idempotency import IdempotencyCache
+from roster_agent_runtime.messaging.memory import InMemoryBroker
+from roster_agent_runtime.messaging.router import AgentMessageRouter, MessageRouter
+from roster_agent_runtime.messaging.rpc import RpcClient
+from roster_agent_runtime.models.conversation import ConversationMessage
+from roster_agent_runtime.models.messaging import OutgoingMessage, Recipient
+from roster_agent_runtime.services.agent import AgentService
+
+from .mock.agent import MockAgentHandle, MockAgentPool
+
+
+class StaticInformer:
+    # MessageRouter only needs the names of specified agents
+    def __init__(self, names: list[str]):
+        self.names = names
+        self.event_listeners = []
+
+    def list(self) -> list[SimpleNamespace]:
+        return [SimpleNamespace(name=name) for name in self.names]
+
+    def add_event_listener(self, callback):
+        self.event_listeners.append(callback)
+
+
+class RecordingBroker(InMemoryBroker):
+    def __init__(self):
+        super().__init__()
+        self.published_to: list[str] = []
+
+    async def publish_json(self, queue_name: str, message: dict, **kwargs):
+        self.published_to.append(queue_name)
+        await super().publish_json(queue_name, message, **kwargs)
+
+    async def publish_json_batch(self, messages, **kwargs):
+        messages = list(messages)
+        self.published_to.extend(queue_name for queue_name, _ in messages)
+        await super().publish_json_batch(messages, **kwargs)
+
+
+@pytest.fixture
+def agent_pool() -> MockAgentPool:
+    return MockAgentPool(["Alice", "Bob"])
+
+
+@pytest_asyncio.fixture
+async def broker():
+    broker = RecordingBroker()
+    yield broker
+    await broker.teardown()
+
+
+@pytest_asyncio.fixture
+async def message_router(agent_pool, broker):
+    router = MessageRouter(
+        agent_pool=agent_pool,
+        roster_informer=StaticInformer(["Alice", "Bob"]),
+        rmq_client=broker,
+    )
+    await router.setup()
+    yield router
+    await router.teardown()
+
+
+async def wait_for(condition, timeout: float = 2.0):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("Condition not met in time")
+
+
+def tool_response(index: int) -> dict:
+    return {"id": str(index), "kind": "tool_response", "tool": "tool", "data": {}}
+
+
+@pytest.mark.asyncio
+async def test_local_recipients_skip_the_broker(message_router, agent_pool, broker):
+    alice, bob = agent_pool.handles["Alice"], agent_pool.handles["Bob"]
+    for i in range(5):
+        await alice.outgoing.put(
+            OutgoingMessage(
+                recipient=Recipient(kind="agent", name="Bob"), payload=tool_response(i)
+            )
+        )
+    await alice.outgoing.put(
+        OutgoingMessage(
+            recipient=Recipient(kind="tool", name="workspace"), payload=tool_response(5)
+        )
+    )
+
+    await wait_for(lambda: len(bob.tool_responses) == 5)
+    assert [response["invocation_id"] for response in bob.tool_responses] == [
+        "0",
+        "1",
+        "2",
+        "3",
+        "4",
+    ]
+    await wait_for(lambda: broker.published_to)
+    # Only the remote recipient went through the broker
+    assert broker.published_to == ["default:actor:tool:workspace"]
+
+
+@pytest.mark.asyncio
+async def test_undelivered_local_messages_fall_back_to_broker(message_router, broker):
+    inbox = message_router.local_inboxes["default:actor:agent:Bob"]
+    # Hold the inbox, so messages are still queued when Bob is removed
+    inbox.task.cancel()
+    for i in range(3):
+        assert await message_router.deliver_local(
+            "default:actor:agent:Bob", tool_response(i)
+        )
+
+    await message_router._close_local_inbox("default:actor:agent:Bob")
+    assert broker.published_to == ["default:actor:agent:Bob"] * 3
+    assert not await message_router.deliver_local(
+        "default:actor:agent:Bob", tool_response(3)
+    )
+
+
+@pytest.mark.asyncio
+async def test_claim_checks_are_resolved_for_the_agent(agent_pool, broker, tmp_path):
+    store = LocalBlobStore(str(tmp_path), store_id="test")
+    reference = await store.put(codec.dumps({"content": "large"}))
+    handle = agent_pool.get_agent_handle("Alice")
+    agent_router = AgentMessageRouter(
+        handle,
+        queue_name="default:actor:agent:Alice",
+        rmq_client=broker,
+        blob_store=store,
+    )
+
+    message = {**tool_response(0), "data_ref": reference.dict()}
+    await agent_router.handle_incoming_message(message)
+    assert handle.tool_responses[0]["data"] == {"content": "large"}
+
+    missing = reference.copy(update={"key": "0" * 64})
+    with pytest.raises(MessageRejected):
+        await agent_router.handle_incoming_message(
+            {**tool_response(1), "data_ref": missing.dict()}
+        )
+
+
+@pytest.mark.asyncio
+async def test_messages_are_held_until_the_agent_is_running(agent_pool, broker):
+    agent_pool.put_agent("Carol", status="created")
+    router = MessageRouter(
+        agent_pool=agent_pool,
+        roster_informer=StaticInformer(["Alice", "Bob", "Carol"]),
+        rmq_client=broker,
+    )
+    await router.setup()
+    for i in range(3):
+        await broker.publish_json("default:actor:agent:Carol", tool_response(i))
+    await wait_for(lambda: router.agent_routers["Carol"].pending == 3)
+
+    agent_pool.put_agent("Carol")
+    carol = agent_pool.handles["Carol"]
+    await wait_for(lambda: len(carol.tool_responses) == 3)
+    assert [response["invocation_id"] for response in carol.tool_responses] == [
+        "0",
+        "1",
+        "2",
+    ]
+    await router.teardown()
+
+
+@pytest.mark.asyncio
+async def test_repeated_running_events_keep_the_outgoing_stream(
+    message_router, agent_pool
+):
+    agent_router = message_router.agent_routers["Alice"]
+    consumer = agent_router.outbox_consumer
+    for _ in range(3):
+        agent_pool.put_agent("Alice")
+    await asyncio.sleep(0.01)
+    assert agent_router.outbox_consumer is consumer
+    assert not consumer.done()
+
+    # A new handle (e.g. the agent was recreated) restarts it
+    agent_pool.handles["Alice"] = MockAgentHandle("Alice")
+    agent_pool.put_agent("Alice")
+    assert agent_router.agent_handle is agent_pool.handles["Alice"]
+    assert agent_router.outbox_consumer is not consumer
+
+
+@pytest.mark.asyncio
+async def test_held_messages_are_bounded_and_expire(agent_pool, broker):
+    agent_router = AgentMessageRouter(
+        None,
+        queue_name="default:actor:agent:Carol",
+        rmq_client=broker,
+        pending_buffer_size=1,
+        pending_timeout=0.05,
+    )
+    held = asyncio.create_task(agent_router.handle_incoming_message(tool_response(0)))
+    await wait_for(lambda: agent_router.pending == 1)
+    with pytest.raises(errors.AgentNotReadyError):
+        await agent_router.handle_incoming_message(tool_response(1))
+    with pytest.raises(errors.AgentNotReadyError):
+        await held
+    assert agent_router.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_redelivered_action_triggers_are_suppressed(agent_pool, broker):
+    agent_router = AgentMessageRouter(
+        agent_pool.get_agent_handle("Alice"),
+        queue_name="default:actor:agent:Alice",
+        rmq_client=broker,
+        idempotency_cache=IdempotencyCache(max_size=10, ttl=60),
+    )
+    trigger = {
+        "id": "record",
+        "workflow": "Workflow",
+        "kind": "trigger_action",
+        "data": {"step": "Step", "action": "Action", "inputs": {}, "role_context": ""},
+    }
+    await agent_router.handle_incoming_message(trigger)
+    await agent_router.handle_incoming_message(trigger)
+    other_step = {**trigger, "data": {**trigger["data"], "step": "OtherStep"}}
+    await agent_router.handle_incoming_message(other_step)
+    assert [action["step"] for action in agent_pool.handles["Alice"].actions] == [
+        "Step",
+        "OtherStep",
+    ]
+
+
+class FlakyStreamHandle(MockAgentHandle):
+    # The first stream breaks after one message
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.streams = 0
+
+    async def outgoing_message_stream(self):
+        self.streams += 1
+        if self.streams == 1:
+            yield await self.outgoing.get()
+            raise ConnectionError("stream broken")
+        async for message in super().outgoing_message_stream():
+            yield message
+
+
+class FailingOnceBroker(RecordingBroker):
+    def __init__(self, fail_queue: str):
+        super().__init__()
+        self.fail_queue = fail_queue
+
+    async def publish_json_batch(self, messages, **kwargs):
+        messages = list(messages)
+        failed_indexes = [
+            index
+            for index, (queue_name, _) in enumerate(messages)
+            if queue_name == self.fail_queue
+        ]
+        if failed_indexes:
+            self.fail_queue = None
+            await super().publish_json_batch(
+                [m for i, m in enumerate(messages) if i not in failed_indexes]
+            )
+            raise PublishError(details={"failed_indexes": failed_indexes})
+        await super().publish_json_batch(messages, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_outgoing_stream_reconnects_and_failed_publishes_retry():
+    broker = FailingOnceBroker(fail_queue="default:actor:tool:b")
+    handle = FlakyStreamHandle("Alice")
+    agent_router = AgentMessageRouter(
+        handle, queue_name="default:actor:agent:Alice", rmq_client=broker
+    )
+    await agent_router.setup()
+    await handle.outgoing.put(
+        OutgoingMessage(recipient=Recipient(kind="tool", name="a"), payload={})
+    )
+    await wait_for(lambda: handle.streams == 2)
+    for name in ("b", "c"):
+        await handle.outgoing.put(
+            OutgoingMessage(recipient=Recipient(kind="tool", name=name), payload={})
+        )
+
+    await wait_for(lambda: len(broker.published_to) == 3)
+    # Only the failed message was published again
+    assert sorted(broker.published_to) == [
+        "default:actor:tool:a",
+        "default:actor:tool:b",
+        "default:actor:tool:c",
+    ]
+    await agent_router.teardown()
+    await broker.teardown()
+
+
+@pytest.mark.asyncio
+async def test_only_the_owning_runtime_consumes_an_agents_queue(broker):
+    # Two runtimes share the broker, only the first runs Alice
+    owner_pool, other_pool = MockAgentPool(["Alice"]), MockAgentPool([])
+    owner_pool.handles["Alice"].chat_reply = "Hi from the owner"
+    routers = [
+        MessageRouter(
+            agent_pool=pool,
+            roster_informer=StaticInformer(["Alice"]),
+            rmq_client=broker,
+        )
+        for pool in (owner_pool, other_pool)
+    ]
+    for router in routers:
+        await router.setup()
+    rpc_client = RpcClient(broker, reply_queue="other:replies", timeout=1.0)
+    await rpc_client.setup()
+
+    assert "Alice" in routers[0].agent_routers
+    assert "Alice" not in routers[1].agent_routers
+    reply = await AgentService(
+        pool=other_pool, rpc_client=rpc_client
+    ).chat_prompt_agent(
+        name="Alice",
+        identity="Bob",
+        team="Team",
+        role="Role",
+        history=[],
+        message=ConversationMessage(sender="user", message="Hello"),
+    )
+    assert reply == "Hi from the owner"
+
+    # Alice moves to the other runtime
+    owner_pool.delete_agent("Alice")
+    other_pool.put_agent("Alice")
+    await wait_for(lambda: "Alice" in routers[1].agent_routers)
+    await wait_for(lambda: "Alice" not in routers[0].agent_routers)
+    await broker.publish_json("default:actor:agent:Alice", tool_response(0))
+    await wait_for(lambda: len(other_pool.handles["Alice"].tool_responses) == 1)
+
+    await rpc_client.teardown()
+    for router in routers:
+        await router.teardown()
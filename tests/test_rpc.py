@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+from roster_agent_runtime import errors
+from roster_agent_runtime.messaging.memory import InMemoryBroker
+from roster_agent_runtime.messaging.router import AgentMessageRouter
+from roster_agent_runtime.messaging.rpc import (
+    RpcClient,
+    RpcError,
+    RpcKind,
+    RpcTimeoutError,
+)
+from roster_agent_runtime.models.conversation import ConversationMessage
+from roster_agent_runtime.models.messaging import ChatRequestPayload
+from roster_agent_runtime.services.agent import AgentService
+
+from .mock.agent import MockAgentHandle, MockAgentPool
+
+QUEUE_NAME = "default:actor:agent:Alice"
+
+
+def chat_request() -> dict:
+    return ChatRequestPayload(
+        identity="Alice",
+        team="Team",
+        role="Role",
+        chat_history=[ConversationMessage(sender="user", message="Hello")],
+    ).dict()
+
+
+@pytest_asyncio.fixture
+async def broker():
+    broker = InMemoryBroker(retry_delays=[])
+    yield broker
+    await broker.teardown()
+
+
+@pytest_asyncio.fixture
+async def handle(broker):
+    handle = MockAgentHandle("Alice")
+    agent_router = AgentMessageRouter(handle, queue_name=QUEUE_NAME, rmq_client=broker)
+    await broker.register_callback(QUEUE_NAME, agent_router.handle_incoming_message)
+    yield handle
+    await broker.deregister_callback(QUEUE_NAME, agent_router.handle_incoming_message)
+
+
+@pytest_asyncio.fixture
+async def rpc_client(broker):
+    client = RpcClient(broker, reply_queue="runtime:replies", timeout=1.0)
+    await client.setup()
+    yield client
+    await client.teardown()
+
+
+@pytest.mark.asyncio
+async def test_chat_round_trip(handle, rpc_client):
+    handle.chat_reply = "Hi!"
+
+    response = await rpc_client.call(QUEUE_NAME, RpcKind.CHAT_REQUEST, chat_request())
+
+    assert response == {"message": "Hi!"}
+    assert handle.chats[0][0].message == "Hello"
+    assert rpc_client.pending == {}
+
+
+@pytest.mark.asyncio
+async def test_timeout_cancels_remote_handler(handle, rpc_client):
+    cancelled = asyncio.Event()
+
+    async def slow_chat(**kwargs):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    handle.chat = slow_chat
+
+    with pytest.raises(RpcTimeoutError):
+        await rpc_client.call(
+            QUEUE_NAME, RpcKind.CHAT_REQUEST, chat_request(), timeout=0.1
+        )
+
+    # The agent router stops the chat once the cancellation is delivered
+    await asyncio.wait_for(cancelled.wait(), timeout=1.0)
+
+
+@pytest.mark.asyncio
+async def test_remote_error(handle, rpc_client):
+    async def fail(**kwargs):
+        raise RuntimeError("model unavailable")
+
+    handle.chat = fail
+
+    with pytest.raises(RpcError, match="model unavailable"):
+        await rpc_client.call(QUEUE_NAME, RpcKind.CHAT_REQUEST, chat_request())
+
+
+@pytest.mark.asyncio
+async def test_agent_service_forwards_remote_agents(handle, rpc_client):
+    handle.chat_reply = "From afar"
+    service = AgentService(pool=MockAgentPool([]), rpc_client=rpc_client)
+
+    reply = await service.chat_prompt_agent(
+        name="Alice",
+        identity="Alice",
+        team="Team",
+        role="Role",
+        history=[],
+        message=ConversationMessage(sender="user", message="Hello"),
+    )
+
+    assert reply == "From afar"
+    with pytest.raises(errors.AgentNotFoundError):
+        await AgentService(pool=MockAgentPool([])).chat_prompt_agent(
+            name="Alice",
+            identity="Alice",
+            team="Team",
+            role="Role",
+            history=[],
+            message=ConversationMessage(sender="user", message="Hello"),
+        )